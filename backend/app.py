@@ -1,12 +1,30 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 from flask_cors import CORS
 import json
 import csv
 import pandas as pd
 import os
+import time
+import threading
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
 import openai
 from dotenv import load_dotenv
+from data_store import DataStore
+from http_cache import CachedBody, conditional_response
+from member_store import MemberStore, MEMBER_DB_FILENAME, CHATS_STORE, INGESTED_CHATS_STORE, INGESTED_METRICS_FILENAME, member_id_for, merge_documents
+from jsonl_store import manifest_path
+from timeseries import downsample_frame, DOWNSAMPLE_METHODS
+from llm_backends import get_backend
+from llm_cache import LLMResponseCache, cache_key, data_version_hash
+from retrieval import BM25Index, chat_passages, document_passages, pack_context, format_context
+from chat_index import ChatIndex, chronological, logged_message, messages_from, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from schedule_index import ScheduleIndex, curated_intervals, parse_date, SCHEDULE_STORE
+from snapshot import open_snapshot, SNAPSHOT_FILENAME
+from event_log import EVENTS_STORE, events_after, stream_position
+from instrumentation import Registry, LLM_BUCKETS, PHASES, SIZE_BUCKETS, end_request, phase, start_request
+from ingest import IngestLog, WAL_STORES, WEARABLE_NUMERIC_COLUMNS, csv_rows, unlogged, validate_messages, validate_readings, wal_manifest
 
 # Load environment variables
 load_dotenv()
@@ -18,110 +36,416 @@ CORS(app)
 openai.api_key = os.getenv('OPENAI_API_KEY')
 
 # Data paths
-DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
 
+# Parsed data files and serialized responses, shared by all routes
+data_store = DataStore(DATA_DIR, max_bytes=int(os.getenv('DATA_CACHE_MAX_MB', '256')) * 1024 * 1024)
+
+# Per-member SQLite partitions behind the /api/members/<member_id>/... routes
+member_store = MemberStore(DATA_DIR)
+
+# --- Instrumentation ---
+# Per-route latency, response size and phase breakdown (see instrumentation.py),
+# plus LLM call latency and tokens, served in the Prometheus text format by /api/metrics.
+
+metrics = Registry()
+request_duration = metrics.histogram('http_request_duration_seconds', 'Time to produce a response', ['method', 'route', 'status'])
+response_size = metrics.histogram('http_response_size_bytes', 'Response body size (not recorded for streams)', ['method', 'route'], buckets=SIZE_BUCKETS)
+phase_duration = metrics.histogram('http_request_phase_seconds', 'Time per request spent loading, transforming and serializing data, and in the rest of the route', ['route', 'phase'])
+llm_duration = metrics.histogram('llm_request_duration_seconds', 'LLM call latency (until the last token for streams)', ['backend', 'mode'], buckets=LLM_BUCKETS)
+llm_first_token = metrics.histogram('llm_time_to_first_token_seconds', 'Time until a streamed LLM answer starts', ['backend'], buckets=LLM_BUCKETS)
+llm_tokens = metrics.counter('llm_tokens_total', 'Tokens reported by the LLM backend', ['backend', 'kind'])
+llm_stream_chunks = metrics.counter('llm_stream_chunks_total', 'Text chunks received from streamed LLM answers', ['backend'])
+
+def request_route():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+@app.before_request
+def start_request_timing():
+    g.request_timing = start_request()
+
+@app.after_request
+def record_request_metrics(response):
+    token = g.pop('request_timing', None)
+    if token is None:
+        return response
+    timings = end_request(token)
+    route = request_route()
+    elapsed = time.perf_counter() - timings.started
+    request_duration.observe(elapsed, method=request.method, route=route, status=str(response.status_code))
+    if not response.is_streamed:
+        response_size.observe(response.content_length or 0, method=request.method, route=route)
+    for name in PHASES:
+        phase_duration.observe(timings.seconds[name], route=route, phase=name)
+    phase_duration.observe(max(elapsed - sum(timings.seconds.values()), 0.0), route=route, phase='other')
+    return response
+
+@phase('load')
 def load_json_data(filename):
-    """Load JSON data from the data directory"""
+    """Load JSON data from the data directory (cached until the file changes)"""
     try:
-        with open(os.path.join(DATA_DIR, filename), 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return data_store.load_json(filename)
     except Exception as e:
         print(f"Error loading {filename}: {e}")
         return {}
 
+@phase('load')
 def load_csv_data(filename):
-    """Load CSV data from the data directory"""
+    """Load CSV data from the data directory (cached until the file changes)"""
     try:
-        return pd.read_csv(os.path.join(DATA_DIR, filename))
+        return data_store.load_csv(filename)
     except Exception as e:
         print(f"Error loading {filename}: {e}")
         return pd.DataFrame()
 
+# Curated files that the pipeline replaces with a JSONL store (see jsonl_store.py)
+JSONL_SOURCES = {
+    'chat_data.json': CHATS_STORE,
+    'persona_summaries.json': 'persona_summaries',
+    'decisions.json': 'decisions',
+}
+
+def source_filename(filename):
+    """The manifest of the store replacing a data file if it has been generated, else the file itself"""
+    store = JSONL_SOURCES.get(filename)
+    if store and data_store.version(manifest_path(store)):
+        return manifest_path(store)
+    return filename
+
+# Files that only exist once the ingestion has written them: the log, the compacted
+# messages and the metrics derived from them
+OPTIONAL_SOURCES = {wal_manifest(kind) for kind in WAL_STORES} | {manifest_path(INGESTED_CHATS_STORE), INGESTED_METRICS_FILENAME}
+
+def present_sources(filenames):
+    """The source files of a response, without the optional ones that do not exist yet"""
+    return [filename for filename in filenames if filename not in OPTIONAL_SOURCES or data_store.version(filename) is not None]
+
+@phase('load')
+def load_source(filename):
+    """Contents of a data file, or the records of the store replacing it"""
+    if source_filename(filename) != filename:
+        return data_store.load_jsonl(JSONL_SOURCES[filename])
+    return load_json_data(filename)
+
+# --- Ingestion log ---
+# Batches posted to /api/members/<member_id>/wearables and /chats wait in a
+# write-ahead log (see ingest.py) until compacted into wearables.csv and the
+# ingested chat store; reads merge them in, and are versioned by the log's
+# manifest as well as the files. Reads only look at the log's stores, so
+# importing the app (e.g. from scripts/compile_snapshot.py) writes nothing;
+# the log itself is opened by init_ingestion().
+
+ingest_log = None
+_ingest_init_lock = threading.Lock()
+
+def init_ingestion():
+    """Open the ingestion log once per process: finish a compaction cut short by a crash
+    and start compacting records logged before a restart"""
+    global ingest_log
+    with _ingest_init_lock:
+        if ingest_log is None:
+            log = IngestLog(DATA_DIR, member_store, interval=float(os.getenv('INGEST_COMPACT_SECONDS', '30')))
+            if log.pending_count('wearables') or log.pending_count('chats'):
+                log.start()
+            ingest_log = log
+    return ingest_log
+
+WEARABLES_SOURCES = ['wearables.csv', wal_manifest('wearables')]
+CHATS_WAL_SOURCE = wal_manifest('chats')
+# The chat log's ingested messages: compacted, then still in the ingestion log
+INGESTED_CHATS_SOURCES = [manifest_path(INGESTED_CHATS_STORE), CHATS_WAL_SOURCE]
+
+@phase('load')
+def pending_records(kind, member_id=None):
+    """Records still in the ingestion log, all of them or one member's"""
+    if data_store.version(wal_manifest(kind)) is None:
+        return []
+    reader = data_store.open_jsonl(WAL_STORES[kind])
+    return [unlogged(record) for record in (reader.read(member_id) if member_id is not None else reader.records())]
+
+def pending_wearables(columns, member_id=None):
+    """Logged readings as the wearables.csv rows they will be compacted into"""
+    pending = pending_records('wearables', member_id)
+    if not pending:
+        return []
+    member_store.ensure_current()
+    return csv_rows(pending, list(columns), member_store.default_member_id())
+
+def load_wearables():
+    """wearables.csv with the readings still in the ingestion log (cached until either
+    changes). Callers must treat the result as read-only."""
+    filenames = present_sources(WEARABLES_SOURCES)
+    if None in data_store.versions(filenames):
+        return merge_pending_wearables()
+    return data_store.derive('wearables', filenames, merge_pending_wearables)
+
+def merge_pending_wearables():
+    df = load_csv_data('wearables.csv')
+    pending = pending_wearables(df.columns)
+    return pd.concat([df, pd.DataFrame(pending)], ignore_index=True) if pending else df
+
+def chats_curated():
+    """Whether the chat log is the curated chat_data.json rather than a generated store"""
+    return source_filename('chat_data.json') == 'chat_data.json'
+
+@phase('load')
+def ingested_messages(member_id=None):
+    """Ingested messages, all of them or one member's, in the chat log's schema"""
+    records = []
+    if data_store.version(manifest_path(INGESTED_CHATS_STORE)) is not None:
+        compacted = data_store.open_jsonl(INGESTED_CHATS_STORE)
+        records = compacted.read(member_id) if member_id is not None else compacted.records()
+    curated = chats_curated()
+    return [logged_message(record, curated) for record in list(records) + pending_records('chats', member_id)]
+
+def load_chats():
+    """The chat log (chat_data.json or the chat store) with the ingested messages merged in by date"""
+    chat_data = load_source('chat_data.json')
+    ingested = ingested_messages()
+    if isinstance(chat_data, dict):
+        return {**chat_data, 'communications': chronological(messages_from(chat_data) + ingested)} if ingested else chat_data
+    return {'communications': chronological(list(chat_data) + ingested)}
+
+# --- Compiled snapshot ---
+# Bodies and frames compiled by the pipeline (see snapshot.py) are served from
+# the memory-mapped file while their source files are unchanged.
+
+def current_snapshot():
+    """The compiled snapshot, reopened when a new one is compiled, or None"""
+    if data_store.version(SNAPSHOT_FILENAME) is None:
+        return None
+    try:
+        return data_store.derive('snapshot', [SNAPSHOT_FILENAME], lambda: open_snapshot(data_store.path(SNAPSHOT_FILENAME)))
+    except (OSError, ValueError) as e:
+        print(f"Error loading {SNAPSHOT_FILENAME}: {e}")
+        return None
+
+def snapshot_versions(filenames):
+    return dict(zip(filenames, data_store.versions(filenames)))
+
+def snapshot_covers(filename):
+    """Whether the snapshot was compiled from the current version of a file (so it was not empty)"""
+    snapshot = current_snapshot()
+    return snapshot is not None and snapshot.covers(filename, data_store.version(filename))
+
+def snapshot_frame(key, filenames):
+    snapshot = current_snapshot()
+    return snapshot.frame(key, snapshot_versions(filenames)) if snapshot else None
+
+# Map the snapshot at startup, so the first requests are served from it
+current_snapshot()
+
+def serialized_body(payload):
+    with phase('serialize'):
+        return CachedBody(app.json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+
+def cached_json_response(key, filenames, build_payload):
+    """Serialize and compress build_payload() once per version of the source files.
+
+    Served from the compiled snapshot when it holds this response for the
+    current files. The response carries a strong ETag and answers If-None-Match with 304.
+    """
+    filenames = present_sources(filenames)
+    versions = data_store.versions(filenames)
+    if None in versions:
+        payload = build_payload()
+        with phase('serialize'):
+            return jsonify(payload)
+    snapshot = current_snapshot()
+    cached = snapshot.body(key, dict(zip(filenames, versions))) if snapshot else None
+    if cached is None:
+        cached = data_store.derive(key, filenames, lambda: serialized_body(build_payload()))
+    # Read by scripts/compile_snapshot.py to know which cached body a request produced
+    g.cached_json_body = (key, dict(zip(filenames, versions)), cached)
+    return conditional_response(app, request, cached)
+
 @app.route('/api/member/profile', methods=['GET'])
 def get_member_profile():
     """Get member profile data"""
     try:
-        profiles = load_json_data('member_profiles.json')
-        if profiles and len(profiles) > 0:
-            return jsonify(profiles[0])
-        return jsonify({"error": "No member profile found"}), 404
+        if not snapshot_covers('member_profiles.json') and not load_json_data('member_profiles.json'):
+            return jsonify({"error": "No member profile found"}), 404
+        return cached_json_response('member_profile', ['member_profiles.json'], lambda: load_json_data('member_profiles.json')[0])
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+CHAT_QUERY_PARAMS = ('since', 'until', 'sender', 'limit', 'cursor', 'format')
+
+@phase('transform')
+def build_chat_index(messages):
+    return ChatIndex(messages)
+
+def chat_history_response(index_key, filenames, load_messages, full_response):
+    """Full, paginated or NDJSON-streamed chat history depending on the query string.
+
+    Without any of CHAT_QUERY_PARAMS the full (cached) history is returned as before.
+    """
+    args = request.args
+    if not any(param in args for param in CHAT_QUERY_PARAMS):
+        return full_response()
+
+    try:
+        limit = int(args['limit']) if 'limit' in args else None
+        cursor = int(args.get('cursor') or 0)
+    except ValueError:
+        return jsonify({"error": "limit and cursor must be integers"}), 400
+    if (limit is not None and limit < 1) or cursor < 0:
+        return jsonify({"error": "limit must be positive and cursor non-negative"}), 400
+
+    # Built on first use, so a page served from the snapshot does not build it
+    index = lambda: data_store.derive(index_key, present_sources(filenames), lambda: build_chat_index(load_messages()))
+    filters = {'since': args.get('since'), 'until': args.get('until'), 'sender': args.get('sender')}
+
+    if args.get('format') == 'ndjson':
+        # Write messages out one line at a time instead of building the whole body
+        def generate():
+            for count, (_, message) in enumerate(index().iter_messages(cursor=cursor, **filters)):
+                if limit is not None and count >= limit:
+                    break
+                yield json.dumps(message) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    page_size = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+
+    def build_page():
+        messages, next_cursor = index().page(limit=page_size, cursor=cursor, **filters)
+        return {
+            "communications": messages,
+            "next_cursor": str(next_cursor) if next_cursor is not None else None
+        }
+
+    page_key = f"{index_key}:page:{filters['since']}:{filters['until']}:{filters['sender']}:{page_size}:{cursor}"
+    return cached_json_response(page_key, filenames, build_page)
+
 @app.route('/api/member/chats', methods=['GET'])
 def get_member_chats():
-    """Get member chat data"""
+    """Get member chat data, optionally filtered by since/until/sender and paginated with limit/cursor"""
     try:
-        chats = load_json_data('chat_data.json')
-        return jsonify(chats)
+        filenames = [source_filename('chat_data.json')] + INGESTED_CHATS_SOURCES
+        return chat_history_response(
+            'member_chat_index', filenames,
+            lambda: messages_from(load_chats()),
+            lambda: cached_json_response('member_chats', filenames, load_chats)
+        )
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def records_without_nan(df):
+    """DataFrame rows as dicts with NaN replaced by None (column-wise, no per-cell loop)"""
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+BIOMARKER_FIELDS = ['month', 'date', 'value', 'unit', 'notes']
+
+# Which payload sections each ?view= returns
+BIOMARKER_VIEWS = {
+    'raw': ('raw_data',),
+    'grouped': ('grouped_data',),
+    'both': ('raw_data', 'grouped_data'),
+}
+
+@phase('transform')
+def biomarkers_payload(biomarkers_df):
+    """Raw and per-marker grouped biomarker records"""
+    # Group by marker name for easier frontend consumption (in order of first appearance)
+    grouped_data = {
+        marker: records_without_nan(group[BIOMARKER_FIELDS])
+        for marker, group in biomarkers_df.groupby('marker_name', sort=False)
+    }
+    return {
+        'raw_data': records_without_nan(biomarkers_df),
+        'grouped_data': grouped_data
+    }
+
+def biomarkers_response(key, filenames, load_df):
+    """Serve the raw, grouped or both views; the grouped payload is built once per data version"""
+    view = request.args.get('view', 'both')
+    if view not in BIOMARKER_VIEWS:
+        return jsonify({"error": f"view must be one of {', '.join(BIOMARKER_VIEWS)}"}), 400
+
+    return cached_json_response(f'{key}:{view}', filenames, lambda: biomarkers_view(key, filenames, load_df, view))
+
+def biomarkers_view(key, filenames, load_df, view):
+    """The sections of the cached biomarker payload that make up a view"""
+    payload = data_store.derive(f'{key}:payload', filenames, lambda: biomarkers_payload(load_df()))
+    return {section: payload[section] for section in BIOMARKER_VIEWS[view]}
+
+@phase('transform')
+def typed_wearables(wearables_df):
+    """Wearables sorted by date with numeric columns typed (built once per data version)"""
+    # Replace empty strings and 'N/A' with None for proper JSON serialization
+    df = wearables_df.replace(['', 'N/A', 'NaN'], None)
+    
+    # Convert numeric columns to proper types, handling None values
+    for col in WEARABLE_NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    
+    if 'date' in df.columns:
+        df = df.sort_values('date', kind='stable').reset_index(drop=True)
+    return df
+
+def parse_wearables_query(args):
+    """(from, to, max_points, downsample) from the query string; raises ValueError if invalid"""
+    method = args.get('downsample', 'lttb')
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"downsample must be one of {', '.join(DOWNSAMPLE_METHODS)}")
+    try:
+        max_points = int(args['max_points']) if 'max_points' in args else None
+    except ValueError:
+        raise ValueError("max_points must be an integer")
+    if max_points is not None and max_points < 3:
+        raise ValueError("max_points must be at least 3")
+    return args.get('from'), args.get('to'), max_points, method
+
+@phase('transform')
+def wearables_records(key, filenames, load_df, date_from=None, date_to=None, max_points=None, method='lttb'):
+    """Wearable records, optionally sliced to a date range and downsampled to max_points rows"""
+    filenames = present_sources(filenames)
+    df = snapshot_frame(f'{key}:typed', filenames)
+    if df is None:
+        df = data_store.derive(f'{key}:typed', filenames, lambda: typed_wearables(load_df()))
+    # Rows are date-sorted, so the range is two binary searches
+    start = df['date'].searchsorted(date_from, side='left') if date_from else 0
+    end = df['date'].searchsorted(date_to + '\uffff', side='left') if date_to else len(df)
+    df = df.iloc[start:end]
+    if max_points is not None:
+        df = downsample_frame(df, 'date', WEARABLE_NUMERIC_COLUMNS, max_points, method)
+    return records_without_nan(df)
+
+def wearables_response(key, filenames, load_df):
+    """Full wearables series, or a from/to slice downsampled to max_points rows"""
+    try:
+        query = parse_wearables_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    date_from, date_to, max_points, method = query
+    if date_from is None and date_to is None and max_points is None:
+        return cached_json_response(key, filenames, lambda: wearables_records(key, filenames, load_df))
+    return cached_json_response(
+        f'{key}:{date_from}:{date_to}:{max_points}:{method}', filenames,
+        lambda: wearables_records(key, filenames, load_df, *query)
+    )
+
 @app.route('/api/member/biomarkers', methods=['GET'])
 def get_member_biomarkers():
-    """Get member biomarker data"""
+    """Get member biomarker data (?view=raw|grouped|both, default both)"""
     try:
-        biomarkers_df = load_csv_data('biomarkers.csv')
-        if biomarkers_df.empty:
+        if not snapshot_covers('biomarkers.csv') and load_csv_data('biomarkers.csv').empty:
             return jsonify({"error": "No biomarker data found"}), 404
         
-        # Convert to JSON format
-        biomarkers_data = biomarkers_df.to_dict('records')
-        
-        # Clean up any NaN values that might exist
-        for record in biomarkers_data:
-            for key, value in record.items():
-                if pd.isna(value):
-                    record[key] = None
-        
-        # Group by marker name for easier frontend consumption
-        grouped_data = {}
-        for record in biomarkers_data:
-            marker = record['marker_name']
-            if marker not in grouped_data:
-                grouped_data[marker] = []
-            grouped_data[marker].append({
-                'month': record['month'],
-                'date': record['date'],
-                'value': record['value'],
-                'unit': record['unit'],
-                'notes': record['notes']
-            })
-        
-        return jsonify({
-            'raw_data': biomarkers_data,
-            'grouped_data': grouped_data
-        })
+        return biomarkers_response('member_biomarkers', ['biomarkers.csv'], lambda: load_csv_data('biomarkers.csv'))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/member/wearables', methods=['GET'])
 def get_member_wearables():
-    """Get member wearables data"""
+    """Get member wearables data (?from=&to= date range, ?max_points= with ?downsample=lttb|minmax)"""
     try:
-        wearables_df = load_csv_data('wearables.csv')
-        if wearables_df.empty:
+        if not snapshot_covers('wearables.csv') and load_wearables().empty:
             return jsonify({"error": "No wearables data found"}), 404
         
-        # Replace empty strings and 'N/A' with None for proper JSON serialization
-        wearables_df = wearables_df.replace(['', 'N/A', 'NaN'], None)
-        
-        # Convert numeric columns to proper types, handling None values
-        numeric_columns = ['sleep_score_100', 'hrv_ms', 'rhr_bpm', 'respiratory_rate_brpm', 'strain_score_21', 'recovery_score_pct']
-        for col in numeric_columns:
-            if col in wearables_df.columns:
-                wearables_df[col] = pd.to_numeric(wearables_df[col], errors='coerce')
-        
-        # Convert to dict and replace NaN values with None for proper JSON serialization
-        wearables_data = wearables_df.to_dict('records')
-        
-        # Clean up NaN values that might still exist
-        for record in wearables_data:
-            for key, value in record.items():
-                if pd.isna(value):
-                    record[key] = None
-        
-        return jsonify(wearables_data)
+        return wearables_response('member_wearables', WEARABLES_SOURCES, load_wearables)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -129,8 +453,7 @@ def get_member_wearables():
 def get_member_test_reports():
     """Get member test reports"""
     try:
-        test_reports = load_json_data('test_panel.json')
-        return jsonify(test_reports)
+        return cached_json_response('member_test_reports', ['test_panel.json'], lambda: load_json_data('test_panel.json'))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -138,23 +461,450 @@ def get_member_test_reports():
 def get_member_diagnostics():
     """Get member diagnostic plans"""
     try:
-        diagnostics = load_json_data('diagnostics_plan.json')
-        return jsonify(diagnostics)
+        return cached_json_response('member_diagnostics', ['diagnostics_plan.json'], lambda: load_json_data('diagnostics_plan.json'))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# The metrics of the chat log including the ingested messages, merged over
+# internal_metrics.json once the ingestion has computed them
+INTERNAL_METRICS_SOURCES = ['internal_metrics.json', INGESTED_METRICS_FILENAME]
+
+def load_internal_metrics():
+    metrics = load_json_data('internal_metrics.json')
+    if data_store.version(INGESTED_METRICS_FILENAME) is None:
+        return metrics
+    return merge_documents(metrics, load_json_data(INGESTED_METRICS_FILENAME))
+
 @app.route('/api/member/internal-metrics', methods=['GET'])
 def get_internal_metrics():
     """Get internal metrics data"""
     try:
-        metrics = load_json_data('internal_metrics.json')
-        return jsonify(metrics)
+        return cached_json_response('internal_metrics', INTERNAL_METRICS_SOURCES, load_internal_metrics)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# --- Dashboard bootstrap ---
+# One round trip for everything the dashboard shows, assembled from the cached data.
+
+dashboard_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='dashboard')
+
+# section -> (source files, builder taking the parsed wearables query)
+DASHBOARD_SECTIONS = {
+    'profile': (['member_profiles.json'], lambda query: load_json_data('member_profiles.json')[0]),
+    'chats': (['chat_data.json'] + INGESTED_CHATS_SOURCES, lambda query: load_chats()),
+    'biomarkers': (['biomarkers.csv'], lambda query: biomarkers_view(
+        'member_biomarkers', ['biomarkers.csv'], lambda: load_csv_data('biomarkers.csv'), 'grouped')),
+    'wearables': (WEARABLES_SOURCES, lambda query: wearables_records(
+        'member_wearables', WEARABLES_SOURCES, load_wearables, *query)),
+    'test-reports': (['test_panel.json'], lambda query: load_json_data('test_panel.json')),
+    'diagnostics': (['diagnostics_plan.json'], lambda query: load_json_data('diagnostics_plan.json')),
+    'internal-metrics': (INTERNAL_METRICS_SOURCES, lambda query: load_internal_metrics()),
+}
+
+def assemble_dashboard(sections, wearables_query):
+    """Build the requested sections concurrently; a failing section reports its error"""
+    futures = {
+        # Run in a copy of this context, so the sections' phases count towards this request
+        section: dashboard_executor.submit(copy_context().run, DASHBOARD_SECTIONS[section][1], wearables_query)
+        for section in sections
+    }
+    payload = {}
+    for section, future in futures.items():
+        try:
+            payload[section] = future.result()
+        except Exception as e:
+            payload[section] = {"error": str(e)}
+    return payload
+
+@app.route('/api/member/dashboard', methods=['GET'])
+def get_member_dashboard():
+    """Get several dashboard sections in one response (?sections=profile,chats,...; default all)"""
+    try:
+        requested = request.args.get('sections')
+        sections = [s.strip() for s in requested.split(',') if s.strip()] if requested else list(DASHBOARD_SECTIONS)
+        unknown = [section for section in sections if section not in DASHBOARD_SECTIONS]
+        if unknown:
+            return jsonify({"error": f"Unknown sections: {', '.join(unknown)}"}), 400
+        try:
+            wearables_query = parse_wearables_query(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        filenames = sorted({source_filename(filename) for section in sections for filename in DASHBOARD_SECTIONS[section][0]})
+        return cached_json_response(
+            f"dashboard:{','.join(sections)}:{wearables_query}", filenames,
+            lambda: assemble_dashboard(sections, wearables_query)
+        )
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# --- Multi-member API ---
+# Served from the per-member store, so each request reads only one member's rows.
+
+def member_not_found(member_id):
+    """Refresh the member store and return a 404 response if the member does not exist"""
+    member_store.ensure_current()
+    if not member_store.has_member(member_id):
+        return jsonify({"error": f"Member {member_id} not found"}), 404
+    return None
+
+def member_json_response(member_id, section, build_payload):
+    """Cached response for one member's section, rebuilt when the member store changes"""
+    return cached_json_response(f'members:{member_id}:{section}', [MEMBER_DB_FILENAME], build_payload)
+
+@app.route('/api/members', methods=['GET'])
+def list_members():
+    """List all members"""
+    try:
+        member_store.ensure_current()
+        return cached_json_response('members', [MEMBER_DB_FILENAME], member_store.list_members)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/members/<member_id>/profile', methods=['GET'])
+def get_profile_for_member(member_id):
+    """Get one member's profile"""
+    try:
+        not_found = member_not_found(member_id)
+        if not_found:
+            return not_found
+        return member_json_response(member_id, 'profile', lambda: member_store.get_profile(member_id))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/members/<member_id>/chats', methods=['GET'])
+def get_chats_for_member(member_id):
+    """Get one member's chat history (same query parameters as /api/member/chats)"""
+    try:
+        not_found = member_not_found(member_id)
+        if not_found:
+            return not_found
+        # A generated chat store is read directly: only this member's byte ranges are parsed
+        if not chats_curated():
+            filenames = [manifest_path(CHATS_STORE)] + INGESTED_CHATS_SOURCES
+            load_rows = lambda: data_store.open_jsonl(CHATS_STORE).read(member_id) + ingested_messages(member_id)
+        else:
+            # The member store holds the compacted ingested messages
+            filenames = [MEMBER_DB_FILENAME, CHATS_WAL_SOURCE]
+            load_rows = lambda: member_store.get_rows('chats', member_id) + [
+                logged_message(record, True) for record in pending_records('chats', member_id)]
+        return chat_history_response(
+            f'members:{member_id}:chat_index', filenames, load_rows,
+            lambda: cached_json_response(f'members:{member_id}:chats', filenames, lambda: {'communications': chronological(load_rows())})
+        )
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/members/<member_id>/biomarkers', methods=['GET'])
+def get_biomarkers_for_member(member_id):
+    """Get one member's biomarker data (?view=raw|grouped|both, default both)"""
+    try:
+        not_found = member_not_found(member_id)
+        if not_found:
+            return not_found
+        rows = member_store.get_rows('biomarkers', member_id)
+        if not rows:
+            return jsonify({"error": "No biomarker data found"}), 404
+        return biomarkers_response(f'members:{member_id}:biomarkers', [MEMBER_DB_FILENAME], lambda: pd.DataFrame(rows))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/members/<member_id>/wearables', methods=['GET'])
+def get_wearables_for_member(member_id):
+    """Get one member's wearables data (same query parameters as /api/member/wearables)"""
+    try:
+        not_found = member_not_found(member_id)
+        if not_found:
+            return not_found
+        rows = member_store.get_rows('wearables', member_id)
+        rows += pending_wearables(rows[0] if rows else load_csv_data('wearables.csv').columns, member_id)
+        if not rows:
+            return jsonify({"error": "No wearables data found"}), 404
+        return wearables_response(f'members:{member_id}:wearables', [MEMBER_DB_FILENAME, wal_manifest('wearables')], lambda: pd.DataFrame(rows))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def ingest_response(member_id, kind, validate):
+    """Validate a posted batch for one member and append it to the ingestion log"""
+    not_found = member_not_found(member_id)
+    if not_found:
+        return not_found
+    try:
+        records = validate(request.get_json(silent=True), member_id, member_store.get_profile(member_id)['name'])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    log = init_ingestion()
+    accepted = log.append(kind, records)
+    return jsonify({"member_id": member_id, "accepted": accepted, "pending": log.pending_count(kind)}), 202
+
+@app.route('/api/members/<member_id>/wearables', methods=['POST'])
+def ingest_wearables_for_member(member_id):
+    """Append a batch of wearable readings ({"readings": [...]}) to the ingestion log"""
+    try:
+        return ingest_response(member_id, 'wearables', validate_readings)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/members/<member_id>/chats', methods=['POST'])
+def ingest_chats_for_member(member_id):
+    """Append a batch of chat messages ({"messages": [...]}) to the ingestion log"""
+    try:
+        return ingest_response(member_id, 'chats', validate_messages)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# --- Change events ---
+# Streams the member's events from the event log (see event_log.py), which every
+# worker process appends to, by polling its manifest.
+
+EVENT_POLL_SECONDS = float(os.getenv('EVENT_POLL_SECONDS', '1'))
+EVENT_KEEPALIVE_SECONDS = 15
+# Reconnect delay sent to EventSource clients
+EVENT_RETRY_MS = 3000
+
+def event_log_reader():
+    """The event log, reopened when it changes, or None before the first event"""
+    return data_store.open_jsonl(EVENTS_STORE) if data_store.version(manifest_path(EVENTS_STORE)) else None
+
+@app.route('/api/members/<member_id>/events', methods=['GET'])
+def stream_member_events(member_id):
+    """Stream one member's change events (chat, wearable, version) as Server-Sent Events; resumes after Last-Event-ID"""
+    try:
+        not_found = member_not_found(member_id)
+        if not_found:
+            return not_found
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        try:
+            after = int(last_event_id) if last_event_id else None
+        except ValueError:
+            return jsonify({"error": "Last-Event-ID must be an integer"}), 400
+
+        def generate():
+            reader = event_log_reader()
+            version, reload = stream_position(reader, after)
+            yield f"retry: {EVENT_RETRY_MS}\n\n"
+            # reset: the client missed events no longer kept and must re-fetch its data
+            yield sse_event('reset' if reload else 'ready', {"version": version}, version)
+            idle_since = time.monotonic()
+            while True:
+                for event in events_after(reader, member_id, version):
+                    version = event['version']
+                    yield sse_event(event['type'], {"version": version, **event['data']}, version)
+                    idle_since = time.monotonic()
+                if time.monotonic() - idle_since >= EVENT_KEEPALIVE_SECONDS:
+                    yield ": keepalive\n\n"
+                    idle_since = time.monotonic()
+                time.sleep(EVENT_POLL_SECONDS)
+                reader = event_log_reader()
+
+        response = Response(generate(), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/members/<member_id>/<any('test-reports', 'diagnostics', 'internal-metrics', 'persona-summaries', 'decisions'):kind>", methods=['GET'])
+def get_document_for_member(member_id, kind):
+    """Get one member's test reports, diagnostic plans, internal metrics, persona summaries or decisions"""
+    try:
+        not_found = member_not_found(member_id)
+        if not_found:
+            return not_found
+        document = member_store.get_document(member_id, kind)
+        if document is None:
+            return jsonify({"error": f"No {kind} found for member {member_id}"}), 404
+        return member_json_response(member_id, kind, lambda: document)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# --- Schedule ---
+# Event intervals per member, answered from an interval index (see schedule_index.py).
+
+MAX_SCHEDULE_MEMBERS = 1000
+
+def schedule_index():
+    """The interval index of the generated schedule, falling back to the curated
+    schedule.json (as the first member's) until the pipeline has run; None if neither exists"""
+    manifest = manifest_path(SCHEDULE_STORE)
+    if data_store.version(manifest) is not None:
+        return data_store.derive('schedule_index', [manifest], lambda: ScheduleIndex(data_store.load_jsonl(SCHEDULE_STORE)))
+    if data_store.version('schedule.json') is None:
+        return None
+    filenames = ['schedule.json', 'member_profiles.json']
+    return data_store.derive('curated_schedule_index', filenames, curated_schedule_index)
+
+def curated_schedule_index():
+    profiles = load_json_data('member_profiles.json') or [{"name": "Member"}]
+    return ScheduleIndex(curated_intervals(load_json_data('schedule.json'), member_id_for(profiles[0])))
+
+def parse_schedule_query(args):
+    """(from, to) ordinal days from the query string (open-ended if missing); raises ValueError if invalid"""
+    try:
+        lo = parse_date(args['from']) if args.get('from') else None
+        hi = parse_date(args['to']) if args.get('to') else None
+    except ValueError:
+        raise ValueError("from and to must be dates (YYYY-MM-DD)")
+    if lo is not None and hi is not None and lo > hi:
+        raise ValueError("from must not be after to")
+    return lo, hi
+
+def schedule_response(member_id=None):
+    """One member's events overlapping ?from=&to= (the default member if member_id is None)"""
+    try:
+        lo, hi = parse_schedule_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    index = schedule_index()
+    if index is None:
+        return jsonify({"error": "No schedule found"}), 404
+    member_id = member_id if member_id is not None else index.default_member_id
+    events = index.events(member_id, lo, hi)
+    if events is None:
+        return jsonify({"error": f"No schedule found for member {member_id}"}), 404
+    return jsonify({
+        "member_id": member_id,
+        "from": request.args.get('from'),
+        "to": request.args.get('to'),
+        "events": events
+    })
+
+@app.route('/api/member/schedule', methods=['GET'])
+def get_member_schedule():
+    """Get the member's scheduled events (?from=&to= date range, inclusive)"""
+    try:
+        return schedule_response()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/members/<member_id>/schedule', methods=['GET'])
+def get_schedule_for_member(member_id):
+    """Get one member's scheduled events (same query parameters as /api/member/schedule)"""
+    try:
+        return schedule_response(member_id)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/members/schedule', methods=['GET'])
+def get_schedule_for_members():
+    """Get several members' scheduled events (?ids=a,b,c plus ?from=&to=); unknown ids are listed separately"""
+    try:
+        try:
+            lo, hi = parse_schedule_query(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        member_ids = [member_id for member_id in request.args.get('ids', '').split(',') if member_id]
+        if not member_ids:
+            return jsonify({"error": "ids is required"}), 400
+        if len(member_ids) > MAX_SCHEDULE_MEMBERS:
+            return jsonify({"error": f"At most {MAX_SCHEDULE_MEMBERS} ids per request"}), 400
+
+        index = schedule_index()
+        if index is None:
+            return jsonify({"error": "No schedule found"}), 404
+        members, unknown = {}, []
+        for member_id in member_ids:
+            events = index.events(member_id, lo, hi)
+            if events is None:
+                unknown.append(member_id)
+            else:
+                members[member_id] = events
+        return jsonify({
+            "from": request.args.get('from'),
+            "to": request.args.get('to'),
+            "members": members,
+            "unknown_ids": unknown
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# --- AI assistant ---
+
+RETRIEVAL_SOURCES = {
+    'chat_data.json': chat_passages,
+    'persona_summaries.json': lambda document: document_passages(document, 'persona summary'),
+    'decisions.json': lambda document: document_passages(document, 'decision'),
+}
+RETRIEVAL_TOP_K = int(os.getenv('RETRIEVAL_TOP_K', '8'))
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '1500'))
+
+def retrieval_index():
+    """BM25 index over the retrieval sources, rebuilt when any of them changes"""
+    sources = [filename for filename in RETRIEVAL_SOURCES if data_store.version(source_filename(filename))]
+    filenames = [source_filename(filename) for filename in sources]
+
+    @phase('transform')
+    def build_index():
+        passages = []
+        for filename in sources:
+            passages.extend(RETRIEVAL_SOURCES[filename](load_source(filename)))
+        return BM25Index(passages)
+
+    return data_store.derive(('retrieval_index', tuple(filenames)), filenames, build_index)
+
+# Model parameters are part of the response cache key
+CHAT_MODEL_PARAMS = {"model": "gpt-3.5-turbo", "max_tokens": 1000, "temperature": 0.7}
+CHAT_SYSTEM_PROMPT = "You are a helpful assistant that analyzes health data and provides insights about Rohan Patel's health journey."
+CHAT_CONTEXT_FILES = ['member_profiles.json'] + list(RETRIEVAL_SOURCES)
+
+llm_backend = get_backend()
+
+llm_cache = LLMResponseCache(
+    max_entries=int(os.getenv('LLM_CACHE_MAX_ENTRIES', '512')),
+    ttl_seconds=int(os.getenv('LLM_CACHE_TTL_SECONDS', '3600')),
+    db_path=os.getenv('LLM_CACHE_DB') or None
+)
+
+def chat_cache_key(query):
+    """Cache key for a query against the current version of every file that feeds the prompt"""
+    data_version = data_version_hash(data_store.versions([source_filename(filename) for filename in CHAT_CONTEXT_FILES]))
+    return cache_key(query, {**CHAT_MODEL_PARAMS, "backend": llm_backend.name, "system": CHAT_SYSTEM_PROMPT}, data_version)
+
+@phase('transform')
+def retrieve_context(query):
+    """Top-k passages for a query, packed under CONTEXT_TOKEN_BUDGET"""
+    return pack_context(retrieval_index().search(query, RETRIEVAL_TOP_K), CONTEXT_TOKEN_BUDGET)
+
+def build_chat_messages(user_query):
+    """Prompt messages for a query and the passages retrieved for it"""
+    # Retrieve the most relevant records under a fixed token budget
+    member_profile = load_json_data('member_profiles.json')
+    passages = retrieve_context(user_query)
+    
+    # Prepare context for the LLM
+    context = f"""
+    You are an AI assistant helping with queries about Rohan Patel's health journey. You have access to:
+    
+    Member Profile: {json.dumps(member_profile[0] if member_profile else {}, indent=2)}
+    
+    Relevant Records: the excerpts below were retrieved from the communication logs between Rohan and his health team (Ruby the concierge, Dr. Warren the medical strategist, and other team members), his monthly persona summaries and the team's recorded decisions. They are numbered [1], [2], ... in order of relevance.
+    
+    {format_context(passages) or "No matching records were found."}
+    
+    Please answer the user's query based on this context. Be specific, reference actual data points and cite the records you use by their number, e.g. [2]. If the records do not contain the answer, say so.
+    
+    User Query: {user_query}
+    """
+    messages = [
+        {"role": "system", "content": CHAT_SYSTEM_PROMPT},
+        {"role": "user", "content": context}
+    ]
+    return messages, passages
+
+def record_llm_call(mode, seconds, usage=None):
+    """Latency of an LLM call and the token counts the backend reported"""
+    llm_duration.observe(seconds, backend=llm_backend.name, mode=mode)
+    for kind in ('prompt', 'completion'):
+        count = (usage or {}).get(f'{kind}_tokens')
+        if count is not None:
+            llm_tokens.inc(count, backend=llm_backend.name, kind=kind)
+
+LLM_ERROR_MESSAGE = "I'm sorry, I'm currently unable to process your query due to an API issue. Please make sure your OpenAI API key is configured correctly. Error: {error}"
+
 @app.route('/api/chat/query', methods=['POST'])
 def chat_query():
-    """Handle chat queries using OpenAI API with context from chat_data and persona_summaries"""
+    """Handle chat queries using the configured LLM backend with context retrieved from chat_data, persona_summaries and decisions"""
     try:
         data = request.get_json()
         user_query = data.get('query', '')
@@ -162,52 +912,105 @@ def chat_query():
         if not user_query:
             return jsonify({"error": "Query is required"}), 400
         
-        # Load context data
-        chat_data = load_json_data('chat_data.json')
-        persona_summaries = load_json_data('persona_summaries.json')
-        member_profile = load_json_data('member_profiles.json')
+        # Repeated questions about unchanged data are answered from the cache
+        key = chat_cache_key(user_query)
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return jsonify({**json.loads(cached), "cached": True})
         
-        # Prepare context for OpenAI
-        context = f"""
-        You are an AI assistant helping with queries about Rohan Patel's health journey. You have access to:
+        messages, passages = build_chat_messages(user_query)
         
-        Member Profile: {json.dumps(member_profile[0] if member_profile else {}, indent=2)}
-        
-        Chat History: You have access to detailed communication logs between Rohan and his health team (Ruby the concierge, Dr. Warren the medical strategist, and other team members).
-        
-        Persona Evolution: You understand how Rohan's engagement and mindset has evolved over time through different phases.
-        
-        Please answer the user's query based on this context. Be specific and reference actual data points when possible.
-        
-        User Query: {user_query}
-        """
-        
-        # Call OpenAI API
         try:
-            response = openai.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that analyzes health data and provides insights about Rohan Patel's health journey."},
-                    {"role": "user", "content": context}
-                ],
-                max_tokens=1000,
-                temperature=0.7
-            )
-            ai_response = response.choices[0].message.content
-            return jsonify({"response": ai_response})
-        except Exception as openai_error:
-            # Fallback response if OpenAI API fails
-            return jsonify({
-                "response": f"I'm sorry, I'm currently unable to process your query due to an API issue. Please make sure your OpenAI API key is configured correctly. Error: {str(openai_error)}"
-            })
+            started = time.perf_counter()
+            ai_response, usage = llm_backend.complete(messages, **CHAT_MODEL_PARAMS)
+            record_llm_call('complete', time.perf_counter() - started, usage)
+            result = {"response": ai_response, "sources": [p['label'] for p in passages]}
+            llm_cache.put(key, json.dumps(result))
+            return jsonify({**result, "cached": False})
+        except Exception as llm_error:
+            # Fallback response if the LLM call fails
+            return jsonify({"response": LLM_ERROR_MESSAGE.format(error=llm_error)})
             
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def sse_event(event, data, event_id=None):
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/chat/query/stream', methods=['POST'])
+def chat_query_stream():
+    """Stream the assistant's answer as Server-Sent Events (meta, token..., done | error)"""
+    try:
+        data = request.get_json()
+        user_query = data.get('query', '')
+        
+        if not user_query:
+            return jsonify({"error": "Query is required"}), 400
+        
+        started = time.perf_counter()
+        key = chat_cache_key(user_query)
+        cached = llm_cache.get(key)
+
+        def generate():
+            if cached is not None:
+                result = json.loads(cached)
+                yield sse_event('meta', {"sources": result["sources"], "cached": True})
+                yield sse_event('token', {"text": result["response"]})
+                elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+                yield sse_event('done', {"ttft_ms": elapsed_ms, "total_ms": elapsed_ms, "chunks": 1})
+                return
+
+            messages, passages = build_chat_messages(user_query)
+            yield sse_event('meta', {"sources": [p['label'] for p in passages], "cached": False})
+
+            llm_started = time.perf_counter()
+            tokens = llm_backend.stream(messages, **CHAT_MODEL_PARAMS)
+            parts = []
+            ttft_ms = None
+            try:
+                for text in tokens:
+                    if ttft_ms is None:
+                        ttft_ms = round((time.perf_counter() - started) * 1000, 1)
+                        llm_first_token.observe(time.perf_counter() - llm_started, backend=llm_backend.name)
+                    parts.append(text)
+                    yield sse_event('token', {"text": text})
+            except Exception as llm_error:
+                yield sse_event('error', {"error": LLM_ERROR_MESSAGE.format(error=llm_error)})
+                return
+            finally:
+                # Runs on client disconnect too (GeneratorExit), cancelling the upstream call
+                tokens.close()
+
+            record_llm_call('stream', time.perf_counter() - llm_started)
+            llm_stream_chunks.inc(len(parts), backend=llm_backend.name)
+            total_ms = round((time.perf_counter() - started) * 1000, 1)
+            app.logger.info("chat stream: ttft=%sms total=%sms chunks=%d", ttft_ms, total_ms, len(parts))
+            llm_cache.put(key, json.dumps({"response": ''.join(parts), "sources": [p['label'] for p in passages]}))
+            yield sse_event('done', {"ttft_ms": ttft_ms, "total_ms": total_ms, "chunks": len(parts)})
+
+        response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/chat/cache', methods=['GET'])
+def chat_cache_stats():
+    """Hit/miss counters of the chat response cache"""
+    return jsonify(llm_cache.stats())
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Request, phase and LLM metrics of this process in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({"status": "healthy", "timestamp": datetime.now().isoformat()})
 
 if __name__ == '__main__':
+    init_ingestion()
     app.run(debug=True, port=5000)
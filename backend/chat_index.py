@@ -0,0 +1,87 @@
+# --- backend/chat_index.py ---
+# Date-sorted index over a chat log for filtered, cursor-paginated reads.
+
+from bisect import bisect_left
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MEMBER_ROLE = "Member"
+
+
+def messages_from(chat_data) -> list[dict]:
+    """Messages from either the {"communications": [...]} or the flat list chat schema"""
+    if isinstance(chat_data, dict):
+        return chat_data.get("communications", [])
+    return chat_data or []
+
+
+def logged_message(record: dict, curated: bool) -> dict:
+    """An ingested message in the schema of the chat log it is shown with: the curated
+    chat_data.json one ("Name (Role)" senders, "message") or the generated one"""
+    if curated:
+        sender = record["sender"] if record["role"] == MEMBER_ROLE else f"{record['sender']} ({record['role']})"
+        return {"date": record["date"], "timestamp": record.get("timestamp"), "sender": sender, "message": record["text"]}
+    return {
+        "member": record["member"], "date": record["date"], "timestamp": record.get("timestamp"),
+        "sender": record["sender"], "role": record["role"], "text": record["text"],
+    }
+
+
+def sender_matches(message: dict, sender: str) -> bool:
+    """Match "Ruby" against both "Ruby" and "Ruby (Elyx Concierge)", case-insensitively"""
+    name = (message.get("sender") or "").lower()
+    sender = sender.lower()
+    return name == sender or name.startswith(sender + " (")
+
+
+def message_order(message: dict) -> tuple:
+    """Sort key of the chat history: by date, then timestamp"""
+    return (message.get("date") or "", message.get("timestamp") or "")
+
+
+def chronological(messages: list[dict]) -> list[dict]:
+    """Messages sorted by message_order; messages with the same key keep their order"""
+    return sorted(messages, key=message_order)
+
+
+class ChatIndex:
+    """Messages sorted by (date, timestamp) with a parallel list of dates for bisection.
+
+    A cursor is the position of the next message in the sorted order, so pages
+    stay consistent while the underlying file is unchanged.
+    """
+
+    def __init__(self, messages: list[dict]):
+        self.messages = chronological(messages)
+        self.dates = [m.get("date") or "" for m in self.messages]
+        # Rough in-memory size, used by the data store's eviction budget
+        self.nbytes = sum(len(m.get("message") or m.get("text") or "") + 200 for m in self.messages)
+
+    def __len__(self):
+        return len(self.messages)
+
+    def _range(self, since=None, until=None):
+        start = bisect_left(self.dates, since) if since else 0
+        # until is inclusive: "2025-09-01" also covers "2025-09-01T18:00"
+        end = bisect_left(self.dates, until + "\uffff") if until else len(self.dates)
+        return start, end
+
+    def iter_messages(self, since=None, until=None, sender=None, cursor=0):
+        """Yield (position, message) pairs matching the filters, starting at cursor"""
+        start, end = self._range(since, until)
+        for position in range(max(start, cursor), end):
+            message = self.messages[position]
+            if sender and not sender_matches(message, sender):
+                continue
+            yield position, message
+
+    def page(self, since=None, until=None, sender=None, limit=DEFAULT_PAGE_SIZE, cursor=0):
+        """One page of matching messages and the cursor of the next page (None at the end)"""
+        items = []
+        next_cursor = None
+        for position, message in self.iter_messages(since, until, sender, cursor):
+            if len(items) == limit:
+                next_cursor = position
+                break
+            items.append(message)
+        return items, next_cursor
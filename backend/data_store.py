@@ -0,0 +1,129 @@
+# --- backend/data_store.py ---
+# Shared in-process cache for the files in data/. Each file is parsed once and
+# reloaded only when its mtime or size changes on disk. JSONL stores are tracked
+# by their manifest, which is replaced on every write.
+
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from jsonl_store import JsonlReader, manifest_path
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class DataStore:
+    """Size-bounded LRU cache of parsed data files and values derived from them"""
+
+    def __init__(self, data_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.data_dir = data_dir
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> {"version", "value", "cost"}
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        self._build_locks = {}
+
+    def path(self, filename):
+        return os.path.join(self.data_dir, filename)
+
+    def version(self, filename):
+        """Return the (mtime_ns, size) version of a data file, or None if it is missing"""
+        try:
+            stat = os.stat(self.path(filename))
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def versions(self, filenames):
+        return tuple(self.version(filename) for filename in filenames)
+
+    def load_json(self, filename):
+        """Parsed contents of a JSON file. Callers must treat the result as read-only."""
+        return self._get(("file", filename), (filename,), lambda: self._read_json(filename))
+
+    def load_csv(self, filename):
+        """Parsed contents of a CSV file. Callers must treat the result as read-only."""
+        return self._get(("file", filename), (filename,), lambda: pd.read_csv(self.path(filename)))
+
+    def open_jsonl(self, store):
+        """Memory-mapped reader of a JSONL store directory, reopened when the store changes"""
+        return self._get(("jsonl", store), (manifest_path(store),), lambda: JsonlReader(self.path(store)))
+
+    def load_jsonl(self, store):
+        """Every record of a JSONL store, in write order. Callers must treat the result as read-only."""
+        return self._get(("file", store), (manifest_path(store),), lambda: self.open_jsonl(store).records())
+
+    def derive(self, key, filenames, builder):
+        """Cache builder() until any of the given files changes.
+
+        Used for values computed from one or more data files, e.g. a grouped
+        payload or the serialized bytes of a response.
+        """
+        return self._get(("derived", key), tuple(filenames), builder)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._build_locks.clear()
+            self._total_bytes = 0
+
+    def _read_json(self, filename):
+        with open(self.path(filename), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _get(self, key, filenames, builder):
+        version = self.versions(filenames)
+        if None in version:
+            missing = filenames[version.index(None)]
+            raise FileNotFoundError(f"{missing} not found in {self.data_dir}")
+
+        hit = self._lookup(key, version)
+        if hit is not None:
+            return hit[0]
+
+        # Build outside the shared lock so different keys load in parallel, but
+        # only once per key when several requests miss at the same time.
+        with self._lock:
+            key_lock = self._build_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            hit = self._lookup(key, version)
+            if hit is not None:
+                return hit[0]
+            value = builder()
+            cost = self._cost(value, filenames)
+            with self._lock:
+                self._put(key, version, value, cost)
+            return value
+
+    def _lookup(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["version"] == version:
+                self._entries.move_to_end(key)
+                return (entry["value"],)
+            return None
+
+    def _cost(self, value, filenames):
+        # Serialized payloads and objects that report their own size are charged
+        # exactly; other parsed objects at the size of the files they came from.
+        if isinstance(value, (bytes, bytearray)):
+            return len(value)
+        if getattr(value, "nbytes", None) is not None:
+            return value.nbytes
+        if isinstance(value, pd.DataFrame):
+            return int(value.memory_usage(deep=True).sum())
+        return sum(os.path.getsize(self.path(filename)) for filename in filenames)
+
+    def _put(self, key, version, value, cost):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._total_bytes -= old["cost"]
+        self._entries[key] = {"version": version, "value": value, "cost": cost}
+        self._total_bytes += cost
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self._total_bytes -= evicted["cost"]
+            self._build_locks.pop(evicted_key, None)
@@ -0,0 +1,73 @@
+# --- backend/event_log.py ---
+# Change events per member, streamed by /api/members/<member_id>/events. Events
+# are appended to the JSONL store data/events as
+#
+#   {"version": 42, "member_id": "rohan-patel", "type": "chat", "data": {...}}
+#
+# indexed under their member and zero-padded version, so the events a client
+# missed since its Last-Event-ID are one binary search away. Versions increase
+# by one per event across all members; old events are dropped in bulk once the
+# log holds MAX_EVENTS, and a client that fell behind them is told to reload.
+
+from jsonl_store import JsonlStore
+
+EVENTS_STORE = "events"
+MAX_EVENTS = 10_000
+
+
+def version_key(version: int) -> str:
+    return f"{version:012d}"
+
+
+def event_key(event: dict) -> tuple:
+    return event["member_id"], version_key(event["version"])
+
+
+class EventLog:
+    """Appends events to the store at path. Callers must hold the ingestion log's lock,
+    which makes it the only writer."""
+
+    def __init__(self, path: str):
+        self.store = JsonlStore(path, key=event_key)
+
+    def latest_version(self) -> int:
+        last = self.store.last_record()
+        return last["version"] if last else 0
+
+    def append(self, events: list) -> int:
+        """Log (member_id, type, data) events and return the version of the last one"""
+        version = self.latest_version()
+        records = []
+        for member_id, event_type, data in events:
+            version += 1
+            records.append({"version": version, "member_id": member_id, "type": event_type, "data": data})
+        if records:
+            self.store.append(records)
+        return version
+
+    def trim(self, reader):
+        """Keep the newest half of the log once it holds MAX_EVENTS (reader: a JsonlReader of it)"""
+        if len(reader) >= MAX_EVENTS:
+            self.store.write(reader.records()[-(MAX_EVENTS // 2):])
+
+
+def stream_position(reader, after):
+    """(version to stream after, whether the client must reload) for a client that last saw
+    version after (None for a new client), given a JsonlReader of the log or None"""
+    last = reader.last() if reader is not None else None
+    latest = last["version"] if last else 0
+    if after is None:
+        return latest, False
+    # Versions are contiguous, so the oldest kept event follows from the count
+    oldest = latest - len(reader) + 1 if reader is not None else 1
+    # Ahead of the log: it was replaced since. Behind the oldest kept event: some were dropped.
+    if after > latest or after < oldest - 1:
+        return latest, True
+    return after, False
+
+
+def events_after(reader, member_id: str, version: int) -> list:
+    """One member's events with a version above version, oldest first"""
+    if reader is None:
+        return []
+    return reader.read(member_id, date_from=version_key(version + 1))
@@ -0,0 +1,37 @@
+# --- backend/file_lock.py ---
+# A lock held by one thread of one process at a time: a thread lock plus an
+# exclusive flock on a lock file, so every backend process serving the same
+# data directory shares it.
+
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: one backend process per data directory
+    fcntl = None
+
+
+class FileLock:
+    """Context manager locking path (the lock file is created on first use)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if fcntl is not None:
+            try:
+                if self._file is None:
+                    self._file = open(self.path, "a")
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            except BaseException:
+                self._lock.release()
+                raise
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._lock.release()
@@ -0,0 +1,72 @@
+# --- backend/http_cache.py ---
+# Conditional GET and pre-compressed bodies for cached JSON responses.
+
+import gzip
+import hashlib
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_BYTES = 1024
+
+
+class CachedBody:
+    """A serialized response body with its strong ETag and compressed variants.
+
+    Built once per data version and kept in the data store, so repeat requests
+    neither re-serialize nor re-compress.
+    """
+
+    def __init__(self, body: bytes, mimetype: str = "application/json"):
+        self.mimetype = mimetype
+        self.digest = hashlib.sha256(body).hexdigest()[:32]
+        self.variants = {"identity": body}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            self.variants["gzip"] = gzip.compress(body, compresslevel=6, mtime=0)
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(body)
+        self.nbytes = sum(len(variant) for variant in self.variants.values())
+
+    @classmethod
+    def from_variants(cls, digest: str, variants: dict, mimetype: str = "application/json"):
+        """A body serialized and compressed ahead of time, e.g. memory-mapped from a snapshot"""
+        cached = cls.__new__(cls)
+        cached.mimetype = mimetype
+        cached.digest = digest
+        cached.variants = variants
+        cached.nbytes = 0
+        return cached
+
+    def etag(self, encoding: str) -> str:
+        # Each representation gets its own strong validator
+        return self.digest if encoding == "identity" else f"{self.digest}-{encoding}"
+
+
+def choose_encoding(request, cached: CachedBody) -> str:
+    accepted = request.accept_encodings
+    for encoding in ("br", "gzip"):
+        if encoding in cached.variants and accepted[encoding]:
+            return encoding
+    return "identity"
+
+
+def conditional_response(app, request, cached: CachedBody):
+    """200 with the best encoding the client accepts, or 304 if its ETag still matches"""
+    encoding = choose_encoding(request, cached)
+    etag = cached.etag(encoding)
+
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        # bytes() is a no-op for bytes and copies a memory-mapped variant
+        response = app.response_class(bytes(cached.variants[encoding]), mimetype=cached.mimetype)
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept-Encoding")
+    return response
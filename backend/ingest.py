@@ -0,0 +1,468 @@
+# --- backend/ingest.py ---
+# Incremental ingestion of wearable readings and chat messages. Accepted batches
+# are appended to a write-ahead log, one JSONL store per kind under data/wal/,
+# which the read routes merge into their responses so new data is visible at
+# once. A background thread compacts the log into the main files:
+#
+#   readings -> appended to wearables.csv
+#   messages -> appended to the store data/ingested/chats, which readers show after
+#               the chat log (chat_data.json or the chat store) in its schema
+#
+# and inserts the same rows into the member store, so nothing is rebuilt. Logged
+# records are numbered per kind, and data/wal/checkpoint.json records how far
+# they have been compacted (and, while a batch is being written, the files'
+# state before it), so a compaction interrupted by a crash is finished exactly
+# once. Internal metrics and persona summaries of the chat log including the
+# ingested messages are then updated from just the new messages, into
+# data/ingested/ next to the curated documents rather than over them; readers
+# merge them over the curated ones (member_store.merge_documents). Every
+# accepted record, and every derived output update, is also announced on the
+# member's event stream (event_log.py).
+
+import csv
+import json
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import date
+from itertools import chain
+
+from chat_index import MEMBER_ROLE, logged_message
+from event_log import EVENTS_STORE, EventLog
+from file_lock import FileLock
+from jsonl_store import JsonlStore, manifest_path, open_store
+from member_store import CHATS_FILENAME, CHATS_STORE, INGESTED_CHATS_STORE, INGESTED_METRICS_FILENAME, INGESTED_SUMMARIES_STORE, WEARABLES_FILENAME, chats_curated
+
+WAL_STORES = {"wearables": "wal/wearables", "chats": "wal/chats"}
+LOCK_FILENAME = "wal/.lock"
+CHECKPOINT_FILENAME = "wal/checkpoint.json"
+MAX_BATCH = 1000
+COMPACT_INTERVAL_SECONDS = 30
+# Compact early once this many records are waiting
+COMPACT_RECORDS = 10_000
+
+MEMBER_FIELDS = ["member_id", "member_name"]
+WEARABLE_NUMERIC_COLUMNS = ['sleep_score_100', 'hrv_ms', 'rhr_bpm', 'respiratory_rate_brpm', 'strain_score_21', 'recovery_score_pct']
+WEARABLE_COLUMNS = ["date", "device"] + WEARABLE_NUMERIC_COLUMNS + ["notes"]
+
+# The derived outputs (INGESTED_METRICS_FILENAME, INGESTED_SUMMARIES_STORE) are
+# updated by the scripts, run from the repository root, after each compaction.
+# How far (in chat sequence numbers) the derived outputs are up to date
+DERIVED_STATE_FILENAME = "ingested/derived.json"
+DERIVED_LOCK_FILENAME = "ingested/.derived.lock"
+DERIVED_INPUT_FILENAME = "ingested/derived_input.jsonl"
+
+
+def wal_manifest(kind: str) -> str:
+    """The manifest of a kind's log, relative to the data directory (versions responses that merge it)"""
+    return manifest_path(WAL_STORES[kind])
+
+
+# --- Validation ---
+
+def batch_items(payload, field: str) -> list:
+    """The items of a request body: a JSON array, or an object with the array under field"""
+    items = payload.get(field) if isinstance(payload, dict) else payload
+    if not isinstance(items, list) or not items:
+        raise ValueError(f'Body must be a non-empty JSON array or an object with a non-empty "{field}" array')
+    if len(items) > MAX_BATCH:
+        raise ValueError(f"At most {MAX_BATCH} {field} per request")
+    return items
+
+
+def _date(value, where: str) -> str:
+    try:
+        return date.fromisoformat(value).isoformat()
+    except (TypeError, ValueError):
+        raise ValueError(f"{where}.date must be a date (YYYY-MM-DD)")
+
+
+def _text(item: dict, field: str, where: str, required: bool = False):
+    value = item.get(field)
+    if value is None and not required:
+        return None
+    if not isinstance(value, str) or (required and not value.strip()):
+        raise ValueError(f"{where}.{field} must be {'a non-empty' if required else 'a'} string")
+    return value
+
+
+def validate_readings(payload, member_id: str, member_name: str) -> list:
+    """Wearable readings for the log; raises ValueError describing the first invalid item"""
+    records = []
+    for i, item in enumerate(batch_items(payload, "readings")):
+        where = f"readings[{i}]"
+        if not isinstance(item, dict):
+            raise ValueError(f"{where} must be an object")
+        unknown = [field for field in item if field not in WEARABLE_COLUMNS]
+        if unknown:
+            raise ValueError(f"{where} has unknown fields: {', '.join(unknown)}")
+        record = {"member_id": member_id, "member_name": member_name, "date": _date(item.get("date"), where),
+                  "device": _text(item, "device", where)}
+        for field in WEARABLE_NUMERIC_COLUMNS:
+            value = item.get(field)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value)):
+                raise ValueError(f"{where}.{field} must be a number or null")
+            record[field] = value
+        if all(record[field] is None for field in WEARABLE_NUMERIC_COLUMNS):
+            raise ValueError(f"{where} has no readings")
+        record["notes"] = _text(item, "notes", where)
+        records.append(record)
+    return records
+
+
+def validate_messages(payload, member_id: str, member_name: str) -> list:
+    """Chat messages for the log, in the generated chat schema; raises ValueError describing the first invalid item"""
+    records = []
+    for i, item in enumerate(batch_items(payload, "messages")):
+        where = f"messages[{i}]"
+        if not isinstance(item, dict):
+            raise ValueError(f"{where} must be an object")
+        timestamp = _text(item, "timestamp", where)
+        if timestamp is not None:
+            try:
+                time.strptime(timestamp, "%H:%M")
+            except ValueError:
+                raise ValueError(f"{where}.timestamp must be a time (HH:MM)")
+        sender = _text(item, "sender", where, required=True)
+        role = _text(item, "role", where)
+        if role is None:
+            if sender != member_name:
+                raise ValueError(f"{where}.role is required for messages not sent by {member_name}")
+            role = MEMBER_ROLE
+        text = item.get("text") if item.get("text") is not None else item.get("message")
+        if not isinstance(text, str) or not text.strip():
+            raise ValueError(f"{where}.text must be a non-empty string")
+        records.append({
+            "member_id": member_id, "member": member_name, "date": _date(item.get("date"), where),
+            "timestamp": timestamp, "sender": sender, "role": role, "text": text,
+        })
+    return records
+
+
+def unlogged(record: dict) -> dict:
+    """A logged record without its sequence number"""
+    return {field: value for field, value in record.items() if field != "seq"}
+
+
+def change_event(kind: str, record: dict) -> tuple:
+    """(type, data) of the event announcing a logged record to the member's event stream"""
+    if kind == "chats":
+        return "chat", {"message": record}
+    return "wearable", {"reading": {field: value for field, value in record.items() if field not in MEMBER_FIELDS}}
+
+
+# --- Compaction into the main files ---
+
+def csv_columns(path: str) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path, newline="", encoding="utf-8") as f:
+        return next(csv.reader(f), [])
+
+
+def csv_rows(records: list, columns: list, default_member_id: str) -> list:
+    """Logged readings as wearables.csv rows, with the file's columns plus any new ones.
+
+    A single-member file has no member columns; the default member's readings
+    are written to it without them.
+    """
+    columns = columns or WEARABLE_COLUMNS
+    rows = [
+        {field: value for field, value in record.items() if field in columns or field not in MEMBER_FIELDS}
+        if record.get("member_id") == default_member_id else record
+        for record in records
+    ]
+    all_columns = list(columns) + [field for field in dict.fromkeys(chain.from_iterable(rows)) if field not in columns]
+    return [{column: row.get(column) for column in all_columns} for row in rows]
+
+
+def _csv_row(row: dict) -> dict:
+    return {field: "" if value is None else value for field, value in row.items()}
+
+
+def append_csv(path: str, rows: list):
+    """Append rows (all with the same fields) to a CSV file, rewriting it once if they bring new columns"""
+    columns = csv_columns(path)
+    fields = list(rows[0])
+    if columns and fields != columns:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(path, newline="", encoding="utf-8") as src, open(tmp_path, "w", newline="", encoding="utf-8") as dst:
+            writer = csv.DictWriter(dst, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(csv.DictReader(src))
+            writer.writerows(_csv_row(row) for row in rows)
+        os.replace(tmp_path, path)
+        return
+
+    if columns:
+        # A file without a trailing newline would join its last row with the first new one
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            missing_newline = f.read(1) != b"\n"
+        if missing_newline:
+            with open(path, "ab") as f:
+                f.write(b"\n")
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        if not columns:
+            writer.writeheader()
+        writer.writerows(_csv_row(row) for row in rows)
+
+
+def derived_update_commands(data_dir: str, log_paths: list, new_path: str = None) -> list:
+    """(kind, command) of each derived output: an update from the messages at new_path, just
+    appended to the chat log at log_paths, or without new_path a rebuild from the whole log"""
+    metrics = os.path.join(data_dir, INGESTED_METRICS_FILENAME)
+    summaries = os.path.join(data_dir, INGESTED_SUMMARIES_STORE)
+    if new_path is None:
+        return [
+            ("ingested-internal-metrics", ["scripts/compute_internal_metrics.py", "--full", "--log", *log_paths, "--output", metrics]),
+            ("ingested-persona-summaries", ["scripts/generate_persona_summaries.py", "--input", *log_paths, "--output", summaries]),
+        ]
+    return [
+        ("ingested-internal-metrics", ["scripts/compute_internal_metrics.py", "--new", new_path, "--log", *log_paths, "--output", metrics]),
+        ("ingested-persona-summaries", ["scripts/generate_persona_summaries.py", "--update", "--input", new_path, "--log", *log_paths, "--output", summaries]),
+    ]
+
+
+def _read_json(path: str):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_json(path: str, value):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(value, f)
+    os.replace(tmp_path, path)
+
+
+def _write_jsonl(path: str, records: list):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def _store_length(store: JsonlStore) -> int:
+    return sum(segment["records"] for segment in store.segments())
+
+
+class IngestLog:
+    """The write-ahead log of one data directory and its background compactor.
+
+    Appends and compactions hold a lock that is shared across processes, so
+    several backend workers can serve the same data directory.
+    """
+
+    def __init__(self, data_dir: str, member_store, interval: float = COMPACT_INTERVAL_SECONDS):
+        self.data_dir = data_dir
+        self.member_store = member_store
+        self.interval = interval
+        self._start_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        for directory in ("wal", "ingested"):
+            os.makedirs(self._path(directory), exist_ok=True)
+        self._lock = FileLock(self._path(LOCK_FILENAME))
+        # Derived updates run outside the log's lock, so they do not hold up appends
+        self._derived_lock = FileLock(self._path(DERIVED_LOCK_FILENAME))
+        self.events = EventLog(self._path(EVENTS_STORE))
+        # The log's stores are created by their first append; readers treat missing ones as empty
+        with self._lock:
+            interrupted = self._interrupted()
+        # Finish a compaction cut short by a crash before anything is served
+        if interrupted:
+            self.compact()
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.data_dir, filename)
+
+    def _checkpoint(self) -> dict:
+        checkpoint = _read_json(self._path(CHECKPOINT_FILENAME)) or {}
+        checkpoint.setdefault("applied", dict.fromkeys(WAL_STORES, 0))
+        return checkpoint
+
+    def _logged(self, kind: str) -> list:
+        reader = open_store(self._path(WAL_STORES[kind]))
+        if reader is None:
+            return []
+        try:
+            return reader.records()
+        finally:
+            reader.close()
+
+    def _interrupted(self) -> bool:
+        """Whether a batch was left half-written, or compacted but not yet removed from the log"""
+        checkpoint = self._checkpoint()
+        if "batch" in checkpoint:
+            return True
+        for kind in WAL_STORES:
+            records = self._logged(kind)
+            if records and records[0]["seq"] <= checkpoint["applied"][kind]:
+                return True
+        return False
+
+    def pending_count(self, kind: str) -> int:
+        reader = open_store(self._path(WAL_STORES[kind]))
+        return len(reader) if reader is not None else 0
+
+    def append(self, kind: str, records: list) -> int:
+        """Log validated records; they are visible to reads as soon as this returns"""
+        with self._lock:
+            wal = JsonlStore(self._path(WAL_STORES[kind]))
+            last = wal.last_record()
+            seq = max(last["seq"] if last else 0, self._checkpoint()["applied"][kind])
+            wal.append({"seq": seq + i, **record} for i, record in enumerate(records, 1))
+            self.events.append([(record["member_id"],) + change_event(kind, record) for record in records])
+        self.start()
+        if self.pending_count(kind) >= COMPACT_RECORDS:
+            self._wake.set()
+        return len(records)
+
+    def start(self):
+        """Start the compactor thread if it is not running"""
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ingest-compactor", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"Error compacting the ingestion log: {e}")
+
+    def compact(self) -> dict:
+        """Move everything in the log into the main files; returns how many records of each kind"""
+        with self._lock:
+            checkpoint = self._checkpoint()
+            applied = checkpoint["applied"]
+            # A batch in the checkpoint was being written when the last compaction stopped
+            batch = checkpoint.get("batch")
+            wal = {kind: self._logged(kind) for kind in WAL_STORES}
+            logged = {
+                kind: [r for r in records if applied[kind] < r["seq"] <= (batch["through"][kind] if batch else math.inf)]
+                for kind, records in wal.items()
+            }
+            if any(logged.values()):
+                if batch is None:
+                    self._apply(logged, applied)
+                else:
+                    self._write_sources(logged, batch, self._default_member_id())
+                    self.member_store.ensure_current()
+                applied = {kind: records[-1]["seq"] if records else applied[kind] for kind, records in logged.items()}
+            if any(logged.values()) or batch is not None:
+                _write_json(self._path(CHECKPOINT_FILENAME), {"applied": applied})
+            for kind, records in wal.items():
+                if records and records[0]["seq"] <= applied[kind]:
+                    JsonlStore(self._path(WAL_STORES[kind])).write(r for r in records if r["seq"] > applied[kind])
+
+        if logged["chats"]:
+            updated = self._update_derived(logged["chats"])
+            members = dict.fromkeys(record["member_id"] for record in logged["chats"])
+            with self._lock:
+                self.events.append([(member_id, "version", {"sections": updated}) for member_id in members])
+                events = open_store(self._path(EVENTS_STORE))
+                if events is not None:
+                    self.events.trim(events)
+                    events.close()
+        return {kind: len(records) for kind, records in logged.items()}
+
+    def _default_member_id(self):
+        self.member_store.ensure_current()
+        return self.member_store.default_member_id()
+
+    def _apply(self, logged: dict, applied: dict):
+        """Write a batch to the files and the member store, recording the files' state first"""
+        path = self._path(WEARABLES_FILENAME)
+        batch = {
+            "through": {kind: records[-1]["seq"] if records else applied[kind] for kind, records in logged.items()},
+            "wearables": {"size": os.path.getsize(path) if os.path.exists(path) else 0, "columns": csv_columns(path)},
+            "chats": _store_length(JsonlStore(self._path(INGESTED_CHATS_STORE))),
+        }
+        _write_json(self._path(CHECKPOINT_FILENAME), {"applied": applied, "batch": batch})
+
+        default_member_id = self._default_member_id()
+        rows = {}
+        if logged["wearables"]:
+            readings = csv_rows([unlogged(r) for r in logged["wearables"]], batch["wearables"]["columns"], default_member_id)
+            rows["wearables"] = [(record["member_id"], row) for record, row in zip(logged["wearables"], readings)]
+        if logged["chats"]:
+            curated = chats_curated(self.data_dir)
+            rows["chats"] = [(record["member_id"], logged_message(record, curated)) for record in logged["chats"]]
+        self.member_store.append_rows(rows, lambda: self._write_sources(logged, batch, default_member_id))
+
+    def _write_sources(self, logged: dict, batch: dict, default_member_id: str):
+        """Append a batch to wearables.csv and the ingested chat store. Idempotent: parts
+        already written by an interrupted attempt are kept or written again from the
+        state the files had before the batch."""
+        if logged["wearables"]:
+            path = self._path(WEARABLES_FILENAME)
+            before = batch["wearables"]
+            # Rewriting the file for new columns is atomic: if it happened, the readings are in
+            if not (before["columns"] and csv_columns(path) != before["columns"]):
+                if os.path.exists(path):
+                    with open(path, "rb+") as f:
+                        f.truncate(before["size"])
+                append_csv(path, csv_rows([unlogged(r) for r in logged["wearables"]], before["columns"], default_member_id))
+        if logged["chats"]:
+            # Appends to a store are atomic, so the batch is either all there or not at all
+            store = JsonlStore(self._path(INGESTED_CHATS_STORE))
+            if _store_length(store) == batch["chats"]:
+                store.append(logged["chats"])
+
+    def _chat_log_paths(self) -> list:
+        """The chat log the ingested messages follow, then the ingested chat store"""
+        if not chats_curated(self.data_dir):
+            base = [self._path(CHATS_STORE)]
+        else:
+            base = [self._path(CHATS_FILENAME)] if os.path.exists(self._path(CHATS_FILENAME)) else []
+        return base + [self._path(INGESTED_CHATS_STORE)]
+
+    def _update_derived(self, messages: list) -> list:
+        """Bring the derived outputs up to date with a compacted batch and return the kinds
+        updated. They are updated from just these messages if they cover every earlier
+        one, else rebuilt; after a failure they are rebuilt with the next batch."""
+        with self._derived_lock:
+            state = _read_json(self._path(DERIVED_STATE_FILENAME)) or {"chats": 0}
+            if messages[-1]["seq"] <= state["chats"]:
+                return []  # covered by a rebuild since
+            log_paths = self._chat_log_paths()
+            path = self._path(DERIVED_INPUT_FILENAME)
+            if state["chats"] == messages[0]["seq"] - 1:
+                _write_jsonl(path, messages)
+                commands = derived_update_commands(self.data_dir, log_paths, path)
+                through = messages[-1]["seq"]
+            else:
+                # Rebuild from the ingested store as of now; batches compacted meanwhile
+                # are added by their own updates
+                reader = open_store(self._path(INGESTED_CHATS_STORE))
+                ingested = reader.records()
+                reader.close()
+                _write_jsonl(path, ingested)
+                commands = derived_update_commands(self.data_dir, log_paths[:-1] + [path])
+                through = ingested[-1]["seq"]
+
+            repo_dir = os.path.dirname(os.path.abspath(self.data_dir))
+            updated = []
+            try:
+                for kind, command in commands:
+                    result = subprocess.run([sys.executable] + command, cwd=repo_dir, capture_output=True, text=True)
+                    if result.returncode != 0:
+                        print(f"Error updating derived outputs with {command[0]}: {result.stderr.strip()}")
+                    else:
+                        updated.append(kind)
+            finally:
+                os.remove(path)
+            if len(updated) == len(commands):
+                _write_json(self._path(DERIVED_STATE_FILENAME), {"chats": through})
+            return updated
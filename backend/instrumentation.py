@@ -0,0 +1,166 @@
+# --- backend/instrumentation.py ---
+# In-process request metrics, exposed in the Prometheus text format by
+# /api/metrics. Histograms and counters are plain dicts of per-label-set
+# values behind one lock, so recording costs a bisect and a few additions.
+#
+# Time spent inside a request is broken down into phases (load, transform,
+# serialize) with the phase() context manager. Phases are exclusive: a phase
+# opened inside another pauses it, so e.g. a CSV load inside a transform is
+# counted as load only. Each process keeps its own metrics.
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PHASES = ("load", "transform", "serialize")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [per-bucket counts (last is +Inf), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            entries = sorted((key, list(counts), total) for key, (counts, total) in self._values.items())
+        for key, counts, total in entries:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, *args, **kwargs) -> Counter:
+        self.metrics.append(Counter(*args, **kwargs))
+        return self.metrics[-1]
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        self.metrics.append(Histogram(*args, **kwargs))
+        return self.metrics[-1]
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# --- Request phases ---
+
+class RequestTimings:
+    """Seconds per phase of one request, collected from every thread working on it"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def add(self, phase_name: str, seconds: float):
+        with self._lock:
+            self.seconds[phase_name] = self.seconds.get(phase_name, 0.0) + seconds
+
+
+_current = ContextVar("request_timings", default=None)
+
+
+def start_request():
+    """Begin timing a request in the current context; returns a token for end_request"""
+    return _current.set(RequestTimings())
+
+
+def end_request(token) -> RequestTimings:
+    timings = _current.get()
+    _current.reset(token)
+    return timings
+
+
+@contextmanager
+def phase(name: str):
+    """Count the enclosed time towards a phase of the current request (a no-op outside one)"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    stack = timings.stack()
+    now = time.perf_counter()
+    if stack:
+        timings.add(stack[-1][0], now - stack[-1][1])
+    stack.append([name, now])
+    try:
+        yield
+    finally:
+        now = time.perf_counter()
+        timings.add(name, now - stack.pop()[1])
+        if stack:
+            stack[-1][1] = now
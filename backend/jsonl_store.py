@@ -0,0 +1,269 @@
+# --- backend/jsonl_store.py ---
+# Append-only JSONL storage for the pipeline outputs, shared by the scripts and
+# the backend. A store is a directory of segments holding one JSON record per
+# line, a sidecar index per segment with the byte range of every (member, date)
+# run of records, and a manifest of how many bytes of each segment are committed:
+#
+#   data/chats/manifest.json   {"segments": [{"name": "000000.jsonl", "size": ..., "records": ...}]}
+#   data/chats/000000.jsonl    records in write order, one per line
+#   data/chats/000000.idx      [[member_id, date, start, end], ...]
+#
+# Writers append to the last segment and then replace its sidecar and the
+# manifest atomically, so readers never see a partial record. Readers
+# memory-map the segments and parse only the byte ranges a lookup needs.
+
+import json
+import mmap
+import os
+from bisect import bisect_left
+
+MANIFEST_FILENAME = "manifest.json"
+SEGMENT_BYTES = 64 * 1024 * 1024
+
+
+def default_key(record: dict) -> tuple:
+    return str(record.get("member_id") or ""), str(record.get("date") or "")
+
+
+def manifest_path(path: str) -> str:
+    return os.path.join(path, MANIFEST_FILENAME)
+
+
+def _sidecar_path(path: str, segment_name: str) -> str:
+    return os.path.join(path, os.path.splitext(segment_name)[0] + ".idx")
+
+
+def _read_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_json_atomic(path, value):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(value, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+class RecordList(list):
+    """Parsed records, with the size of their serialized form for cache budgets"""
+    nbytes = 0
+
+
+def _parse_lines(chunk: bytes) -> list:
+    # Serialized records never contain a raw newline, so a run of lines is one array
+    chunk = chunk.rstrip(b"\n")
+    return json.loads(b"[" + chunk.replace(b"\n", b",") + b"]") if chunk else []
+
+
+def _last_line(mapped, size: int) -> dict:
+    start = mapped.rfind(b"\n", 0, size - 1) + 1
+    return json.loads(mapped[start:size])
+
+
+class _SegmentWriter:
+    """Appends lines to one segment, tracking its size, record count and runs"""
+
+    def __init__(self, path: str, segment: dict, key):
+        self.path = path
+        self.segment = segment
+        self.key = key
+        self.file = open(os.path.join(path, segment["name"]), "ab" if segment["size"] else "wb")
+        # Drop bytes of an append that never made it into the manifest. Only then: Windows
+        # refuses to truncate a file that readers have mapped, even to its own size.
+        if os.fstat(self.file.fileno()).st_size > segment["size"]:
+            self.file.truncate(segment["size"])
+        self.file.seek(segment["size"])
+        sidecar = _sidecar_path(path, segment["name"])
+        runs = _read_json(sidecar) if segment["size"] and os.path.exists(sidecar) else []
+        self.runs = [run for run in runs if run[3] <= segment["size"]]
+
+    def write(self, record: dict):
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        member, date = self.key(record)
+        start = self.segment["size"]
+        self.file.write(line)
+        end = self.segment["size"] = start + len(line)
+        self.segment["records"] += 1
+        last = self.runs[-1] if self.runs else None
+        if last and last[0] == member and last[1] == date and last[3] == start:
+            last[3] = end
+        else:
+            self.runs.append([member, date, start, end])
+
+    def close(self):
+        self.file.close()
+        _write_json_atomic(_sidecar_path(self.path, self.segment["name"]), self.runs)
+
+
+class JsonlStore:
+    """Writes a store directory. key maps a record to the (member_id, date) it is indexed under.
+
+    There must be one writer per store at a time; any number of JsonlReaders
+    may read it meanwhile.
+    """
+
+    def __init__(self, path: str, key=default_key, segment_bytes: int = SEGMENT_BYTES):
+        self.path = path
+        self.key = key
+        self.segment_bytes = segment_bytes
+
+    def exists(self) -> bool:
+        return os.path.exists(manifest_path(self.path))
+
+    def segments(self) -> list:
+        return _read_json(manifest_path(self.path))["segments"] if self.exists() else []
+
+    def last_record(self):
+        """The last committed record, or None if the store is empty"""
+        for segment in reversed(self.segments()):
+            if segment["size"]:
+                with open(os.path.join(self.path, segment["name"]), "rb") as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    return _last_line(mapped, segment["size"])
+                finally:
+                    mapped.close()
+        return None
+
+    def append(self, records) -> int:
+        """Append records (any iterable, written as it is consumed) and return how many"""
+        return self._write(records, self.segments(), replace=False)
+
+    def write(self, records) -> int:
+        """Replace the store's contents with records and return how many.
+
+        The new segments become visible at once when the manifest is replaced;
+        the old ones are removed afterwards, or by a later write while readers
+        still have them mapped (Windows does not remove mapped files).
+        """
+        return self._write(records, self.segments(), replace=True)
+
+    def _write(self, records, segments: list, replace: bool) -> int:
+        os.makedirs(self.path, exist_ok=True)
+        next_number = max((int(s["name"].split(".")[0]) for s in segments), default=-1) + 1
+        kept = [] if replace else [dict(s) for s in segments]
+
+        writer = None
+        if kept and kept[-1]["size"] < self.segment_bytes:
+            writer = _SegmentWriter(self.path, kept[-1], self.key)
+        count = 0
+        try:
+            for record in records:
+                if writer is None or writer.segment["size"] >= self.segment_bytes:
+                    if writer is not None:
+                        writer.close()
+                    kept.append({"name": f"{next_number:06d}.jsonl", "size": 0, "records": 0})
+                    next_number += 1
+                    writer = _SegmentWriter(self.path, kept[-1], self.key)
+                writer.write(record)
+                count += 1
+        finally:
+            if writer is not None:
+                writer.close()
+
+        _write_json_atomic(manifest_path(self.path), {"segments": kept})
+        self._remove_stale({os.path.splitext(s["name"])[0] for s in kept})
+        return count
+
+    def _remove_stale(self, current: set):
+        """Remove the segments and sidecars of earlier contents that no reader maps any more"""
+        for name in os.listdir(self.path):
+            stem, ext = os.path.splitext(name)
+            if ext in (".jsonl", ".idx") and stem not in current:
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except PermissionError:
+                    pass  # still mapped by a reader; removed by the next write
+
+
+class JsonlReader:
+    """Memory-mapped view of a store as of its manifest when opened.
+
+    The index of every segment is loaded up front; record bytes are only read
+    (and parsed) for the runs a lookup returns.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.segments = _read_json(manifest_path(path))["segments"]
+        self._maps = []
+        runs = {}
+        for number, segment in enumerate(self.segments):
+            mapped = None
+            if segment["size"]:
+                with open(os.path.join(path, segment["name"]), "rb") as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps.append(mapped)
+            for member, date, start, end in _read_json(_sidecar_path(path, segment["name"])) if mapped else []:
+                if end <= segment["size"]:
+                    runs.setdefault(member, []).append((date, number, start, end))
+        # Date order, and write order within a date
+        for member_runs in runs.values():
+            member_runs.sort()
+        self._runs = runs
+        self._dates = {member: [run[0] for run in member_runs] for member, member_runs in runs.items()}
+        self.record_count = sum(segment["records"] for segment in self.segments)
+        # Rough in-memory size of the index, used by the data store's eviction budget
+        # (the mapped pages belong to the OS page cache)
+        self.nbytes = sum(len(member_runs) for member_runs in runs.values()) * 120
+
+    def __len__(self):
+        return self.record_count
+
+    def members(self) -> list:
+        return list(self._runs)
+
+    def has_member(self, member_id: str) -> bool:
+        return member_id in self._runs
+
+    def read(self, member_id: str, date_from: str = None, date_to: str = None) -> list:
+        """One member's records with date_from <= date <= date_to (inclusive, either may be None),
+        in date order"""
+        member_runs = self._runs.get(member_id)
+        if not member_runs:
+            return []
+        dates = self._dates[member_id]
+        first = bisect_left(dates, date_from) if date_from else 0
+        # date_to is inclusive: "2025-09-01" also covers "2025-09-01T18:00"
+        last = bisect_left(dates, date_to + "\uffff") if date_to else len(dates)
+        records = []
+        for _, number, start, end in member_runs[first:last]:
+            records.extend(_parse_lines(self._maps[number][start:end]))
+        return records
+
+    def records(self) -> RecordList:
+        """Every record, in write order"""
+        records = RecordList()
+        for mapped, segment in zip(self._maps, self.segments):
+            if mapped is not None:
+                records.extend(_parse_lines(mapped[:segment["size"]]))
+                records.nbytes += segment["size"]
+        return records
+
+    def last(self):
+        """The last record, or None if the store is empty"""
+        for mapped, segment in zip(reversed(self._maps), reversed(self.segments)):
+            if mapped is not None:
+                return _last_line(mapped, segment["size"])
+        return None
+
+    def iter_records(self):
+        """Every record in write order, parsed one line at a time"""
+        for mapped, segment in zip(self._maps, self.segments):
+            start, size = 0, segment["size"]
+            while mapped is not None and start < size:
+                end = mapped.find(b"\n", start, size)
+                yield json.loads(mapped[start:end])
+                start = end + 1
+
+    def close(self):
+        for mapped in self._maps:
+            if mapped is not None:
+                mapped.close()
+        self._maps = []
+
+
+def open_store(path: str):
+    """A JsonlReader for the store at path, or None if it has not been written"""
+    return JsonlReader(path) if os.path.exists(manifest_path(path)) else None
@@ -0,0 +1,74 @@
+# --- backend/llm_backends.py ---
+# Pluggable LLM backends for the AI assistant. "openai" calls the OpenAI API;
+# "stub" answers locally from the prompt so the assistant (including streaming)
+# works offline and in tests. Selected with the LLM_BACKEND environment variable.
+
+import os
+import re
+import time
+
+import openai
+
+
+class OpenAIBackend:
+    name = "openai"
+
+    def complete(self, messages, **params):
+        """Full completion text and token usage"""
+        response = openai.chat.completions.create(messages=messages, **params)
+        usage = getattr(response, "usage", None)
+        return response.choices[0].message.content, {
+            "prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "completion_tokens": getattr(usage, "completion_tokens", None),
+        }
+
+    def stream(self, messages, **params):
+        """Yield text deltas as they arrive.
+
+        Closing the generator (e.g. when the client disconnects) closes the
+        upstream HTTP stream, which cancels the generation.
+        """
+        upstream = openai.chat.completions.create(messages=messages, stream=True, **params)
+        try:
+            for chunk in upstream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            upstream.close()
+
+
+class StubBackend:
+    """Deterministic offline backend that quotes the first retrieved record"""
+
+    name = "stub"
+
+    def __init__(self, token_delay=0.0):
+        self.token_delay = token_delay
+
+    def _answer(self, messages):
+        prompt = messages[-1]["content"]
+        query = re.search(r"User Query: (.*)", prompt)
+        record = re.search(r"^\s*\[1\] (.*)$", prompt, re.MULTILINE)
+        answer = f"(offline stub) You asked: {query.group(1).strip() if query else ''}."
+        if record:
+            answer += f" The most relevant record is [1] {record.group(1).strip()}"
+        return answer
+
+    def complete(self, messages, **params):
+        answer = self._answer(messages)
+        return answer, {"prompt_tokens": None, "completion_tokens": len(answer.split())}
+
+    def stream(self, messages, **params):
+        for word in re.findall(r"\S+\s*", self._answer(messages)):
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            yield word
+
+
+def get_backend(name=None):
+    name = name or os.getenv("LLM_BACKEND", "openai")
+    if name == "openai":
+        return OpenAIBackend()
+    if name == "stub":
+        return StubBackend(token_delay=float(os.getenv("LLM_STUB_TOKEN_DELAY", "0")))
+    raise ValueError(f"Unknown LLM backend: {name}")
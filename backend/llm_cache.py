@@ -0,0 +1,111 @@
+# --- backend/llm_cache.py ---
+# Response cache in front of the LLM call. Entries are keyed on the normalized
+# query, the model parameters and a hash of the data files behind the context,
+# so any data change makes old answers unreachable.
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_query(query: str) -> str:
+    """Case, whitespace and trailing punctuation do not change the answer"""
+    return re.sub(r"\s+", " ", query).strip().lower().rstrip("?!. ")
+
+
+def data_version_hash(versions) -> str:
+    """Short hash of data file versions, e.g. DataStore.versions(...)"""
+    return hashlib.sha256(json.dumps(versions, default=list).encode("utf-8")).hexdigest()[:16]
+
+
+def cache_key(query: str, model_params: dict, data_version: str) -> str:
+    payload = json.dumps(
+        {"query": normalize_query(query), "params": model_params, "data": data_version},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """In-memory LRU tier with a TTL, optionally backed by a SQLite tier on disk"""
+
+    def __init__(self, max_entries=512, ttl_seconds=3600, db_path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._memory = OrderedDict()  # key -> (created, response)
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+        if db_path:
+            self._execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, created REAL NOT NULL, response TEXT NOT NULL)"
+            )
+
+    def _execute(self, *statements):
+        """Run (sql, params) statements in one transaction on the disk tier; rows of the last one"""
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                for statement in statements:
+                    sql, params = statement if isinstance(statement, tuple) else (statement, ())
+                    rows = conn.execute(sql, params).fetchall()
+            return rows
+        finally:
+            conn.close()
+
+    def _expired(self, created):
+        return self.ttl_seconds and time.time() - created > self.ttl_seconds
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0]):
+                    self._memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return entry[1]
+                del self._memory[key]
+
+        if self.db_path:
+            rows = self._execute(("SELECT created, response FROM llm_cache WHERE key = ?", (key,)))
+            row = rows[0] if rows else None
+            if row and not self._expired(row[0]):
+                with self._lock:
+                    self._remember(key, row[0], row[1])
+                    self.counters["disk_hits"] += 1
+                return row[1]
+
+        with self._lock:
+            self.counters["misses"] += 1
+        return None
+
+    def put(self, key: str, response: str):
+        created = time.time()
+        with self._lock:
+            self._remember(key, created, response)
+            self.counters["stores"] += 1
+        if self.db_path:
+            statements = [("INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?)", (key, created, response))]
+            if self.ttl_seconds:
+                statements.append(("DELETE FROM llm_cache WHERE created < ?", (created - self.ttl_seconds,)))
+            self._execute(*statements)
+
+    def _remember(self, key, created, response):
+        self._memory[key] = (created, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            hits = lookups - self.counters["misses"]
+            return {
+                **self.counters,
+                "entries": len(self._memory),
+                "hit_rate": round(hits / lookups, 4) if lookups else None,
+            }
@@ -0,0 +1,352 @@
+# --- backend/member_store.py ---
+# Per-member SQLite store built from the files in data/. Every table is keyed by
+# member_id (and date where the data has one) and indexed on it, so serving one
+# member reads only that member's rows instead of filtering a whole-cohort file.
+
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+
+import pandas as pd
+
+from chat_index import logged_message
+from file_lock import FileLock
+from jsonl_store import manifest_path, open_store
+
+MEMBER_DB_FILENAME = "members.db"
+PROFILES_FILENAME = "member_profiles.json"
+CHATS_FILENAME = "chat_data.json"
+# Generated chats are a JSONL store (jsonl_store.py), read instead of chat_data.json when present
+CHATS_STORE = "chats"
+# Messages compacted from the ingestion log (ingest.py), shown after the chat log in its schema
+INGESTED_CHATS_STORE = "ingested/chats"
+BIOMARKERS_FILENAME = "biomarkers.csv"
+WEARABLES_FILENAME = "wearables.csv"
+
+# Whole-document files, stored per member under their API name
+DOCUMENT_FILES = {
+    "test-reports": "test_panel.json",
+    "diagnostics": "diagnostics_plan.json",
+    "internal-metrics": "internal_metrics.json",
+    "persona-summaries": "persona_summaries.json",
+    "decisions": "decisions.json",
+}
+
+# Documents generated by the pipeline as JSONL stores, read instead of the curated file when present
+DOCUMENT_STORES = {
+    "persona-summaries": "persona_summaries",
+    "decisions": "decisions",
+}
+
+# Documents derived from the chat log including the ingested messages (ingest.py),
+# merged over the curated or generated ones when present
+INGESTED_METRICS_FILENAME = "ingested/internal_metrics.json"
+INGESTED_SUMMARIES_STORE = "ingested/persona_summaries"
+
+SOURCE_FILES = (
+    [PROFILES_FILENAME, CHATS_FILENAME, BIOMARKERS_FILENAME, WEARABLES_FILENAME] + list(DOCUMENT_FILES.values())
+    + [INGESTED_METRICS_FILENAME]
+    + [manifest_path(store) for store in [CHATS_STORE, INGESTED_CHATS_STORE, INGESTED_SUMMARIES_STORE] + list(DOCUMENT_STORES.values())]
+)
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE members (member_id TEXT PRIMARY KEY, name TEXT NOT NULL, position INTEGER NOT NULL, profile TEXT NOT NULL);
+CREATE TABLE chats (member_id TEXT NOT NULL, date TEXT, seq INTEGER NOT NULL, body TEXT NOT NULL);
+CREATE INDEX chats_member_date ON chats (member_id, date, seq);
+CREATE TABLE biomarkers (member_id TEXT NOT NULL, date TEXT, seq INTEGER NOT NULL, body TEXT NOT NULL);
+CREATE INDEX biomarkers_member_date ON biomarkers (member_id, date, seq);
+CREATE TABLE wearables (member_id TEXT NOT NULL, date TEXT, seq INTEGER NOT NULL, body TEXT NOT NULL);
+CREATE INDEX wearables_member_date ON wearables (member_id, date, seq);
+CREATE TABLE documents (member_id TEXT NOT NULL, kind TEXT NOT NULL, body TEXT NOT NULL, PRIMARY KEY (member_id, kind));
+"""
+
+
+def member_id_for(profile: dict) -> str:
+    """Stable URL-safe id for a member profile ("Rohan Patel" -> "rohan-patel")"""
+    if profile.get("member_id"):
+        return str(profile["member_id"])
+    return re.sub(r"[^a-z0-9]+", "-", profile["name"].lower()).strip("-")
+
+
+def record_key(record: dict, date_field: str = "date") -> tuple:
+    """(member_id, date) a record is indexed under in a JSONL store; member names are slugified"""
+    member = record.get("member_id")
+    if not member:
+        name = record["member"] if "member" in record else record.get("member_name")
+        member = member_id_for({"name": name}) if name else ""
+    return str(member), str(record.get(date_field) or "")
+
+
+def _clean(value):
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def chats_curated(data_dir: str) -> bool:
+    """Whether the chat log is the curated chat_data.json, i.e. no chat store has been generated"""
+    return not os.path.exists(os.path.join(data_dir, manifest_path(CHATS_STORE)))
+
+
+def _load_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class _MemberResolver:
+    """Maps the member fields found in data files to member ids"""
+
+    def __init__(self, profiles):
+        self.default_id = member_id_for(profiles[0]) if profiles else None
+        self.by_key = {}
+        for profile in profiles:
+            member_id = member_id_for(profile)
+            self.by_key[member_id] = member_id
+            self.by_key[profile["name"]] = member_id
+
+    def resolve(self, record: dict, sender_field=None):
+        for field in ("member_id", "member_name", "member"):
+            value = record.get(field)
+            if value in self.by_key:
+                return self.by_key[value]
+        # Generated chat logs only tag the member on their own messages
+        if sender_field and record.get(sender_field) in self.by_key:
+            return self.by_key[record[sender_field]]
+        return self.default_id
+
+
+def merge_documents(document, ingested):
+    """A document with its ingested counterpart merged over it. The ingested one is
+    derived from the whole chat log, so it replaces a document of the same shape; its
+    keys are added to a curated dict, and its records kept under "summaries" there."""
+    if ingested is None:
+        return document
+    if isinstance(document, dict):
+        return {**document, **ingested} if isinstance(ingested, dict) else {**document, "summaries": ingested}
+    return ingested
+
+
+def _read_document(data_dir: str, kind: str):
+    """A document kind's generated store if present, else its curated file (None if neither exists)"""
+    store = open_store(os.path.join(data_dir, DOCUMENT_STORES[kind])) if kind in DOCUMENT_STORES else None
+    return store.records() if store is not None else _load_json(os.path.join(data_dir, DOCUMENT_FILES[kind]))
+
+
+def _read_ingested_document(data_dir: str, kind: str):
+    if kind == "internal-metrics":
+        return _load_json(os.path.join(data_dir, INGESTED_METRICS_FILENAME))
+    if kind == "persona-summaries":
+        store = open_store(os.path.join(data_dir, INGESTED_SUMMARIES_STORE))
+        return store.records() if store is not None else None
+    return None
+
+
+def _per_member(document, resolver: _MemberResolver) -> dict:
+    """member_id -> that member's part of a document"""
+    if document is None:
+        return {}
+    # Curated documents describe the default member unless they are lists of member-tagged records
+    if isinstance(document, list) and document and all(isinstance(r, dict) and "member_name" in r for r in document):
+        per_member = {}
+        for record in document:
+            per_member.setdefault(resolver.resolve(record), []).append(record)
+        return per_member
+    return {resolver.default_id: document}
+
+
+def _document_rows(data_dir: str, kind: str, resolver: _MemberResolver) -> list:
+    """(member_id, kind, body) rows of one document kind"""
+    documents = _per_member(_read_document(data_dir, kind), resolver)
+    ingested = _per_member(_read_ingested_document(data_dir, kind), resolver)
+    rows = [
+        (member_id, kind, json.dumps(merge_documents(documents.get(member_id), ingested.get(member_id))))
+        for member_id in {**documents, **ingested}
+    ]
+    return [r for r in rows if r[0]]
+
+
+def build_member_store(data_dir: str, db_path: str = None):
+    """Rebuild the member database from the source files in data_dir"""
+    db_path = db_path or os.path.join(data_dir, MEMBER_DB_FILENAME)
+    profiles = _load_json(os.path.join(data_dir, PROFILES_FILENAME)) or []
+    resolver = _MemberResolver(profiles)
+
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        conn.executemany(
+            "INSERT INTO members VALUES (?, ?, ?, ?)",
+            [(member_id_for(p), p["name"], i, json.dumps(p)) for i, p in enumerate(profiles)]
+        )
+
+        chat_store = open_store(os.path.join(data_dir, CHATS_STORE))
+        if chat_store is not None:
+            messages = chat_store.records()
+        else:
+            chat_data = _load_json(os.path.join(data_dir, CHATS_FILENAME)) or []
+            messages = chat_data.get("communications", []) if isinstance(chat_data, dict) else chat_data
+        rows = [(resolver.resolve(m, "sender"), m.get("date"), json.dumps(m)) for m in messages]
+        ingested = open_store(os.path.join(data_dir, INGESTED_CHATS_STORE))
+        if ingested is not None:
+            curated = chat_store is None
+            rows += [(m["member_id"], m["date"], json.dumps(logged_message(m, curated))) for m in ingested.iter_records()]
+        conn.executemany(
+            "INSERT INTO chats VALUES (?, ?, ?, ?)",
+            [(member_id, date, i, body) for i, (member_id, date, body) in enumerate(rows)]
+        )
+
+        for table, filename in (("biomarkers", BIOMARKERS_FILENAME), ("wearables", WEARABLES_FILENAME)):
+            path = os.path.join(data_dir, filename)
+            if not os.path.exists(path):
+                continue
+            records = pd.read_csv(path).to_dict("records")
+            rows = []
+            for i, record in enumerate(records):
+                record = {key: _clean(value) for key, value in record.items()}
+                rows.append((resolver.resolve(record), record.get("date"), i, json.dumps(record)))
+            conn.executemany(f"INSERT INTO {table} VALUES (?, ?, ?, ?)", rows)
+
+        for kind in DOCUMENT_FILES:
+            conn.executemany("INSERT INTO documents VALUES (?, ?, ?)", _document_rows(data_dir, kind, resolver))
+
+        conn.execute("INSERT INTO meta VALUES ('source_versions', ?)", (json.dumps(source_versions(data_dir)),))
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+
+
+def source_versions(data_dir: str) -> dict:
+    versions = {}
+    for filename in SOURCE_FILES:
+        try:
+            stat = os.stat(os.path.join(data_dir, filename))
+            versions[filename] = [stat.st_mtime_ns, stat.st_size]
+        except OSError:
+            versions[filename] = None
+    return versions
+
+
+class MemberStore:
+    """Read access to the member database, rebuilt when the source files change"""
+
+    def __init__(self, data_dir: str, db_path: str = None):
+        self.data_dir = data_dir
+        self.db_path = db_path or os.path.join(data_dir, MEMBER_DB_FILENAME)
+        self._local = threading.local()
+        # Shared with other processes, so none rebuilds between another's file append and insert
+        self._lock = FileLock(self.db_path + ".lock")
+
+    def ensure_current(self):
+        """Rebuild the database if any source file changed since it was built"""
+        with self._lock:
+            self._ensure_current()
+
+    def _ensure_current(self):
+        if self._stored_versions() != source_versions(self.data_dir):
+            build_member_store(self.data_dir, self.db_path)
+
+    def append_rows(self, rows_by_table: dict, write_sources):
+        """Append rows to the source files with write_sources() and insert them into the
+        database, recording the files' new versions, so it stays current without a rebuild.
+
+        rows_by_table maps chats/wearables/biomarkers to (member_id, record) pairs. Both
+        steps run under the store's lock once it is current, so no rebuild sees the rows
+        in the files before they are inserted (and inserts them a second time).
+        """
+        with self._lock:
+            self._ensure_current()
+            write_sources()
+            conn = sqlite3.connect(self.db_path)
+            try:
+                for table, rows in rows_by_table.items():
+                    if table not in ("chats", "biomarkers", "wearables"):
+                        raise ValueError(f"Unknown table: {table}")
+                    start = conn.execute(f"SELECT COALESCE(MAX(seq), -1) + 1 FROM {table}").fetchone()[0]
+                    conn.executemany(f"INSERT INTO {table} VALUES (?, ?, ?, ?)", [
+                        (member_id, record.get("date"), start + i, json.dumps(record))
+                        for i, (member_id, record) in enumerate(rows)
+                    ])
+                conn.execute("UPDATE meta SET value = ? WHERE key = 'source_versions'", (json.dumps(source_versions(self.data_dir)),))
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _stored_versions(self):
+        if not os.path.exists(self.db_path):
+            return None
+        try:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                row = conn.execute("SELECT value FROM meta WHERE key = 'source_versions'").fetchone()
+            finally:
+                conn.close()
+        except sqlite3.DatabaseError:
+            return None
+        return json.loads(row[0]) if row else None
+
+    def _conn(self):
+        # One connection per thread, reopened once a rebuild (by any process) has swapped
+        # the file: an open connection keeps reading the replaced one. Rows inserted in
+        # place are visible to it already.
+        stat = os.stat(self.db_path)
+        file_id = (stat.st_dev, stat.st_ino)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.file_id != file_id:
+            if conn is not None:
+                conn.close()
+            # Identified before opening, so a swap in between only costs one more reopen
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            self._local.conn = conn
+            self._local.file_id = file_id
+        return conn
+
+    def list_members(self) -> list[dict]:
+        rows = self._conn().execute("SELECT member_id, name FROM members ORDER BY position").fetchall()
+        return [{"member_id": member_id, "name": name} for member_id, name in rows]
+
+    def get_profile(self, member_id: str):
+        row = self._conn().execute("SELECT profile FROM members WHERE member_id = ?", (member_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def default_member_id(self):
+        """The first profile's member, which rows without a member field belong to"""
+        row = self._conn().execute("SELECT member_id FROM members ORDER BY position LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def has_member(self, member_id: str) -> bool:
+        return self._conn().execute("SELECT 1 FROM members WHERE member_id = ?", (member_id,)).fetchone() is not None
+
+    def get_rows(self, table: str, member_id: str) -> list[dict]:
+        """All rows of chats/biomarkers/wearables for one member, in date order"""
+        if table not in ("chats", "biomarkers", "wearables"):
+            raise ValueError(f"Unknown table: {table}")
+        rows = self._conn().execute(
+            f"SELECT body FROM {table} WHERE member_id = ? ORDER BY date, seq", (member_id,)
+        ).fetchall()
+        return [json.loads(body) for (body,) in rows]
+
+    def get_document(self, member_id: str, kind: str):
+        row = self._conn().execute(
+            "SELECT body FROM documents WHERE member_id = ? AND kind = ?", (member_id, kind)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+def main():
+    data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+    build_member_store(data_dir)
+    print(f"✅ Member store built at {os.path.join(data_dir, MEMBER_DB_FILENAME)}")
+
+
+if __name__ == "__main__":
+    main()
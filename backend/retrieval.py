@@ -0,0 +1,123 @@
+# --- backend/retrieval.py ---
+# Local BM25 retrieval over the chat log, persona summaries and decisions, used
+# to put the most relevant records into the AI assistant's prompt.
+
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "did", "do", "does", "for", "from", "has", "have",
+    "he", "his", "how", "i", "in", "is", "it", "its", "me", "my", "of", "on", "or", "our", "so", "that",
+    "the", "their", "them", "this", "to", "was", "we", "were", "what", "when", "which", "who", "why",
+    "will", "with", "you", "your",
+}
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (~4 characters per token for English text)"""
+    return max(1, len(text) // 4)
+
+
+def chat_passages(chat_data) -> list[dict]:
+    """One passage per chat message, from either chat schema"""
+    messages = chat_data.get("communications", []) if isinstance(chat_data, dict) else (chat_data or [])
+    passages = []
+    for message in messages:
+        text = message.get("message") or message.get("text") or ""
+        when = " ".join(filter(None, [message.get("date"), message.get("timestamp")]))
+        passages.append({
+            "source": "chat",
+            "label": f"chat {when}".strip(),
+            "text": f"{message.get('sender', 'Unknown')}: {text}",
+        })
+    return passages
+
+
+def _flatten(value, path=""):
+    """Leaf values of a nested record as "path: value" lines"""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _flatten(item, f"{path}.{key}" if path else key)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _flatten(item, path)
+    elif value is not None:
+        yield f"{path}: {value}" if path else str(value)
+
+
+def document_passages(document, source: str) -> list[dict]:
+    """One passage per record of a curated document ({"track": [records]} or [records])"""
+    if isinstance(document, dict):
+        records = [r for value in document.values() if isinstance(value, list) for r in value]
+    else:
+        records = document or []
+
+    passages = []
+    for record in records:
+        if not isinstance(record, dict):
+            continue
+        when = record.get("period") or (f"month {record['month']}" if "month" in record else "")
+        passages.append({
+            "source": source,
+            "label": f"{source} {when}".strip(),
+            "text": "\n".join(_flatten({k: v for k, v in record.items() if k not in ("month", "period")})),
+        })
+    return passages
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of passages, with postings per term"""
+
+    def __init__(self, passages: list[dict], k1: float = 1.5, b: float = 0.75):
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)  # term -> [(passage index, term frequency)]
+        self.lengths = []
+        for i, passage in enumerate(passages):
+            terms = tokenize(passage["text"] + " " + passage["label"])
+            self.lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self.postings[term].append((i, tf))
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        n = len(passages)
+        self.idf = {term: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for term, p in self.postings.items()}
+        # Rough in-memory size, used by the data store's eviction budget
+        self.nbytes = sum(len(p["text"]) * 3 for p in passages)
+
+    def search(self, query: str, k: int) -> list[tuple[float, dict]]:
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for i, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / self.avg_length)
+                scores[i] += idf * tf * (self.k1 + 1) / (tf + norm)
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(score, self.passages[i]) for i, score in best]
+
+
+def pack_context(scored_passages, token_budget: int) -> list[dict]:
+    """Most relevant passages first, skipping any that would exceed the token budget"""
+    packed = []
+    used = 0
+    for _, passage in scored_passages:
+        cost = estimate_tokens(passage["text"]) + 8  # label and separators
+        if used + cost > token_budget:
+            continue
+        packed.append(passage)
+        used += cost
+    return packed
+
+
+def format_context(passages: list[dict]) -> str:
+    """Numbered passages for the prompt, so answers can cite them as [n]"""
+    return "\n\n".join(f"[{i}] ({p['label']}) {p['text']}" for i, p in enumerate(passages, start=1))
@@ -0,0 +1,79 @@
+# --- backend/schedule_index.py ---
+# Interval index over the members' scheduled events (the JSONL store data/schedule,
+# written by scripts/generate_schedule.py, or the curated data/schedule.json until
+# the pipeline has run). A date-range query is two binary
+# searches over the sorted start dates plus a scan of the matches.
+
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+
+SCHEDULE_STORE = "schedule"
+
+
+def parse_date(value: str) -> int:
+    """ISO date -> ordinal day number; raises ValueError if invalid"""
+    return date.fromisoformat(value).toordinal()
+
+
+def curated_intervals(schedule_data: dict, member_id: str) -> list:
+    """The curated data/schedule.json as one member's intervals: each week's activities
+    span days 1-7, 8-14, ... of the month named by "period" ("September 2025")"""
+    intervals = []
+    for month in schedule_data.get("monthly_schedules", []):
+        month_start = datetime.strptime(month["period"], "%B %Y").date()
+        for week in month.get("schedule", []):
+            start = month_start + timedelta(days=7 * (week["week"] - 1))
+            end = start + timedelta(days=6)
+            for activity in week.get("activities", []):
+                intervals.append({
+                    "member_id": member_id,
+                    "start": start.isoformat(),
+                    "end": end.isoformat(),
+                    "event": "activity",
+                    "title": activity,
+                    "month": month["month"],
+                })
+    return intervals
+
+
+class MemberSchedule:
+    """One member's events sorted by start, with the longest event's length.
+
+    An event overlapping [lo, hi] must start in [lo - max_span, hi], so only
+    that slice of the sorted starts is examined.
+    """
+
+    def __init__(self, intervals: list):
+        self.intervals = sorted(intervals, key=lambda interval: interval["start"])
+        self.starts = [parse_date(interval["start"]) for interval in self.intervals]
+        self.ends = [parse_date(interval["end"]) for interval in self.intervals]
+        self.max_span = max((end - start for start, end in zip(self.starts, self.ends)), default=0)
+
+    def overlapping(self, lo: int = None, hi: int = None) -> list:
+        """Events overlapping the inclusive ordinal range [lo, hi] (open-ended if None)"""
+        first = bisect_left(self.starts, lo - self.max_span) if lo is not None else 0
+        last = bisect_right(self.starts, hi) if hi is not None else len(self.starts)
+        return [
+            self.intervals[i] for i in range(first, last)
+            if lo is None or self.ends[i] >= lo
+        ]
+
+
+class ScheduleIndex:
+    def __init__(self, intervals: list):
+        """intervals: schedule records, each with the member_id it belongs to"""
+        members = {}
+        for interval in intervals:
+            members.setdefault(interval["member_id"], []).append(interval)
+        self.members = {member_id: MemberSchedule(member_intervals) for member_id, member_intervals in members.items()}
+        # Rough in-memory size, used by the data store's eviction budget
+        self.nbytes = sum(len(m.intervals) * 400 for m in self.members.values())
+
+    @property
+    def default_member_id(self):
+        return next(iter(self.members), None)
+
+    def events(self, member_id: str, lo: int = None, hi: int = None):
+        """A member's events overlapping [lo, hi], or None if the member has no schedule"""
+        schedule = self.members.get(member_id)
+        return schedule.overlapping(lo, hi) if schedule is not None else None
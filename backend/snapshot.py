@@ -0,0 +1,186 @@
+# --- backend/snapshot.py ---
+# Compiled snapshot of what the backend serves, written by the pipeline's last
+# stage (scripts/compile_snapshot.py) and memory-mapped by the backend at
+# startup. Response bodies are stored serialized and pre-compressed, and data
+# frames as raw column arrays, so serving from the snapshot parses nothing and
+# every worker process shares the same pages of the file.
+#
+# Layout: b"ELYXSNAP", the format version (u32) and header length (u64), the
+# JSON header, then 8-byte aligned blobs at the offsets the header gives:
+#   {"bodies": {cache key: {"sources": {filename: version}, "digest", "variants": {encoding: [offset, length]}}},
+#    "frames": {cache key: {"sources": {filename: version}, "rows", "columns": [[name, dtype, offset, length]]}}}
+# Numeric columns are stored as their NumPy dtype, other columns as a JSON list.
+# An entry is only used while its source files still have the recorded versions.
+#
+# Each compile writes a new generation (snapshot.000001.bin, snapshot.000002.bin,
+# ...) and then points data/snapshot.json at it, since a file that backend
+# processes have mapped cannot be replaced on Windows. Earlier generations are
+# removed once no process maps them any more.
+
+import json
+import mmap
+import os
+import re
+import struct
+
+import numpy as np
+import pandas as pd
+
+from http_cache import CachedBody
+
+# Names the current generation: {"file": "snapshot.000001.bin"}
+SNAPSHOT_FILENAME = "snapshot.json"
+GENERATION_PATTERN = re.compile(r"^snapshot\.(\d{6})\.bin$")
+MAGIC = b"ELYXSNAP"
+FORMAT_VERSION = 1
+_PREFIX = struct.Struct("<8sIQ")
+JSON_COLUMN = "json"
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _sources(versions: dict) -> dict:
+    return {filename: list(version) for filename, version in versions.items()}
+
+
+class SnapshotWriter:
+    """Collects bodies and frames, then writes them to one file"""
+
+    def __init__(self):
+        self.header = {"format": FORMAT_VERSION, "bodies": {}, "frames": {}}
+        self._blobs = []
+        self._size = 0
+
+    def _add(self, data: bytes) -> list:
+        offset = _align(self._size)
+        self._blobs.append((offset, data))
+        self._size = offset + len(data)
+        return [offset, len(data)]
+
+    def add_body(self, key: str, versions: dict, cached: CachedBody):
+        """A serialized response and its compressed variants, valid while the sources have these versions"""
+        self.header["bodies"][key] = {
+            "sources": _sources(versions),
+            "digest": cached.digest,
+            "mimetype": cached.mimetype,
+            "variants": {encoding: self._add(bytes(body)) for encoding, body in cached.variants.items()},
+        }
+
+    def add_frame(self, key: str, versions: dict, df: pd.DataFrame):
+        columns = []
+        for name in df.columns:
+            values = df[name].to_numpy()
+            if values.dtype.kind in "biuf":
+                columns.append([name, values.dtype.str] + self._add(np.ascontiguousarray(values).tobytes()))
+            else:
+                columns.append([name, JSON_COLUMN] + self._add(json.dumps(values.tolist()).encode("utf-8")))
+        self.header["frames"][key] = {"sources": _sources(versions), "rows": len(df), "columns": columns}
+
+    def write(self, path: str) -> str:
+        """Write a new generation next to the pointer file at path, point path at it and
+        return the generation's path"""
+        directory = os.path.dirname(path)
+        generations = [int(m.group(1)) for m in map(GENERATION_PATTERN.match, os.listdir(directory or ".")) if m]
+        name = f"snapshot.{max(generations, default=0) + 1:06d}.bin"
+        generation_path = os.path.join(directory, name)
+
+        header = json.dumps(self.header, separators=(",", ":")).encode("utf-8")
+        data_start = _align(_PREFIX.size + len(header))
+        tmp_path = f"{generation_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)))
+            f.write(header)
+            for offset, data in self._blobs:
+                f.seek(data_start + offset)
+                f.write(data)
+        os.replace(tmp_path, generation_path)
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"file": name}, f)
+        os.replace(tmp_path, path)
+        remove_stale_generations(directory, name)
+        return generation_path
+
+
+def remove_stale_generations(directory: str, current: str):
+    """Remove the snapshot generations before current that no process maps any more"""
+    for name in os.listdir(directory or "."):
+        if GENERATION_PATTERN.match(name) and name != current:
+            try:
+                os.remove(os.path.join(directory, name))
+            except PermissionError:
+                pass  # still mapped by a backend process; removed after the next compile
+
+
+def open_snapshot(path: str):
+    """The Snapshot the pointer file at path names"""
+    with open(path, encoding="utf-8") as f:
+        name = json.load(f)["file"]
+    return Snapshot(os.path.join(os.path.dirname(path), name))
+
+
+class Snapshot:
+    """Read-only, memory-mapped snapshot; raises ValueError if the file is not one"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < _PREFIX.size:
+            raise ValueError(f"{path} is not a snapshot")
+        magic, version, header_length = _PREFIX.unpack_from(self._map)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} snapshot")
+        self.header = json.loads(self._map[_PREFIX.size:_PREFIX.size + header_length])
+        self._data = memoryview(self._map)[_align(_PREFIX.size + header_length):]
+        self._bodies = {}
+        self._frames = {}
+        self._sources = {
+            (filename, tuple(version))
+            for kind in ("bodies", "frames") for entry in self.header[kind].values()
+            for filename, version in entry["sources"].items()
+        }
+        # Only the header and the objects built over the mapping are process memory
+        self.nbytes = header_length
+
+    def _blob(self, offset: int, length: int) -> memoryview:
+        return self._data[offset:offset + length]
+
+    def _entry(self, kind: str, key: str, versions: dict):
+        entry = self.header[kind].get(key)
+        if entry is None or entry["sources"] != _sources(versions):
+            return None
+        return entry
+
+    def covers(self, filename: str, version) -> bool:
+        """Whether any entry was compiled from this version of a file"""
+        return version is not None and (filename, tuple(version)) in self._sources
+
+    def body(self, key: str, versions: dict):
+        """The CachedBody for a response cache key, or None if it is not in the snapshot or out of date"""
+        entry = self._entry("bodies", key, versions)
+        if entry is None:
+            return None
+        if key not in self._bodies:
+            self._bodies[key] = CachedBody.from_variants(
+                entry["digest"], {encoding: self._blob(*span) for encoding, span in entry["variants"].items()},
+                entry["mimetype"]
+            )
+        return self._bodies[key]
+
+    def frame(self, key: str, versions: dict):
+        """A DataFrame whose numeric columns are views of the mapped file, or None"""
+        entry = self._entry("frames", key, versions)
+        if entry is None:
+            return None
+        if key not in self._frames:
+            columns = {}
+            for name, dtype, offset, length in entry["columns"]:
+                if dtype == JSON_COLUMN:
+                    columns[name] = json.loads(bytes(self._blob(offset, length)))
+                else:
+                    columns[name] = np.frombuffer(self._blob(offset, length), dtype=dtype)
+            self._frames[key] = pd.DataFrame(columns, copy=False)
+        return self._frames[key]
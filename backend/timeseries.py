@@ -0,0 +1,89 @@
+# --- backend/timeseries.py ---
+# Server-side downsampling for chart series, so the frontend receives a few
+# hundred points instead of every reading.
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of the points that best keep the visual shape.
+
+    y may be 2-D (one column per series), in which case a point's triangle area
+    is summed over the series, so one choice of rows serves every chart.
+    """
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    y = y.reshape(n, -1)
+    every = (n - 2) / (max_points - 2)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(max_points - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        # Average of the next bucket (the last point for the final bucket)
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean(axis=0)
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end])[:, None] * (avg_y - y[a]))
+        a = start + int(np.argmax(areas.sum(axis=1)))
+        selected[i + 1] = a
+    return selected
+
+
+def bucket_bounds(n: int, buckets: int) -> tuple:
+    """(first, last) row of each of buckets near-equal runs of n rows"""
+    first = np.arange(buckets) * n // buckets
+    last = np.append(first[1:], n) - 1
+    return first, last
+
+
+def standardized(values: np.ndarray) -> np.ndarray:
+    """Columns scaled to unit variance around their mean, missing values at the mean,
+    so series with large units do not outweigh the rest"""
+    with warnings.catch_warnings():
+        # An all-missing column has no mean; it ends up all zeros
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mean = np.nanmean(values, axis=0)
+        std = np.nanstd(values, axis=0)
+    scaled = (values - mean) / np.where(std > 0, std, 1)
+    return np.nan_to_num(scaled, nan=0.0)
+
+
+def downsample_frame(df: pd.DataFrame, x_column: str, columns: list, max_points: int, method: str = "lttb") -> pd.DataFrame:
+    """Downsample the numeric columns together to at most max_points rows.
+
+    lttb keeps the rows that best preserve the shape of all columns at once (see
+    lttb_indices). minmax splits the rows into max_points / 2 buckets and returns
+    two rows per bucket: the bucket's first row holding each column's minimum
+    over the bucket, and its last row holding each column's maximum.
+    """
+    if len(df) <= max_points:
+        return df
+    columns = [column for column in columns if column in df.columns]
+    if not columns:
+        return df
+
+    values = df[columns].to_numpy(dtype=np.float64, na_value=np.nan)
+    if method == "minmax":
+        first, last = bucket_bounds(len(df), max_points // 2)
+        # fmin/fmax skip missing values; a column missing from a whole bucket stays missing
+        lows = np.fmin.reduceat(values, first)
+        highs = np.fmax.reduceat(values, first)
+        low_rows = df.iloc[first].copy()
+        low_rows[columns] = lows
+        high_rows = df.iloc[last].copy()
+        high_rows[columns] = highs
+        # Interleave low and high rows in date order
+        return pd.concat([low_rows, high_rows]).iloc[np.arange(2 * len(first)).reshape(2, -1).T.ravel()]
+
+    x = pd.to_datetime(df[x_column]).to_numpy(dtype="datetime64[s]").astype(np.float64)
+    return df.iloc[lttb_indices(x, standardized(values), max_points)]
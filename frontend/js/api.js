@@ -42,16 +42,25 @@ class API {
         return this.request('/member/profile');
     }
 
-    static async getMemberChats() {
-        return this.request('/member/chats');
+    static async getMemberChats(params = {}) {
+        // params: since, until, sender, limit, cursor (omit all for the full history)
+        const query = new URLSearchParams(
+            Object.entries(params).filter(([, value]) => value !== undefined && value !== null)
+        ).toString();
+        return this.request(query ? `/member/chats?${query}` : '/member/chats');
     }
 
-    static async getMemberBiomarkers() {
-        return this.request('/member/biomarkers');
+    static async getMemberBiomarkers(view = 'grouped') {
+        // view: 'raw', 'grouped' or 'both'; the dashboard only renders grouped_data
+        return this.request(`/member/biomarkers?view=${view}`);
     }
 
-    static async getMemberWearables() {
-        return this.request('/member/wearables');
+    static async getMemberWearables(params = {}) {
+        // params: from, to (YYYY-MM-DD), max_points, downsample ('lttb' or 'minmax')
+        const query = new URLSearchParams(
+            Object.entries(params).filter(([, value]) => value !== undefined && value !== null)
+        ).toString();
+        return this.request(query ? `/member/wearables?${query}` : '/member/wearables');
     }
 
     static async getMemberTestReports() {
@@ -66,6 +75,20 @@ class API {
         return this.request('/member/internal-metrics');
     }
 
+    static async getDashboard(sections, params = {}) {
+        // One request for several sections; params are passed through (e.g. max_points for wearables)
+        const query = new URLSearchParams({ sections: sections.join(','), ...params }).toString();
+        return this.request(`/member/dashboard?${query}`);
+    }
+
+    static async getMembers() {
+        return this.request('/members');
+    }
+
+    static async getMemberSection(memberId, section) {
+        return this.request(`/members/${encodeURIComponent(memberId)}/${section}`);
+    }
+
     static async sendChatQuery(query) {
         return this.request('/chat/query', {
             method: 'POST',
@@ -73,6 +96,49 @@ class API {
         });
     }
 
+    static async streamChatQuery(query, onToken) {
+        // Reads the Server-Sent Events of /chat/query/stream; resolves with the 'done' event data
+        const response = await fetch(`${API_BASE_URL}/chat/query/stream`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ query })
+        });
+        if (!response.ok || !response.body) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                const event = (rawEvent.match(/^event: (.*)$/m) || [])[1];
+                const data = JSON.parse((rawEvent.match(/^data: (.*)$/m) || [])[1] || 'null');
+                if (event === 'token') onToken(data.text);
+                if (event === 'error') throw new Error(data.error);
+                if (event === 'done') return data;
+            }
+        }
+        return null;
+    }
+
+    static subscribeToMemberEvents(memberId, handlers) {
+        // handlers: event type ('ready', 'chat', 'wearable', 'version', 'reset') -> function(data).
+        // EventSource reconnects by itself and sends Last-Event-ID, so only missed events are replayed.
+        const source = new EventSource(`${API_BASE_URL}/members/${encodeURIComponent(memberId)}/events`);
+        Object.entries(handlers).forEach(([event, handler]) => {
+            source.addEventListener(event, e => handler(JSON.parse(e.data)));
+        });
+        return source;
+    }
+
     static async healthCheck() {
         return this.request('/health');
     }
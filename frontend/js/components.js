@@ -167,6 +167,32 @@ class Components {
         `;
     }
 
+    static createChatActivityCard(metrics) {
+        // The metrics computed from the chat log (scripts/compute_internal_metrics.py)
+        const roles = Object.entries(metrics.messages_by_role || {}).sort((a, b) => b[1] - a[1]);
+        return `
+            <div class="metric-card p-4 mb-4">
+                <h4 class="font-semibold text-gray-900 mb-3">Chat Activity</h4>
+                <div class="grid grid-cols-2 md:grid-cols-4 gap-4">
+                    <div>
+                        <p class="text-xs text-gray-500">Messages</p>
+                        <p class="text-lg font-bold text-blue-600">${metrics.total_messages}</p>
+                    </div>
+                    <div>
+                        <p class="text-xs text-gray-500">Members Served</p>
+                        <p class="text-lg font-bold text-green-600">${metrics.members_served}</p>
+                    </div>
+                    ${roles.map(([role, count]) => `
+                        <div>
+                            <p class="text-xs text-gray-500">${role}</p>
+                            <p class="text-lg font-bold text-gray-700">${count}</p>
+                        </div>
+                    `).join('')}
+                </div>
+            </div>
+        `;
+    }
+
     static createAiChatMessage(content, isUser = false) {
         const messageClass = isUser ? 'bg-blue-600 text-white ml-12' : 'bg-gray-200 text-gray-900 mr-12';
         const alignClass = isUser ? 'justify-end' : 'justify-start';
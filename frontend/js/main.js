@@ -1,8 +1,13 @@
 // Main application logic
+const CHAT_PAGE_SIZE = 200;
+// Points per wearable series; the backend downsamples longer series (LTTB)
+const WEARABLE_CHART_POINTS = 300;
+
 class App {
     constructor() {
         this.currentMember = null;
         this.data = {};
+        this.events = null;
         this.init();
     }
 
@@ -79,6 +84,66 @@ class App {
 
         // Load all data for tabs
         await this.loadAllData();
+
+        // From here on, changes are pushed instead of re-fetched
+        await this.subscribeToUpdates();
+    }
+
+    async subscribeToUpdates() {
+        try {
+            const members = await API.getMembers();
+            const member = members.find(m => m.name === this.currentMember.name);
+            if (!member || this.events) return;
+
+            this.events = API.subscribeToMemberEvents(member.member_id, {
+                chat: event => this.appendChatMessage(event.message),
+                wearable: event => this.addWearableReading(event.reading),
+                version: event => this.refreshSections(event.sections),
+                // Events were missed while disconnected: load everything once more
+                reset: () => {
+                    this.data = {};
+                    this.loadAllData();
+                }
+            });
+        } catch (error) {
+            console.error('Failed to subscribe to live updates:', error);
+        }
+    }
+
+    appendChatMessage(message) {
+        const chatContainer = document.getElementById('chatContainer');
+        if (!chatContainer) return;
+        // Ingested messages carry 'text' (the generated chat schema)
+        const html = Components.createChatMessage({ ...message, message: message.message ?? message.text });
+        if (chatContainer.querySelector('.text-gray-500')) {
+            chatContainer.innerHTML = html;
+        } else {
+            chatContainer.insertAdjacentHTML('beforeend', html);
+        }
+        this.updateTimestamp();
+    }
+
+    addWearableReading(reading) {
+        if (!this.data.wearables) return;
+        this.data.wearables = [...this.data.wearables, reading].sort((a, b) => a.date.localeCompare(b.date));
+        if (document.getElementById('wearables')?.classList.contains('active')) {
+            this.loadWearables();
+        }
+        this.updateTimestamp();
+    }
+
+    async refreshSections(sections = []) {
+        // A compaction updated outputs the backend merges into its responses. Persona
+        // summaries are not shown on the dashboard, so only the internal metrics are reloaded.
+        if (sections.includes('ingested-internal-metrics')) {
+            try {
+                this.data.internalMetrics = await API.getInternalMetrics();
+                await this.loadInternalMetrics();
+            } catch (error) {
+                console.error('Failed to refresh internal metrics:', error);
+            }
+        }
+        this.updateTimestamp();
     }
 
     renderMemberInfo() {
@@ -116,20 +181,20 @@ class App {
 
     async preloadData() {
         try {
-            const [biomarkers, wearables, testReports, diagnostics, internalMetrics] = await Promise.all([
-                API.getMemberBiomarkers(),
-                API.getMemberWearables(),
-                API.getMemberTestReports(),
-                API.getMemberDiagnostics(),
-                API.getInternalMetrics()
-            ]);
+            // Everything except chats in a single round trip
+            const dashboard = await API.getDashboard(
+                ['biomarkers', 'wearables', 'test-reports', 'diagnostics', 'internal-metrics'],
+                { max_points: WEARABLE_CHART_POINTS }
+            );
+            // Sections that failed on the server are left unset and re-fetched by their tab
+            const section = name => (dashboard[name] && !dashboard[name].error ? dashboard[name] : undefined);
 
             this.data = {
-                biomarkers,
-                wearables,
-                testReports,
-                diagnostics,
-                internalMetrics
+                biomarkers: section('biomarkers'),
+                wearables: section('wearables'),
+                testReports: section('test-reports'),
+                diagnostics: section('diagnostics'),
+                internalMetrics: section('internal-metrics')
             };
         } catch (error) {
             console.error('Failed to preload data:', error);
@@ -182,15 +247,23 @@ class App {
     async loadChats() {
         try {
             Components.showLoading('chatContainer');
-            const chatData = await API.getMemberChats();
-            
             const chatContainer = document.getElementById('chatContainer');
-            if (chatData.communications && chatData.communications.length > 0) {
-                chatContainer.innerHTML = chatData.communications
-                    .map(message => Components.createChatMessage(message))
-                    .join('');
-            } else {
+
+            // Render the first page right away and append the rest page by page
+            let page = await API.getMemberChats({ limit: CHAT_PAGE_SIZE });
+            if (!page.communications || page.communications.length === 0) {
                 chatContainer.innerHTML = '<p class="text-gray-500 text-center">No chat history available</p>';
+                return;
+            }
+            chatContainer.innerHTML = page.communications
+                .map(message => Components.createChatMessage(message))
+                .join('');
+
+            while (page.next_cursor) {
+                page = await API.getMemberChats({ limit: CHAT_PAGE_SIZE, cursor: page.next_cursor });
+                chatContainer.insertAdjacentHTML('beforeend', page.communications
+                    .map(message => Components.createChatMessage(message))
+                    .join(''));
             }
         } catch (error) {
             console.error('Failed to load chats:', error);
@@ -257,7 +330,7 @@ class App {
             if (!wearableData) {
                 Components.showLoading('recentWearables');
                 console.log('Fetching wearables data from API...');
-                wearableData = await API.getMemberWearables();
+                wearableData = await API.getMemberWearables({ max_points: WEARABLE_CHART_POINTS });
                 console.log('Wearables data received:', wearableData);
                 this.data.wearables = wearableData;
             }
@@ -415,10 +488,14 @@ class App {
             }
 
             const metricsContainer = document.getElementById('internalMetricsContainer');
-            if (internalMetrics.internal_metrics && internalMetrics.internal_metrics.length > 0) {
+            const hasCards = internalMetrics.internal_metrics && internalMetrics.internal_metrics.length > 0;
+            // Computed from the chat log, including ingested messages once compacted
+            const hasActivity = internalMetrics.total_messages !== undefined;
+            if (hasCards || hasActivity) {
                 metricsContainer.innerHTML = `
+                    ${hasActivity ? Components.createChatActivityCard(internalMetrics) : ''}
                     <div class="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4">
-                        ${internalMetrics.internal_metrics
+                        ${(internalMetrics.internal_metrics || [])
                             .map(metric => Components.createInternalMetricCard(metric))
                             .join('')}
                     </div>
@@ -458,11 +535,18 @@ class App {
         input.value = '';
 
         try {
-            const response = await API.sendChatQuery(query);
-            
-            // Add AI response to chat
-            chatHistory.innerHTML += Components.createAiChatMessage(response.response, false);
-            chatHistory.scrollTop = chatHistory.scrollHeight;
+            // Render the answer as it streams in
+            chatHistory.insertAdjacentHTML('beforeend', Components.createAiChatMessage('', false));
+            const messageBodies = chatHistory.querySelectorAll('.whitespace-pre-wrap');
+            const answer = messageBodies[messageBodies.length - 1];
+
+            const stats = await API.streamChatQuery(query, text => {
+                answer.textContent += text;
+                chatHistory.scrollTop = chatHistory.scrollHeight;
+            });
+            if (stats) {
+                console.log(`AI answer: first token after ${stats.ttft_ms} ms, complete after ${stats.total_ms} ms`);
+            }
         } catch (error) {
             console.error('Failed to send AI message:', error);
             chatHistory.innerHTML += Components.createAiChatMessage(
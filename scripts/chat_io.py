@@ -0,0 +1,195 @@
+# --- scripts/chat_io.py ---
+# Reads the chat log in either schema, as one flat DataFrame or as a stream of
+# normalized messages, so the analysis scripts do not care which one they get:
+#   generated: [{"member", "date", "sender", "role", "text"}]
+#   curated:   {"communications": [{"date", "timestamp", "sender": "Ruby (Elyx Concierge)", "message"}]}
+#
+# Generated logs are written to the JSONL store data/chats (backend/jsonl_store.py);
+# the curated chat_data.json is read when no store has been generated.
+
+import json
+import os
+import re
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+from jsonl_store import open_store
+
+CHAT_STORE_PATH = "data/chats"
+CHAT_DATA_PATH = "data/chat_data.json"
+MEMBER_ROLE = "Member"
+CHAT_COLUMNS = ["member", "date", "timestamp", "sender", "role", "text"]
+
+# "Dr. Warren (The Medical Strategist)" -> name "Dr. Warren", role "Medical Strategist"
+SENDER_PATTERN = r"^(?P<name>.*?)\s*\((?:The\s+)?(?P<role>[^)]*)\)\s*$"
+
+
+_SENDER_RE = re.compile(SENDER_PATTERN)
+_WHITESPACE = re.compile(r"\s*")
+
+
+def chat_records(chat_data) -> list:
+    if isinstance(chat_data, dict):
+        return chat_data.get("communications", [])
+    return chat_data or []
+
+
+def chat_frame(records: list) -> pd.DataFrame:
+    """One row per message with CHAT_COLUMNS plus "sent_at" (date and time), in log order"""
+    df = pd.DataFrame(records)
+    for column in CHAT_COLUMNS + ["message"]:
+        if column not in df:
+            df[column] = None
+    df = df.astype({column: object for column in CHAT_COLUMNS + ["message"]})
+    df["text"] = df["text"].where(df["text"].notna(), df["message"])
+
+    # Curated logs carry the role in the sender label instead of a column
+    unlabelled = df["role"].isna()
+    if unlabelled.any():
+        parsed = df.loc[unlabelled, "sender"].astype(str).str.extract(SENDER_PATTERN)
+        has_label = parsed["name"].notna()
+        df.loc[unlabelled, "role"] = parsed["role"].where(has_label, MEMBER_ROLE)
+        df.loc[parsed.index[has_label], "sender"] = parsed.loc[has_label, "name"]
+
+    # Single-member logs have no member column: the member is whoever writes as "Member"
+    inferred = df["sender"].where(df["role"] == MEMBER_ROLE).ffill().bfill()
+    df["member"] = df["member"].where(df["member"].notna(), inferred)
+
+    when = df["date"].astype(str) + " " + df["timestamp"].fillna("00:00").astype(str)
+    df["sent_at"] = pd.to_datetime(when, format="ISO8601", errors="coerce")
+    return df[CHAT_COLUMNS + ["sent_at"]]
+
+
+def default_chat_path() -> str:
+    """The chat store if the pipeline has written one, else the curated chat_data.json"""
+    return CHAT_STORE_PATH if os.path.isdir(CHAT_STORE_PATH) else CHAT_DATA_PATH
+
+
+def load_chat_records(path: str = None) -> list:
+    """Every chat record of a store or a .json/.jsonl file, in log order"""
+    path = path or default_chat_path()
+    store = open_store(path) if os.path.isdir(path) else None
+    if store is not None:
+        return store.records()
+    return list(iter_chat_records(path))
+
+
+def load_chat_frame(path: str = None) -> pd.DataFrame:
+    return chat_frame(load_chat_records(path))
+
+
+# --- Streaming ---
+
+def iter_json_array(f, key: str = "communications", read_size: int = 1 << 16):
+    """Items of a top-level JSON array, or of the array under key in a top-level
+    object, decoded one at a time from a file object; only the current item is held in memory"""
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = f.read(read_size)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+        return not eof
+
+    def peek():
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos < len(buffer):
+                return buffer[pos]
+            if not fill():
+                return ""
+
+    def decode():
+        nonlocal pos
+        peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if fill():
+                    continue
+                raise
+            # A number at the end of the buffer may continue in the next read
+            if end == len(buffer) and not eof and fill():
+                continue
+            pos = end
+            return value
+
+    first = peek()
+    if first == "{":
+        pos += 1
+        while True:
+            char = peek()
+            if char == ",":
+                pos += 1
+                continue
+            if char != '"':
+                return  # end of the object without the key
+            name = decode()
+            if peek() != ":":
+                raise ValueError("Malformed JSON object")
+            pos += 1
+            if name == key and peek() == "[":
+                break
+            decode()  # skip another key's value
+    elif first != "[":
+        return
+
+    pos += 1
+    while True:
+        char = peek()
+        if char == ",":
+            pos += 1
+        elif char in ("]", ""):
+            return
+        else:
+            yield decode()
+
+
+def iter_chat_records(path: str = None):
+    """Raw chat records from a JSONL store directory, a .json file (either schema),
+    a .jsonl file, or "-" for JSONL on stdin"""
+    path = path or default_chat_path()
+    if path == "-":
+        for line in sys.stdin:
+            if line.strip():
+                yield json.loads(line)
+        return
+    if os.path.isdir(path):
+        store = open_store(path)
+        if store is None:
+            raise FileNotFoundError(f"No chat store at {path}")
+        yield from store.iter_records()
+        return
+    with open(path) as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from iter_json_array(f)
+
+
+def normalize_message(record: dict) -> dict:
+    """The CHAT_COLUMNS of one record, as chat_frame would produce them (member may be None)"""
+    sender = record.get("sender")
+    role = record.get("role")
+    if role is None:
+        match = _SENDER_RE.match(str(sender))
+        if match:
+            sender, role = match.group("name"), match.group("role")
+        else:
+            role = MEMBER_ROLE
+    text = record.get("text")
+    return {
+        "member": record.get("member") or (sender if role == MEMBER_ROLE else None),
+        "date": record.get("date"),
+        "timestamp": record.get("timestamp"),
+        "sender": sender,
+        "role": role,
+        "text": text if text is not None else record.get("message"),
+    }
@@ -0,0 +1,60 @@
+# --- scripts/chat_shards.py ---
+# Per-member JSONL shards of generated chats and a streaming merge into the
+# chat store (backend/jsonl_store.py). Shards can be written by several
+# processes or hosts; the merge holds one record in memory at a time.
+#
+#   python scripts/chat_shards.py merge --shard-dir data/shards/chats
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+from jsonl_store import JsonlStore
+from member_store import record_key
+
+SHARD_DIR = "data/shards/chats"
+CHAT_STORE_PATH = "data/chats"
+
+
+def shard_path(shard_dir: str, member_name: str) -> str:
+    slug = re.sub(r"[^a-z0-9]+", "-", member_name.lower()).strip("-")
+    return os.path.join(shard_dir, f"{slug}.jsonl")
+
+
+def write_shard(path: str, records: list):
+    """One JSON record per line, renamed into place so readers never see a partial shard"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def iter_shard(path: str):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def merge_shards(shard_paths: list, output_path: str = CHAT_STORE_PATH) -> int:
+    """Stream shards, in the given order, into the chat store, replacing its contents"""
+    return JsonlStore(output_path, key=record_key).write(record for path in shard_paths for record in iter_shard(path))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge per-member chat shards into the chat store")
+    parser.add_argument("command", choices=["merge"])
+    parser.add_argument("--shard-dir", default=SHARD_DIR)
+    parser.add_argument("--output", default=CHAT_STORE_PATH, help="Store directory")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.shard_dir, "*.jsonl")))
+    count = merge_shards(paths, args.output)
+    print(f"✅ Merged {count} messages from {len(paths)} shards into {args.output}")
@@ -0,0 +1,71 @@
+# --- scripts/compile_snapshot.py ---
+# This script compiles everything the dashboard loads into a new generation of
+# the memory-mapped snapshot the backend serves from (backend/snapshot.py),
+# named by data/snapshot.json.
+#
+# Each response is produced by the backend's own route, so the compiled bodies
+# (and their ETags) are exactly what the backend would serve from the files.
+# Importing the app does not open the ingestion log (see init_ingestion in
+# backend/app.py), so nothing but the snapshot is written.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+from flask import g
+from app import app, data_store, load_wearables, present_sources, typed_wearables, WEARABLES_SOURCES
+from snapshot import SnapshotWriter, SNAPSHOT_FILENAME
+
+# Must match CHAT_PAGE_SIZE and WEARABLE_CHART_POINTS in frontend/js/main.js
+CHAT_PAGE_SIZE = 200
+WEARABLE_CHART_POINTS = 300
+
+# The dashboard's requests on load and on opening each tab
+SNAPSHOT_REQUESTS = [
+    "/api/member/profile",
+    "/api/member/chats",
+    f"/api/member/chats?limit={CHAT_PAGE_SIZE}",
+    "/api/member/biomarkers",
+    "/api/member/biomarkers?view=raw",
+    "/api/member/biomarkers?view=grouped",
+    "/api/member/wearables",
+    f"/api/member/wearables?max_points={WEARABLE_CHART_POINTS}",
+    "/api/member/test-reports",
+    "/api/member/diagnostics",
+    "/api/member/internal-metrics",
+    "/api/member/dashboard",
+    f"/api/member/dashboard?sections=biomarkers,wearables,test-reports,diagnostics,internal-metrics&max_points={WEARABLE_CHART_POINTS}",
+]
+
+# Frames the backend slices per request: cache key -> (source files, builder)
+SNAPSHOT_FRAMES = {
+    "member_wearables:typed": (WEARABLES_SOURCES, lambda: typed_wearables(load_wearables())),
+}
+
+def compile_snapshot(output_path: str):
+    writer = SnapshotWriter()
+    for url in SNAPSHOT_REQUESTS:
+        with app.test_request_context(url):
+            response = app.full_dispatch_request()
+            compiled = g.get("cached_json_body")
+        if response.status_code != 200 or compiled is None:
+            print(f"⚠️ Skipping {url} (status {response.status_code})")
+            continue
+        writer.add_body(*compiled)
+
+    for key, (filenames, build) in SNAPSHOT_FRAMES.items():
+        filenames = present_sources(filenames)
+        versions = dict(zip(filenames, data_store.versions(filenames)))
+        if None in versions.values():
+            print(f"⚠️ Skipping frame {key}: {', '.join(filenames)} not found")
+            continue
+        writer.add_frame(key, versions, build())
+
+    generation_path = writer.write(output_path)
+    print(f"✅ Snapshot of {len(writer.header['bodies'])} responses and {len(writer.header['frames'])} frames compiled to {generation_path}")
+
+def main():
+    compile_snapshot(data_store.path(SNAPSHOT_FILENAME))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# --- scripts/completion_cache.py ---
+# On-disk, content-addressed cache of LLM completions and per-member/per-month
+# checkpoints, so a crashed pipeline run resumes instead of redoing every call.
+#
+#   python scripts/completion_cache.py stats
+#   python scripts/completion_cache.py prune --max-mb 500 --max-age-days 30
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+
+CACHE_DIR = "data/cache/completions"
+CHECKPOINT_DIR = "data/checkpoints"
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+
+def completion_key(prompt: str, model_id: str, params: dict, sample_id: str = "") -> str:
+    """Hash of everything that determines a completion.
+
+    Sampled generations of the same prompt are meant to differ, so sample_id
+    (e.g. member and date of the conversation) keeps each slot's sample distinct.
+    """
+    payload = json.dumps(
+        {"prompt": prompt, "model_id": model_id, "params": params, "sample_id": sample_id},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """One JSON file per completion under cache_dir/<first 2 hex chars>/<key>.json.
+
+    Reads refresh a file's mtime, so pruning removes the least recently used
+    entries first. The cache prunes itself once it grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._total_bytes = sum(size for _, size, _ in self._entries())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _entries(self):
+        """(path, size, mtime) of every cached completion"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    yield path, stat.st_size, stat.st_mtime
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                completion = json.load(f)["completion"]
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        os.utime(path)
+        self.hits += 1
+        return completion
+
+    def put(self, key: str, completion: str, **meta):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        body = json.dumps({"completion": completion, **meta}).encode("utf-8")
+        # Write-then-rename so a crash never leaves a truncated entry behind
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        # An overwritten entry's old size no longer counts towards the budget
+        try:
+            previous = os.path.getsize(path)
+        except OSError:
+            previous = 0
+        os.replace(tmp_path, path)
+        self._total_bytes += len(body) - previous
+        if self._total_bytes > self.max_bytes:
+            # Prune to 90% so we do not rescan on every subsequent put
+            self.prune(max_bytes=int(self.max_bytes * 0.9))
+
+    def prune(self, max_bytes: int = None, max_age_days: float = None) -> int:
+        """Delete expired entries, then the least recently used until under max_bytes"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        cutoff = time.time() - max_age_days * 86400 if max_age_days else None
+        removed = 0
+        for path, size, mtime in entries:
+            expired = cutoff is not None and mtime < cutoff
+            over_budget = max_bytes is not None and total > max_bytes
+            if not (expired or over_budget):
+                continue
+            os.remove(path)
+            total -= size
+            removed += 1
+        self._total_bytes = total
+        return removed
+
+    def stats(self) -> dict:
+        entries = list(self._entries())
+        return {
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# --- Checkpoints ---
+
+def _member_slug(member_name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", member_name.lower()).strip("-")
+
+
+def checkpoint_path(checkpoint_dir: str, member_name: str, month: int) -> str:
+    return os.path.join(checkpoint_dir, _member_slug(member_name), f"month_{month}.json")
+
+
+def load_checkpoint(checkpoint_dir: str, member_name: str, month: int, fingerprint: str):
+    """Records of a finished member-month, or None if it still has to be generated.
+
+    A checkpoint only counts if it was made for the same prompts (fingerprint),
+    so editing the journey config or profiles invalidates it.
+    """
+    try:
+        with open(checkpoint_path(checkpoint_dir, member_name, month), encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if checkpoint.get("fingerprint") != fingerprint:
+        return None
+    return checkpoint["records"]
+
+
+def save_checkpoint(checkpoint_dir: str, member_name: str, month: int, fingerprint: str, records: list):
+    path = checkpoint_path(checkpoint_dir, member_name, month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"fingerprint": fingerprint, "records": records}, f)
+    os.replace(tmp_path, path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or prune the LLM completion cache")
+    parser.add_argument("command", choices=["stats", "prune"])
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--max-mb", type=float, help="prune least recently used entries down to this size")
+    parser.add_argument("--max-age-days", type=float, help="prune entries not used for this many days")
+    args = parser.parse_args()
+
+    cache = CompletionCache(args.cache_dir)
+    if args.command == "prune":
+        max_bytes = int(args.max_mb * 1024 * 1024) if args.max_mb is not None else None
+        removed = cache.prune(max_bytes=max_bytes, max_age_days=args.max_age_days)
+        print(f"✅ Removed {removed} cached completions")
+    print(json.dumps(cache.stats(), indent=2))
@@ -1,43 +1,304 @@
 # --- scripts/compute_internal_metrics.py ---
-# This script computes internal metrics like workload per team member.
+# This script computes internal metrics like workload per team member, response
+# latency and members served, overall and per week and month.
+#
+# Aggregates are additive and saved next to the output, so a chat log that only
+# grew since the last run is processed incrementally: only new messages are read
+# into the computation and merged into the saved aggregates.
+#
+#   python scripts/compute_internal_metrics.py          # incremental when possible
+#   python scripts/compute_internal_metrics.py --full   # recompute from scratch
+#   python scripts/compute_internal_metrics.py --new new_messages.jsonl   # merge just these
+#
+# --log and --output compute them for another chat log (read in the order given)
+# into another file, with the aggregates saved next to it; the backend keeps the
+# metrics of the log including ingested messages this way (backend/ingest.py).
 
+import argparse
+import hashlib
 import json
+import os
+import sys
 import pandas as pd
-from collections import defaultdict
 
-CHAT_DATA_PATH = "data/chat_data.json"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from chat_io import CHAT_STORE_PATH, MEMBER_ROLE, chat_frame, default_chat_path, iter_chat_records, load_chat_records
+from jsonl_store import open_store
+
 METRICS_OUTPUT_PATH = "data/internal_metrics.json"
+# Response latency thresholds (minutes) reported as "% of replies within"
+LATENCY_THRESHOLDS = [15, 60, 240, 1440]
+# Breakdown name -> period column ("2025-W36", "2025-09")
+PERIODS = {"weekly": "week", "monthly": "month"}
+
+
+def message_hash(record) -> str:
+    return hashlib.sha256(json.dumps(record, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _nested_counts(series: pd.Series) -> dict:
+    """A two-level MultiIndex Series as {outer: {inner: value}}"""
+    result = {}
+    for (outer, inner), value in series.items():
+        result.setdefault(str(outer), {})[str(inner)] = int(value)
+    return result
+
+
+def _member_lists(series: pd.Series) -> dict:
+    return {str(key): sorted(members) for key, members in series.items()}
+
+
+def chunk_aggregates(df: pd.DataFrame, carry: dict):
+    """Additive aggregates of new messages, and the per-member state the next chunk needs.
+
+    carry maps member -> {"role", "run_start", "last_at"}: the role and time of
+    that member's last message and, if the member wrote it, when their still
+    unanswered run of messages began.
+    """
+    frame = df[["member", "role", "sent_at"]].assign(carried=False)
+    if carry:
+        carry_rows = pd.DataFrame([
+            {"member": member, "role": state["role"], "sent_at": pd.Timestamp(state["run_start"] or state["last_at"])}
+            for member, state in carry.items()
+        ])
+        frame = pd.concat([carry_rows.assign(carried=True), frame], ignore_index=True)
+    # Stable, so messages with equal timestamps keep their log order (carried rows first)
+    frame = frame.sort_values(["member", "sent_at"], kind="stable", ignore_index=True)
+
+    is_member = frame["role"] == MEMBER_ROLE
+    previous_role = frame.groupby("member", sort=False)["role"].shift()
+    starts_run = is_member & (previous_role != MEMBER_ROLE)
+    run_start = frame["sent_at"].where(starts_run).groupby(frame["member"], sort=False).ffill()
+    # The first team message after a member's run of messages answers it
+    first_reply = ~is_member & (previous_role == MEMBER_ROLE)
+    frame["latency"] = ((frame["sent_at"] - run_start).dt.total_seconds() / 60).where(first_reply)
+    frame["first_reply"] = first_reply
+    frame["week"] = frame["sent_at"].dt.strftime("%G-W%V")
+    frame["month"] = frame["sent_at"].dt.strftime("%Y-%m")
+
+    new = frame[~frame["carried"]]
+    team = new[new["role"] != MEMBER_ROLE]
+    replies = new[new["first_reply"]]
+
+    latency = replies.groupby("role")["latency"]
+    latency_by_role = {
+        role: {"count": int(count), "total_minutes": float(total), "max_minutes": float(longest)}
+        for role, count, total, longest in zip(
+            latency.count().index, latency.count(), latency.sum(), latency.max()
+        )
+    }
+    for threshold in LATENCY_THRESHOLDS:
+        within = replies[replies["latency"] <= threshold].groupby("role").size()
+        for role, count in within.items():
+            latency_by_role[role].setdefault("within", {})[str(threshold)] = int(count)
+
+    aggregates = {
+        "total_messages": len(new),
+        "messages_by_role": {role: int(n) for role, n in team["role"].value_counts().items()},
+        "members_served_by_role": _member_lists(replies.groupby("role")["member"].unique()),
+        "members": sorted(new["member"].dropna().unique()),
+        "latency_by_role": latency_by_role,
+    }
+    for name, period in PERIODS.items():
+        sizes = new.groupby(period).size()
+        member_messages = new["role"].eq(MEMBER_ROLE).groupby(new[period]).sum()
+        active = new.groupby(period)["member"].unique()
+        reply_counts = replies.groupby(period)["latency"].count().reindex(sizes.index, fill_value=0)
+        reply_minutes = replies.groupby(period)["latency"].sum().reindex(sizes.index, fill_value=0.0)
+        by_role = _nested_counts(team.groupby([period, "role"]).size())
+        aggregates[name] = {
+            key: {
+                "total_messages": int(sizes[key]),
+                "member_messages": int(member_messages[key]),
+                "members_active": sorted(active[key]),
+                "replies": int(reply_counts[key]),
+                "reply_minutes": float(reply_minutes[key]),
+                "messages_by_role": by_role.get(key, {}),
+            }
+            for key in sizes.index
+        }
+
+    last = frame.groupby("member", sort=False).tail(1)
+    last_run_start = run_start.loc[last.index]
+    next_carry = {
+        member: {
+            "role": role,
+            "run_start": start.isoformat() if role == MEMBER_ROLE and pd.notna(start) else None,
+            "last_at": sent_at.isoformat(),
+        }
+        for member, role, sent_at, start in zip(last["member"], last["role"], last["sent_at"], last_run_start)
+    }
+    return aggregates, next_carry
+
+
+def merge_aggregates(saved, new):
+    """Counts and sums add up, member lists are unioned, maxima take the larger value"""
+    if isinstance(saved, dict):
+        merged = dict(saved)
+        for key, value in new.items():
+            if key not in merged:
+                merged[key] = value
+            elif key == "max_minutes":
+                merged[key] = max(merged[key], value)
+            else:
+                merged[key] = merge_aggregates(merged[key], value)
+        return merged
+    if isinstance(saved, list):
+        return sorted(set(saved) | set(new))
+    return saved + new
+
+
+def _period_rows(periods: dict, key_name: str) -> list:
+    rows = []
+    for key in sorted(periods):
+        period = periods[key]
+        rows.append({
+            key_name: key,
+            "total_messages": period["total_messages"],
+            "member_messages": period["member_messages"],
+            "messages_by_role": period["messages_by_role"],
+            "members_active": len(period["members_active"]),
+            "replies": period["replies"],
+            "avg_response_minutes": round(period["reply_minutes"] / period["replies"], 1) if period["replies"] else None,
+        })
+    return rows
+
 
-def compute_metrics():
+def final_metrics(aggregates: dict) -> dict:
+    latency = {}
+    for role, stats in aggregates["latency_by_role"].items():
+        count = stats["count"]
+        latency[role] = {
+            "replies": count,
+            "avg_minutes": round(stats["total_minutes"] / count, 1) if count else None,
+            "max_minutes": round(stats["max_minutes"], 1) if count else None,
+            **{
+                f"within_{threshold}_min_pct": round(100 * stats.get("within", {}).get(str(threshold), 0) / count, 1) if count else None
+                for threshold in LATENCY_THRESHOLDS
+            },
+        }
+    return {
+        "total_messages": aggregates["total_messages"],
+        "messages_by_role": aggregates["messages_by_role"],
+        "members_served_by_role": {role: len(members) for role, members in aggregates["members_served_by_role"].items()},
+        "members_served": len(aggregates["members"]),
+        "response_latency_by_role": latency,
+        "weekly": _period_rows(aggregates["weekly"], "week"),
+        "monthly": _period_rows(aggregates["monthly"], "month"),
+    }
+
+
+def state_path(output_path: str) -> str:
+    """Where the aggregates behind an output are saved (data/internal_metrics_state.json by default)"""
+    return os.path.splitext(output_path)[0] + "_state.json"
+
+
+def load_log(log_paths: list) -> list:
+    records = []
+    for path in log_paths:
+        records.extend(load_chat_records(path))
+    return records
+
+
+def log_length(log_paths: list) -> int:
+    """Number of records in the chat logs; a store's count comes from its manifest"""
+    length = 0
+    for path in log_paths:
+        store = open_store(path) if os.path.isdir(path) else None
+        if store is not None:
+            length += len(store)
+            store.close()
+        else:
+            length += len(load_chat_records(path))
+    return length
+
+
+def read_state(output_path: str = METRICS_OUTPUT_PATH):
     try:
-        with open(CHAT_DATA_PATH) as f:
-            chat_data = json.load(f)
+        with open(state_path(output_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_state(records: list, output_path: str = METRICS_OUTPUT_PATH):
+    """Saved state if the log only grew since it was written, else None"""
+    state = read_state(output_path)
+    if state is None:
+        return None
+    processed = state.get("messages_processed", 0)
+    if processed == 0 or processed > len(records) or state.get("last_message") != message_hash(records[processed - 1]):
+        return None
+    return state
+
+
+def save_metrics(aggregates: dict, carry: dict, processed: int, last_record, output_path: str = METRICS_OUTPUT_PATH):
+    with open(output_path, "w") as f:
+        json.dump(final_metrics(aggregates), f, indent=2)
+    with open(state_path(output_path), "w") as f:
+        json.dump({
+            "messages_processed": processed,
+            "last_message": message_hash(last_record) if last_record is not None else None,
+            "carry": carry,
+            "aggregates": aggregates,
+        }, f)
+    print(f"✅ Internal metrics computed and saved to {output_path}")
+
+
+def compute_metrics(full: bool = False, log_paths: list = None, output_path: str = METRICS_OUTPUT_PATH):
+    log_paths = log_paths or [default_chat_path()]
+    try:
+        records = load_log(log_paths)
     except FileNotFoundError:
-        print(f"Error: {CHAT_DATA_PATH} not found. Please run generate_chats.py first.")
+        print(f"Error: {', '.join(log_paths)} not found. Please run generate_chats.py first.")
         return
 
-    df = pd.DataFrame(chat_data)
-    
-    role_metrics = defaultdict(lambda: {"messages_count": 0, "members_served": set()})
-    
-    for index, row in df.iterrows():
-        role = row["role"]
-        sender = row["sender"]
-        if role != "Member":
-            role_metrics[role]["messages_count"] += 1
-            # Assuming the previous message was from the member
-            if index > 0 and df.iloc[index-1]["role"] == "Member":
-                role_metrics[role]["members_served"].add(df.iloc[index-1]["sender"])
-
-    final_metrics = {
-        "total_messages": len(df),
-        "messages_by_role": {role: metrics["messages_count"] for role, metrics in role_metrics.items()},
-        "members_served_by_role": {role: len(metrics["members_served"]) for role, metrics in role_metrics.items()}
-    }
+    state = None if full else load_state(records, output_path)
+    if state:
+        print(f"♻️ Appending {len(records) - state['messages_processed']} new messages to saved aggregates")
+        new_records, carry, aggregates = records[state["messages_processed"]:], state["carry"], state["aggregates"]
+    else:
+        new_records, carry, aggregates = records, {}, None
+
+    # Normalizing is cheap and vectorized; the whole log is used so single-member
+    # logs can still infer the member for team messages in the new part
+    df = chat_frame(records).iloc[len(records) - len(new_records):]
+    chunk, carry = chunk_aggregates(df, carry)
+    aggregates = merge_aggregates(aggregates, chunk) if aggregates else chunk
+    save_metrics(aggregates, carry, len(records), records[-1] if records else None, output_path)
+
+
+def update_metrics(new_path: str, log_paths: list = None, output_path: str = METRICS_OUTPUT_PATH):
+    """Merge messages just appended to the chat log (the chat store by default), given as
+    a JSONL file, into the saved aggregates without reading the rest of the log"""
+    new_records = list(iter_chat_records(new_path))
+    if not new_records:
+        return
+    log_paths = log_paths or [CHAT_STORE_PATH]
+    try:
+        logged = log_length(log_paths)
+    except FileNotFoundError:
+        logged = None
+    state = read_state(output_path)
+    # The saved state must cover exactly the messages before the new ones
+    if logged is None or state is None or state.get("messages_processed", 0) + len(new_records) != logged:
+        print("♻️ Saved aggregates do not match the chat log; recomputing from scratch")
+        return compute_metrics(full=True, log_paths=log_paths, output_path=output_path)
+    print(f"♻️ Appending {len(new_records)} new messages to saved aggregates")
+    chunk, carry = chunk_aggregates(chat_frame(new_records), state["carry"])
+    save_metrics(merge_aggregates(state["aggregates"], chunk), carry, logged, new_records[-1], output_path)
 
-    with open(METRICS_OUTPUT_PATH, "w") as f:
-        json.dump(final_metrics, f, indent=2)
-    print(f"✅ Internal metrics computed and saved to {METRICS_OUTPUT_PATH}")
+def main(full: bool = False, new_path: str = None, log_paths: list = None, output_path: str = METRICS_OUTPUT_PATH):
+    if new_path:
+        update_metrics(new_path, log_paths, output_path)
+    else:
+        compute_metrics(full, log_paths, output_path)
 
 if __name__ == "__main__":
-    compute_metrics()
+    parser = argparse.ArgumentParser(description="Compute internal team metrics from the chat log")
+    parser.add_argument("--full", action="store_true", help="Ignore saved aggregates and recompute from scratch")
+    parser.add_argument("--new", metavar="PATH", help="JSONL file of the messages just appended to the chat log; only these are read")
+    parser.add_argument("--log", nargs="+", metavar="PATH", help="Chat logs to compute the metrics of, in order (default: data/chats if generated, else data/chat_data.json)")
+    parser.add_argument("--output", default=METRICS_OUTPUT_PATH, help="Metrics file to write; the aggregates are saved next to it")
+    args = parser.parse_args()
+    main(full=args.full, new_path=args.new, log_paths=args.log, output_path=args.output)
@@ -1,46 +1,93 @@
 # --- scripts/extract_interventions.py ---
 # This script extracts structured interventions from the chat data.
+#
+# Messages are streamed from the chat store, chat_data.json (either schema) or
+# JSONL, matched against all category keywords in one scan, and each decision
+# is appended to a JSONL store (indexed by member and date) as soon as it is
+# found, so memory does not grow with the log.
+#
+#   python scripts/extract_interventions.py --input data/chat_data.json --output data/decisions
 
-import json
+import argparse
+import os
 import re
+import sys
 
-CHAT_DATA_PATH = "data/chat_data.json"
-DECISIONS_OUTPUT_PATH = "data/decisions.json"
-
-def extract_decisions(chat_data):
-    decisions = []
-    
-    keywords = {
-        "nutrition": ["diet", "meal plan", "food log", "carb", "supplement"],
-        "exercise": ["workout", "training", "mobility", "reps", "exercise"],
-        "medical": ["medication", "blood pressure", "lab results", "panel"],
-        "lifestyle": ["sleep", "stress", "travel", "routine"]
-    }
-    
-    for message in chat_data:
-        text = message["text"].lower()
-        
-        # Simple rule-based extraction
-        for category, kws in keywords.items():
-            if any(kw in text for kw in kws):
-                decisions.append({
-                    "date": message["date"],
-                    "member_name": message["sender"] if message["role"] == "Member" else "Elyx Team",
-                    "category": category,
-                    "summary": message["text"],
-                    "origin_chat_id": f"{message['sender']}_{message['date']}", # A simple ID
-                    "rationale": f"Based on conversation about {', '.join(kws)}"
-                })
-                break # Extract only one decision per message for simplicity
-
-    with open(DECISIONS_OUTPUT_PATH, "w") as f:
-        json.dump(decisions, f, indent=2)
-    print(f"✅ Interventions/decisions extracted at {DECISIONS_OUTPUT_PATH}")
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+from chat_io import MEMBER_ROLE, chat_records, default_chat_path, iter_chat_records, normalize_message
+from jsonl_store import JsonlStore
+from member_store import record_key
+
+DECISIONS_OUTPUT_PATH = "data/decisions"
+
+# In priority order: a message matching several categories is filed under the first
+DECISION_KEYWORDS = {
+    "nutrition": ["diet", "meal plan", "food log", "carb", "supplement"],
+    "exercise": ["workout", "training", "mobility", "reps", "exercise"],
+    "medical": ["medication", "blood pressure", "lab results", "panel"],
+    "lifestyle": ["sleep", "stress", "travel", "routine"]
+}
+
+def compile_keywords(keywords: dict):
+    """One pattern for every keyword (longest first), and keyword -> category priority"""
+    priority = {}
+    for rank, kws in enumerate(keywords.values()):
+        for kw in kws:
+            priority.setdefault(kw, rank)
+    pattern = re.compile("|".join(re.escape(kw) for kw in sorted(priority, key=len, reverse=True)))
+    return pattern, priority
+
+def extract_decisions(chat_data, output_path: str = DECISIONS_OUTPUT_PATH, append: bool = False) -> int:
+    """Write one decision per matching message to the store at output_path and return how many.
+
+    chat_data is any iterable of chat records (e.g. iter_chat_records) or a
+    loaded chat_data.json in either schema.
+    """
+    if isinstance(chat_data, dict):
+        chat_data = chat_records(chat_data)
+    pattern, priority = compile_keywords(DECISION_KEYWORDS)
+    categories = list(DECISION_KEYWORDS.items())
+
+    def decisions():
+        current_member = None  # curated logs only name the member on their own messages
+        for record in chat_data:
+            message = normalize_message(record)
+            current_member = message["member"] or current_member
+            text = message["text"]
+            if not isinstance(text, str):
+                continue
+
+            ranks = {priority[match] for match in pattern.findall(text.lower())}
+            if not ranks:
+                continue
+            category, kws = categories[min(ranks)]
+            yield {
+                "date": message["date"],
+                "member": current_member,
+                "member_name": message["sender"] if message["role"] == MEMBER_ROLE else "Elyx Team",
+                "category": category,
+                "summary": text,
+                "origin_chat_id": f"{message['sender']}_{message['date']}", # A simple ID
+                "rationale": f"Based on conversation about {', '.join(kws)}"
+            }
+
+    store = JsonlStore(output_path, key=record_key)
+    count = store.append(decisions()) if append else store.write(decisions())
+    print(f"✅ {count} interventions/decisions extracted at {output_path}")
+    return count
+
+def main(input_path: str = None, output_path: str = DECISIONS_OUTPUT_PATH, append: bool = False):
+    input_path = input_path or default_chat_path()
+    if input_path != "-" and not os.path.exists(input_path):
+        print(f"Error: {input_path} not found. Run generate_chats.py first.")
+        return
+    extract_decisions(iter_chat_records(input_path), output_path, append)
 
 if __name__ == "__main__":
-    try:
-        with open(CHAT_DATA_PATH) as f:
-            chat_data = json.load(f)
-        extract_decisions(chat_data)
-    except FileNotFoundError:
-        print(f"Error: {CHAT_DATA_PATH} not found. Run generate_chats.py first.")
+    parser = argparse.ArgumentParser(description="Extract interventions/decisions from the chat log into a JSONL store")
+    parser.add_argument("--input", help="Chat store directory, chat_data.json, a .jsonl file, or - for JSONL on stdin (default: data/chats if generated, else data/chat_data.json)")
+    parser.add_argument("--output", default=DECISIONS_OUTPUT_PATH, help="Store directory")
+    parser.add_argument("--append", action="store_true", help="Append to the store instead of replacing its contents")
+    args = parser.parse_args()
+    main(args.input, args.output, args.append)
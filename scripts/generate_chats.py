@@ -1,47 +1,166 @@
 # --- scripts/generate_chats.py ---
 # This script generates the 8-month chat data for all members.
 
+import copy
 import datetime
+import hashlib
 import json
 import random
 import re
-import torch
+import sys
 import os
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from collections import OrderedDict
 from tqdm.auto import tqdm
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from completion_cache import CompletionCache, CACHE_DIR, completion_key, load_checkpoint, save_checkpoint
+
 # --- Model Initialization ---
+MODEL_ID = "deepseek-ai/deepseek-llm-7b-chat"
 model = None
 tokenizer = None
 
+# "auto" places the bf16 model on the available GPUs; "cpu" runs in fp32 on CPU,
+# optionally with int8 dynamic quantization of the Linear layers
+INFERENCE = {"device": "auto", "int8": False}
+
+def configure_inference(device: str = "auto", int8: bool = False):
+    if int8 and device != "cpu":
+        raise ValueError("int8 dynamic quantization is only available with device='cpu'")
+    if model is not None and INFERENCE != {"device": device, "int8": int8}:
+        raise RuntimeError("configure_inference must be called before the model is loaded")
+    INFERENCE.update(device=device, int8=int8)
+
+def model_variant() -> str:
+    """Identifies the weights that produce a completion; int8 outputs differ from full precision"""
+    return f"{MODEL_ID}+int8" if INFERENCE["int8"] else MODEL_ID
+
 def initialize_model():
     global model, tokenizer
     if model and tokenizer:
         return
-    model_id = "deepseek-ai/deepseek-llm-7b-chat"
+    # Imported here, not at module level, so loading this script (e.g. from
+    # run_pipeline.run_script) does not pay for torch/transformers until generation starts
+    import torch
+    from transformers import AutoTokenizer, AutoModelForCausalLM
     try:
-        tokenizer = AutoTokenizer.from_pretrained(model_id)
-        model = AutoModelForCausalLM.from_pretrained(
-            model_id,
-            device_map="auto",
-            torch_dtype=torch.bfloat16,
-            trust_remote_code=True
-        )
+        tokenizer = AutoTokenizer.from_pretrained(MODEL_ID)
+        if INFERENCE["device"] == "cpu":
+            model = AutoModelForCausalLM.from_pretrained(MODEL_ID, torch_dtype=torch.float32, trust_remote_code=True)
+            if INFERENCE["int8"]:
+                # int8 weights with activations quantized on the fly, for the Linear layers that dominate CPU time
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            model.eval()
+        else:
+            model = AutoModelForCausalLM.from_pretrained(
+                MODEL_ID,
+                device_map="auto",
+                torch_dtype=torch.bfloat16,
+                trust_remote_code=True
+            )
     except Exception as e:
         print(f"Failed to initialize model. Error: {e}")
         raise
 
-def call_llm_for_conversation(prompt: str) -> str:
+# Sampling parameters shared by the serial and batched paths. Generation samples, so
+# the two paths draw from the same distribution but do not produce the same text.
+GENERATION_KWARGS = {"max_new_tokens": 256, "do_sample": True, "temperature": 0.7, "top_p": 0.9}
+
+# --- Shared-prefix KV cache ---
+# Prompts start with a per-member, per-expert preamble. Its KV cache is computed
+# once and reused, so each call only prefills the few tokens of the day's context.
+MAX_PREFIX_CACHES = 6  # one per expert, i.e. all of the current member's prefixes
+_prefix_caches = OrderedDict()  # prefix text -> (prefix token ids, KV cache)
+
+def _encode_prefix(prefix: str):
+    import torch
+    from transformers import DynamicCache
+
+    templated = tokenizer.apply_chat_template([{"role": "user", "content": prefix}], tokenize=False)
+    # Cut right after the prefix text; the template appends end-of-turn tokens we must not cache
+    cut = templated.rindex(prefix) + len(prefix)
+    prefix_ids = tokenizer(templated[:cut], return_tensors="pt", add_special_tokens=False).input_ids.to(model.device)
+    with torch.no_grad():
+        kv_cache = model(prefix_ids, past_key_values=DynamicCache(), use_cache=True).past_key_values
+    return prefix_ids[0], kv_cache
+
+def prefix_kv_cache(prefix: str, input_ids):
+    """A private copy of the KV cache for the part of input_ids covered by prefix, or None"""
+    entry = _prefix_caches.get(prefix)
+    if entry is None:
+        entry = _prefix_caches[prefix] = _encode_prefix(prefix)
+        while len(_prefix_caches) > MAX_PREFIX_CACHES:
+            _prefix_caches.popitem(last=False)
+    else:
+        _prefix_caches.move_to_end(prefix)
+    prefix_ids, kv_cache = entry
+
+    # The last prefix token can merge with the text after it, so only reuse the
+    # tokens both encodings agree on, and leave at least one token to prefill
+    limit = min(len(prefix_ids), input_ids.shape[1] - 1)
+    mismatch = (input_ids[0, :limit] != prefix_ids[:limit]).nonzero()
+    shared = int(mismatch[0]) if len(mismatch) else limit
+    if shared == 0:
+        return None
+    # generate() extends the cache in place, so each call gets its own copy
+    kv_cache = copy.deepcopy(kv_cache)
+    if shared < kv_cache.get_seq_length():
+        kv_cache.crop(shared)
+    return kv_cache
+
+def call_llm_for_conversation(prompt: str, prefix: str = None) -> str:
     initialize_model()
     messages = [{"role": "user", "content": prompt}]
     input_tensor = tokenizer.apply_chat_template(messages, add_generation_prompt=True, return_tensors="pt").to(model.device)
+    cache_kwargs = {}
+    if prefix and prompt.startswith(prefix):
+        kv_cache = prefix_kv_cache(prefix, input_tensor)
+        if kv_cache is not None:
+            cache_kwargs["past_key_values"] = kv_cache
     outputs = model.generate(
-        input_tensor, max_new_tokens=256, do_sample=True, temperature=0.7, top_p=0.9,
+        input_tensor, **GENERATION_KWARGS, **cache_kwargs,
         eos_token_id=tokenizer.eos_token_id, pad_token_id=tokenizer.pad_token_id
     )
     result_text = tokenizer.decode(outputs[0][input_tensor.shape[1]:], skip_special_tokens=True)
     return result_text
 
+def call_llm_for_conversations_batch(prompts: list[str], batch_size: int = 8, on_batch=None) -> list[str]:
+    """Generate completions for many prompts in left-padded batches, returned in input order.
+
+    on_batch(indices, completions) is called after every batch, e.g. to persist results early.
+    Completions are sampled like call_llm_for_conversation's, not reproduced: the same prompt
+    gives different text here than in a serial run.
+    """
+    initialize_model()
+    # Decoder-only models must be padded on the left so generation continues from real tokens
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token_id is None:
+        tokenizer.pad_token = tokenizer.eos_token
+
+    texts = [
+        tokenizer.apply_chat_template([{"role": "user", "content": p}], add_generation_prompt=True, tokenize=False)
+        for p in prompts
+    ]
+    # Batch prompts of similar length together to minimise padding
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    results = [None] * len(texts)
+    for start in tqdm(range(0, len(order), batch_size), desc="Generating batches"):
+        indices = order[start:start + batch_size]
+        # The chat template already contains the special tokens
+        encoded = tokenizer(
+            [texts[i] for i in indices], return_tensors="pt", padding=True, add_special_tokens=False
+        ).to(model.device)
+        outputs = model.generate(
+            **encoded, **GENERATION_KWARGS,
+            eos_token_id=tokenizer.eos_token_id, pad_token_id=tokenizer.pad_token_id
+        )
+        completions = tokenizer.batch_decode(outputs[:, encoded["input_ids"].shape[1]:], skip_special_tokens=True)
+        for i, completion in zip(indices, completions):
+            results[i] = completion
+        if on_batch:
+            on_batch(indices, completions)
+    return results
+
 # --- Simulation Logic ---
 ELYX_TEAM = {
     "Ruby": {"role": "Concierge / Orchestrator", "voice": "Empathetic, organized, and proactive. She anticipates needs and confirms every action. Her job is to remove all friction from the client's life."},
@@ -64,9 +183,23 @@ def get_relevant_expert(event_context: list[str]) -> str:
     if any(keyword in context_str for keyword in ["exercise", "workout", "mobility", "physical", "training", "pt"]): return "Rachel"
     return "Neel"
 
-def generate_member_journey(member: dict, start_date: datetime.date, days: int, month: int, journey_config: dict) -> list[dict]:
-    journey = []
-    all_senders = list(ELYX_TEAM.keys()) + [member["name"]]
+def build_prompt_prefix(member: dict, expert_name: str) -> str:
+    """Everything in a prompt that only depends on the member and the expert.
+
+    It comes first so calls for the same member and expert share a token
+    prefix, whose KV cache is reused (see prefix_kv_cache).
+    """
+    expert_info = ELYX_TEAM[expert_name]
+    return (f"Generate a brief, realistic WhatsApp-style conversation for {member['name']}. "
+            f"Format as: 'Sender: Message'. Use the full name. "
+            f"Member Persona: {member['name']}, {member['age']}, {member['occupation']} from {member['residence']}. "
+            f"Chronic Condition: {member['chronic_condition']}. "
+            f"The initial query is handled by {expert_name}. Your task is to generate a conversation where {expert_name} speaks with the voice: '{expert_info['voice']}' and {member['name']} responds naturally. "
+            f"Ensure the conversation has at least 2 messages and flows realistically.")
+
+def build_conversation_jobs(member: dict, start_date: datetime.date, days: int, month: int, journey_config: dict) -> list[dict]:
+    """The days of a month that get a conversation, with the prompt for each"""
+    jobs = []
     monthly_events = journey_config.get(str(month), {}).get("events", [])
     
     for day_num in range(days):
@@ -83,41 +216,141 @@ def generate_member_journey(member: dict, start_date: datetime.date, days: int,
         if not event_context: continue
 
         expert_name = get_relevant_expert(event_context)
-        expert_info = ELYX_TEAM[expert_name]
-
+        prefix = build_prompt_prefix(member, expert_name)
         context_str = ". ".join(event_context)
-        prompt = (f"Generate a brief, realistic WhatsApp-style conversation for {member['name']}. "
-                  f"Format as: 'Sender: Message'. Use the full name. "
-                  f"Member Persona: {member['name']}, {member['age']}, {member['occupation']} from {member['residence']}. "
-                  f"Chronic Condition: {member['chronic_condition']}. "
-                  f"Today's Context: {context_str}. "
-                  f"The initial query is handled by {expert_name}. Your task is to generate a conversation where {expert_name} speaks with the voice: '{expert_info['voice']}' and {member['name']} responds naturally. "
-                  f"Ensure the conversation has at least 2 messages and flows realistically.")
-        
-        raw_conversation = call_llm_for_conversation(prompt)
-        conversation_lines = re.findall(r'^(.*?):\s*(.*)$', raw_conversation, re.MULTILINE)
-        
-        for sender, text in conversation_lines:
-            sender_name = sender.strip()
-            if sender_name in all_senders:
-                journey.append({
-                    "date": current_date.isoformat(),
-                    "sender": sender_name,
-                    "role": ELYX_TEAM.get(sender_name, {}).get("role", "Member"),
-                    "text": text.strip()
-                })
-    return journey
-
-def generate_chats_for_months(member, start_date, months, journey_config):
-    all_chats = []
+        prompt = f"{prefix} Today's Context: {context_str}."
+        jobs.append({"member": member, "date": current_date, "month": month, "expert": expert_name, "prefix": prefix, "prompt": prompt})
+    return jobs
+
+def parse_conversation(job: dict, raw_conversation: str) -> list[dict]:
+    """Chat records for the 'Sender: Message' lines of a generated conversation"""
+    member = job["member"]
+    all_senders = list(ELYX_TEAM.keys()) + [member["name"]]
+    records = []
+    conversation_lines = re.findall(r'^(.*?):\s*(.*)$', raw_conversation, re.MULTILINE)
+    
+    for sender, text in conversation_lines:
+        sender_name = sender.strip()
+        if sender_name in all_senders:
+            records.append({
+                "member": member["name"],
+                "date": job["date"].isoformat(),
+                "sender": sender_name,
+                "role": ELYX_TEAM.get(sender_name, {}).get("role", "Member"),
+                "text": text.strip()
+            })
+    return records
+
+# --- Caching and checkpoints ---
+_caches = {}
+
+def get_completion_cache(cache_dir=CACHE_DIR):
+    if cache_dir not in _caches:
+        _caches[cache_dir] = CompletionCache(cache_dir)
+    return _caches[cache_dir]
+
+def job_cache_key(job: dict) -> str:
+    sample_id = f"{job['member']['name']}:{job['date'].isoformat()}"
+    return completion_key(job["prompt"], model_variant(), GENERATION_KWARGS, sample_id)
+
+def jobs_fingerprint(jobs: list[dict]) -> str:
+    """Identifies the exact conversations planned for a member-month"""
+    return hashlib.sha256(json.dumps([job_cache_key(job) for job in jobs]).encode("utf-8")).hexdigest()
+
+def generate_completions(jobs: list[dict], batch_size: int = None, cache: CompletionCache = None) -> list[str]:
+    """Raw completions for jobs, in order. Cached completions are reused and new ones stored as soon as they exist."""
+    completions = [cache.get(job_cache_key(job)) if cache else None for job in jobs]
+    pending = [i for i, completion in enumerate(completions) if completion is None]
+    if cache and len(pending) < len(jobs):
+        print(f"♻️ Reusing {len(jobs) - len(pending)} cached conversations")
+
+    def store(i, completion):
+        completions[i] = completion
+        if cache:
+            cache.put(job_cache_key(jobs[i]), completion, model_id=model_variant(), date=jobs[i]["date"].isoformat())
+
+    if batch_size and batch_size > 1:
+        call_llm_for_conversations_batch(
+            [jobs[i]["prompt"] for i in pending], batch_size,
+            on_batch=lambda indices, outputs: [store(pending[j], output) for j, output in zip(indices, outputs)]
+        )
+    else:
+        for i in pending:
+            store(i, call_llm_for_conversation(jobs[i]["prompt"], jobs[i]["prefix"]))
+    return completions
+
+def run_conversation_jobs(jobs: list[dict], batch_size: int = None, cache: CompletionCache = None) -> list[dict]:
+    """Generate every job (serially, or in batches of batch_size) and parse the results in job order"""
+    records = []
+    for job, raw_conversation in zip(jobs, generate_completions(jobs, batch_size, cache)):
+        records.extend(parse_conversation(job, raw_conversation))
+    return records
+
+def generate_with_checkpoints(jobs: list[dict], batch_size: int = None, cache_dir: str = None, checkpoint_dir: str = None) -> list[dict]:
+    """Generate jobs per member-month, skipping member-months that already have a checkpoint"""
+    cache = get_completion_cache(cache_dir) if cache_dir else None
+    groups = {}
+    for job in jobs:
+        groups.setdefault((job["member"]["name"], job["month"]), []).append(job)
+    fingerprints = {key: jobs_fingerprint(group) for key, group in groups.items()}
+
+    done = {}
+    if checkpoint_dir:
+        for key in groups:
+            records = load_checkpoint(checkpoint_dir, *key, fingerprints[key])
+            if records is not None:
+                done[key] = records
+        if done:
+            print(f"⏩ Resuming: {len(done)} of {len(groups)} member-months already generated")
+    pending = [key for key in groups if key not in done]
+
+    def finish(key, records):
+        done[key] = records
+        if checkpoint_dir:
+            save_checkpoint(checkpoint_dir, *key, fingerprints[key], records)
+
+    if batch_size and batch_size > 1:
+        # Batch across everything still pending; the completion cache covers a crash mid-run
+        pending_jobs = [job for key in pending for job in groups[key]]
+        print(f"\n--- Generating {len(pending_jobs)} conversations (batch size {batch_size}) ---")
+        per_group = {key: [] for key in pending}
+        for job, raw_conversation in zip(pending_jobs, generate_completions(pending_jobs, batch_size, cache)):
+            per_group[(job["member"]["name"], job["month"])].extend(parse_conversation(job, raw_conversation))
+        for key in pending:
+            finish(key, per_group[key])
+    else:
+        for key in pending:
+            print(f"\n--- Generating Month {key[1]} for {key[0]} ---")
+            finish(key, run_conversation_jobs(groups[key], cache=cache))
+
+    return [record for key in groups for record in done[key]]
+
+# --- Entry points ---
+
+def generate_member_journey(member: dict, start_date: datetime.date, days: int, month: int, journey_config: dict, batch_size: int = None) -> list[dict]:
+    jobs = build_conversation_jobs(member, start_date, days, month, journey_config)
+    return run_conversation_jobs(jobs, batch_size)
+
+def build_member_jobs(member, start_date, months, journey_config):
+    jobs = []
     for m in range(1, months + 1):
-        print(f"\n--- Generating Month {m} for {member['name']} ---")
         month_start = start_date + datetime.timedelta(days=(m - 1) * DAYS_PER_MONTH)
-        month_chats = generate_member_journey(
-            member, month_start, DAYS_PER_MONTH, month=m, journey_config=journey_config
-        )
-        all_chats.extend(month_chats)
-    return all_chats
+        jobs.extend(build_conversation_jobs(member, month_start, DAYS_PER_MONTH, month=m, journey_config=journey_config))
+    return jobs
+
+def generate_chats_for_months(member, start_date, months, journey_config, batch_size=None, cache_dir=None, checkpoint_dir=None):
+    # All prompts are planned up front (same random draws as before), so a
+    # resumed run plans exactly the conversations the interrupted one did
+    jobs = build_member_jobs(member, start_date, months, journey_config)
+    return generate_with_checkpoints(jobs, batch_size, cache_dir, checkpoint_dir)
+
+def generate_chats_for_members(members, start_date, months, journey_config, batch_size=8, cache_dir=None, checkpoint_dir=None):
+    """Batch prompts across all members and months; records come back grouped by member in date order"""
+    jobs = []
+    for member in members:
+        jobs.extend(build_member_jobs(member, start_date, months, journey_config))
+    print(f"\n--- Planned {len(jobs)} conversations for {len(members)} members ---")
+    return generate_with_checkpoints(jobs, batch_size, cache_dir, checkpoint_dir)
 
 if __name__ == "__main__":
     pass
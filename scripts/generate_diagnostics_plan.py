@@ -56,5 +56,8 @@ def generate_diagnostics_plan():
         json.dump(plan, f, indent=2)
     print(f"✅ Diagnostics plan generated at {DIAGNOSTICS_OUTPUT_PATH}")
 
-if __name__ == "__main__":
+def main():
     generate_diagnostics_plan()
+
+if __name__ == "__main__":
+    main()
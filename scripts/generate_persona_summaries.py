@@ -1,60 +1,180 @@
 # --- scripts/generate_persona_summaries.py ---
 # This script generates monthly summaries for each member's journey.
+#
+# One pass: members' messages are grouped by (member, year, month) and every
+# message is scanned once by a single compiled pattern covering all topic
+# keywords. Input (the chat store, chat_data.json, a JSONL file such as a chat
+# shard, or "-" for JSONL on stdin) is streamed in chunks whose counts are added
+# up. Summaries are written to a JSONL store indexed by member and month. With
+# --update, the counts of the input (messages just appended to the chat store)
+# are added to the saved summaries of the months they fall in. --output writes
+# another store; the backend keeps the summaries of the chat log including
+# ingested messages this way (backend/ingest.py).
+#
+#   python scripts/generate_persona_summaries.py --input data/shards/chats/rohan-patel.jsonl
+#   python scripts/generate_persona_summaries.py --update --input new_messages.jsonl
 
+import argparse
 import json
-import datetime
+import os
+import re
+import sys
+from itertools import chain, islice
+
 import pandas as pd
 
-CHAT_DATA_PATH = "data/chat_data.json"
-SUMMARIES_OUTPUT_PATH = "data/persona_summaries.json"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+from chat_io import MEMBER_ROLE, chat_frame, default_chat_path, iter_chat_records
+from jsonl_store import JsonlStore, open_store
+from member_store import record_key
+
+SUMMARIES_OUTPUT_PATH = "data/persona_summaries"
+TOPICS_CONFIG_PATH = "config/persona_topics.json"
+# Used when config/persona_topics.json does not exist: topic -> keywords
+DEFAULT_TOPICS = {
+    "health_concerns": ["health"], "exercise_questions": ["workout"],
+    "diet_concerns": ["nutrition"], "wearable_data": ["data"], "travel_issues": ["travel"]
+}
+CHUNK_SIZE = 50_000
+
+def load_topics(path: str = TOPICS_CONFIG_PATH) -> dict:
+    try:
+        with open(path) as f:
+            topics = json.load(f)
+    except FileNotFoundError:
+        topics = DEFAULT_TOPICS
+    return {topic: [keywords] if isinstance(keywords, str) else list(keywords) for topic, keywords in topics.items()}
+
+def compile_topics(topics: dict):
+    """One pattern matching any keyword (as a substring, case-insensitively), and keyword -> topic"""
+    keyword_topic = {keyword.lower(): topic for topic, keywords in topics.items() for keyword in keywords}
+    # Longest first, so a keyword is not shadowed by a shorter one it starts with
+    keywords = sorted(keyword_topic, key=len, reverse=True)
+    return re.compile("|".join(re.escape(keyword) for keyword in keywords)), keyword_topic
+
+def summary_key(summary: dict) -> tuple:
+    return record_key(summary)[0], f"{summary['year']}-{summary['month']:02d}"
+
+def iter_chat_chunks(paths: list, chunk_size: int = CHUNK_SIZE):
+    """Normalized chat frames of up to chunk_size messages, streamed from stores, JSON, JSONL or stdin in order"""
+    records = chain.from_iterable(iter_chat_records(path) for path in paths)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+        yield chat_frame(chunk)
+
+def topic_counts(df: pd.DataFrame, pattern, keyword_topic: dict, topic_names: list) -> pd.DataFrame:
+    """Members' messages and per-topic message counts, indexed by (member, year, month)"""
+    messages = df[df["role"] == MEMBER_ROLE]
+    keys = pd.DataFrame({
+        "member": messages["member"],
+        "year": messages["sent_at"].dt.year,
+        "month": messages["sent_at"].dt.month,
+    })
+    counts = keys.groupby(list(keys.columns), sort=False).size().to_frame("messages")
 
-def generate_summaries():
+    # Non-string texts become NaN and match nothing
+    found = messages["text"].str.lower().str.findall(pattern).explode().dropna()
+    hits = pd.DataFrame({"topic": found.map(keyword_topic)}, index=found.index)
+    # A message counts once per topic, however many of its keywords it contains
+    hits = hits[~hits.reset_index().duplicated().to_numpy()]
+    per_topic = hits.join(keys).groupby(list(keys.columns) + ["topic"], sort=False).size().unstack("topic")
+    return counts.join(per_topic.reindex(columns=topic_names)).fillna(0).astype(int)
+
+def status_message(num_queries: int, summary_topics: dict) -> str:
+    return (f"Engaged with {num_queries} queries this month. Top topics: " +
+            ', '.join([k for k, v in sorted(summary_topics.items(), key=lambda item: item[1], reverse=True) if v > 0]))
+
+def topic_totals(input_paths: list, topics: dict):
+    """Message and per-topic counts by (member, year, month) of a chat log, or None if it has no member messages"""
+    topic_names = list(topics)
+    pattern, keyword_topic = compile_topics(topics)
+    totals = None
+    for chunk in iter_chat_chunks(input_paths):
+        counts = topic_counts(chunk, pattern, keyword_topic, topic_names)
+        totals = counts if totals is None else pd.concat([totals, counts]).groupby(level=[0, 1, 2], sort=False).sum()
+    return totals
+
+def summary(member_name, year: int, month: int, messages: int, summary_topics: dict) -> dict:
+    return {
+        "member_name": member_name,
+        "year": year,
+        "month": month,
+        "total_messages_sent": messages,
+        "summary_topics": summary_topics,
+        "status_message": status_message(messages, summary_topics)
+    }
+
+def summary_records(totals, topic_names: list) -> list:
+    if totals is None:
+        return []
+    # Members in order of appearance, each member's months in calendar order
+    member_order = {member: i for i, member in enumerate(totals.index.get_level_values(0).unique())}
+    return [
+        summary(member_name, int(year), int(month), int(row["messages"]), {topic: int(row[topic]) for topic in topic_names})
+        for (member_name, year, month), row in sorted(totals.iterrows(), key=lambda item: (member_order[item[0][0]], item[0][1], item[0][2]))
+    ]
+
+def generate_summaries(input_paths: list = None, topics: dict = None, output_path: str = SUMMARIES_OUTPUT_PATH):
+    input_paths = input_paths or [default_chat_path()]
+    topics = topics or load_topics()
     try:
-        with open(CHAT_DATA_PATH) as f:
-            chat_data = json.load(f)
+        totals = topic_totals(input_paths, topics)
     except FileNotFoundError:
-        print(f"Error: {CHAT_DATA_PATH} not found. Please run generate_chats.py first.")
+        print(f"Error: {', '.join(input_paths)} not found. Please run generate_chats.py first.")
         return
 
-    df = pd.DataFrame(chat_data)
-    df["date"] = pd.to_datetime(df["date"])
-    df["month"] = df["date"].dt.month
-    
-    members = df["sender"].unique()
-    summaries = []
-
-    for member_name in [m for m in members if m not in ["Ruby", "Dr. Warren", "Advik", "Carla", "Rachel", "Neel"]]:
-        member_df = df[df["sender"] == member_name]
-        
-        for month in member_df["month"].unique():
-            month_df = member_df[member_df["month"] == month]
-            num_queries = len(month_df)
-            
-            # Simple summarization based on keywords in the texts
-            topics = {
-                "health_concerns": "health", "exercise_questions": "workout",
-                "diet_concerns": "nutrition", "wearable_data": "data", "travel_issues": "travel"
-            }
-            summary_topics = {topic: 0 for topic in topics}
-            for text in month_df["text"]:
-                if isinstance(text, str):
-                    for key, val in topics.items():
-                        if val in text.lower():
-                            summary_topics[key] += 1
-            
-            summary = {
-                "member_name": member_name,
-                "month": month,
-                "total_messages_sent": num_queries,
-                "summary_topics": summary_topics,
-                "status_message": f"Engaged with {num_queries} queries this month. Top topics: " +
-                                  ', '.join([k for k, v in sorted(summary_topics.items(), key=lambda item: item[1], reverse=True) if v > 0])
+    JsonlStore(output_path, key=summary_key).write(summary_records(totals, list(topics)))
+    print(f"✅ Persona summaries generated at {output_path}")
+
+def update_summaries(input_paths: list, topics: dict = None, log_paths: list = None, output_path: str = SUMMARIES_OUTPUT_PATH):
+    """Add the counts of new messages (e.g. a batch just appended to the chat store) to the
+    saved summaries; only the members and months the messages fall in are recomputed.
+    Without saved summaries they are generated from the whole chat log, log_paths."""
+    topics = topics or load_topics()
+    saved = open_store(output_path)
+    if saved is None:
+        print(f"♻️ No summaries at {output_path} to update; generating them from the whole chat log")
+        return generate_summaries(log_paths, topics, output_path)
+    summaries = saved.records()
+    saved.close()
+
+    position = {(s["member_name"], s["year"], s["month"]): i for i, s in enumerate(summaries)}
+    changed = 0
+    for new in summary_records(topic_totals(input_paths, topics), list(topics)):
+        key = (new["member_name"], new["year"], new["month"])
+        if key not in position:
+            position[key] = len(summaries)
+            summaries.append(new)
+        else:
+            old = summaries[position[key]]
+            summary_topics = {
+                topic: old["summary_topics"].get(topic, 0) + new["summary_topics"].get(topic, 0)
+                for topic in dict.fromkeys(list(old["summary_topics"]) + list(new["summary_topics"]))
             }
-            summaries.append(summary)
+            summaries[position[key]] = summary(*key, old["total_messages_sent"] + new["total_messages_sent"], summary_topics)
+        changed += 1
+
+    JsonlStore(output_path, key=summary_key).write(summaries)
+    print(f"✅ {changed} persona summaries updated at {output_path}")
 
-    with open(SUMMARIES_OUTPUT_PATH, "w") as f:
-        json.dump(summaries, f, indent=2)
-    print(f"✅ Persona summaries generated at {SUMMARIES_OUTPUT_PATH}")
+def main(input_paths: list = None, topics_path: str = TOPICS_CONFIG_PATH, update: bool = False,
+         log_paths: list = None, output_path: str = SUMMARIES_OUTPUT_PATH):
+    if update:
+        update_summaries(input_paths, load_topics(topics_path), log_paths, output_path)
+    else:
+        generate_summaries(input_paths, load_topics(topics_path), output_path)
 
 if __name__ == "__main__":
-    generate_summaries()
+    parser = argparse.ArgumentParser(description="Summarize each member's messages per month")
+    parser.add_argument("--input", nargs="+", metavar="PATH", help="Chat store directories, chat_data.json, .jsonl files, or - for JSONL on stdin, read in order (default: data/chats if generated, else data/chat_data.json)")
+    parser.add_argument("--topics", default=TOPICS_CONFIG_PATH, help="JSON file mapping topic -> keyword or list of keywords")
+    parser.add_argument("--update", action="store_true", help="Add the counts of --input (new messages only) to the saved summaries instead of rebuilding them")
+    parser.add_argument("--log", nargs="+", metavar="PATH", help="With --update: the whole chat log, summarized if no summaries are saved yet (default: as --input's default)")
+    parser.add_argument("--output", default=SUMMARIES_OUTPUT_PATH, help="Summary store to write")
+    args = parser.parse_args()
+    if args.update and not args.input:
+        parser.error("--update requires --input")
+    main(args.input, args.topics, args.update, args.log, args.output)
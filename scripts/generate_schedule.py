@@ -1,70 +1,100 @@
 # --- scripts/generate_schedule.py ---
-# This script generates a day-by-day schedule for the 8-month journey.
+# This script generates the schedule of the 8-month journey for every member.
+#
+# Which events happen when is a declarative rule table. Instead of one entry per
+# day, the output stores each member's events as intervals (start, end) in a
+# JSONL store, which the backend indexes for date-range lookups
+# (backend/schedule_index.py).
 
 import json
+import os
+import sys
 import datetime
+from functools import partial
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+from member_store import member_id_for, record_key
+from jsonl_store import JsonlStore
 
 JOURNEY_CONFIG_PATH = "config/journey_config.json"
-SCHEDULE_OUTPUT_PATH = "data/schedule.json"
+PROFILES_PATH = "data/member_profiles.json"
+SCHEDULE_OUTPUT_PATH = "data/schedule"
+JOURNEY_START = datetime.date(2025, 8, 1)
 DAYS_PER_MONTH = 30
+MONTHS = 8
+
+# journey_config event -> scheduled event. "days" are offsets into the month the
+# event is configured for, "every" repeats from the first day every N days, and
+# "duration_days" is how many days each occurrence spans.
+SCHEDULE_RULES = [
+    {"event": "onboarding", "title": "Member Onboarding Session", "days": [0]},
+    {"event": "baseline_panel", "title": "Baseline Diagnostic Test Panel", "days": [2]},
+    {"event": "plan_setup", "title": "Initial Intervention Plan Setup", "days": [7]},
+    {"event": "travel", "title": "1-week business travel", "every": 7, "duration_days": 7},
+    {"event": "quarterly_panel", "title": "Quarterly Diagnostic Test Panel", "days": [1]},
+    {"event": "adherence_issue", "title": "Adherence follow-up call", "days": [10]},
+    {"event": "nutrition_tweak", "title": "Nutrition plan adjustment", "days": [12]},
+    {"event": "exercise_update", "title": "Exercise plan update", "days": [10]},
+    {"event": "plan_update", "title": "Overall plan review and update", "days": [14]},
+    {"event": "advanced_cardio_test", "title": "Advanced Cardiovascular Assessment", "days": [5]},
+    {"event": "jetlag_protocol", "title": "Jetlag recovery protocol call", "days": [2]},
+    {"event": "final_review", "title": "Final 8-month review", "days": [28]},
+]
+
+def rule_days(rule: dict) -> list:
+    if "every" in rule:
+        return list(range(0, DAYS_PER_MONTH, rule["every"]))
+    return rule["days"]
 
-def generate_schedule(journey_config):
-    schedule = {}
-    start_date = datetime.date(2025, 8, 1)
+def journey_intervals(journey_config: dict, start_date: datetime.date = JOURNEY_START) -> list:
+    """Scheduled events of one journey as {"start", "end", "event", "title", "month"}, sorted by start"""
+    rules_by_event = {}
+    for rule in SCHEDULE_RULES:
+        rules_by_event.setdefault(rule["event"], []).append(rule)
 
-    for month_num in range(1, 9):
-        monthly_events = journey_config.get(str(month_num), {}).get("events", [])
-        month_start_date = start_date + datetime.timedelta(days=(month_num - 1) * DAYS_PER_MONTH)
-        
-        schedule[f"Month_{month_num}"] = {
-            "start_date": month_start_date.isoformat(),
-            "events": monthly_events,
-            "daily_details": []
-        }
+    intervals = []
+    for month_num in range(1, MONTHS + 1):
+        month_start = start_date + datetime.timedelta(days=(month_num - 1) * DAYS_PER_MONTH)
+        for event in journey_config.get(str(month_num), {}).get("events", []):
+            for rule in rules_by_event.get(event, []):
+                for day in rule_days(rule):
+                    start = month_start + datetime.timedelta(days=day)
+                    end = start + datetime.timedelta(days=rule.get("duration_days", 1) - 1)
+                    intervals.append({
+                        "start": start.isoformat(),
+                        "end": end.isoformat(),
+                        "event": event,
+                        "title": rule["title"],
+                        "month": month_num,
+                    })
+    intervals.sort(key=lambda interval: interval["start"])
+    return intervals
 
-        for day in range(DAYS_PER_MONTH):
-            current_date = month_start_date + datetime.timedelta(days=day)
-            day_events = []
-            
-            # Simple logic to assign events to days
-            if "onboarding" in monthly_events and day == 0:
-                day_events.append("Member Onboarding Session")
-            if "baseline_panel" in monthly_events and day == 2:
-                day_events.append("Baseline Diagnostic Test Panel")
-            if "plan_setup" in monthly_events and day == 7:
-                day_events.append("Initial Intervention Plan Setup")
-            if "travel" in monthly_events and day % 7 == 0:
-                day_events.append("Start of 1-week business travel")
-            if "quarterly_panel" in monthly_events and day == 1:
-                day_events.append("Quarterly Diagnostic Test Panel")
-            if "adherence_issue" in monthly_events and day == 10:
-                day_events.append("Adherence follow-up call")
-            if "nutrition_tweak" in monthly_events and day == 12:
-                day_events.append("Nutrition plan adjustment")
-            if "exercise_update" in monthly_events and day == 10:
-                day_events.append("Exercise plan update")
-            if "plan_update" in monthly_events and day == 14:
-                day_events.append("Overall plan review and update")
-            if "advanced_cardio_test" in monthly_events and day == 5:
-                day_events.append("Advanced Cardiovascular Assessment")
-            if "jetlag_protocol" in monthly_events and day == 2:
-                day_events.append("Jetlag recovery protocol call")
-            if "final_review" in monthly_events and day == 28:
-                day_events.append("Final 8-month review")
+def generate_schedule(journey_config, members=None):
+    """Write every member's event intervals; members start on their profile's
+    "journey_start" date if it has one"""
+    members = members if members is not None else [{"name": "Member"}]
 
-            schedule[f"Month_{month_num}"]["daily_details"].append({
-                "date": current_date.isoformat(),
-                "events": day_events
-            })
+    def intervals():
+        for member in members:
+            start = member.get("journey_start")
+            start_date = datetime.date.fromisoformat(start) if start else JOURNEY_START
+            member_id = member_id_for(member)
+            for interval in journey_intervals(journey_config, start_date):
+                yield {"member_id": member_id, **interval}
 
-    with open(SCHEDULE_OUTPUT_PATH, "w") as f:
-        json.dump(schedule, f, indent=2)
+    JsonlStore(SCHEDULE_OUTPUT_PATH, key=partial(record_key, date_field="start")).write(intervals())
     print(f"✅ Schedule generated at {SCHEDULE_OUTPUT_PATH}")
 
-if __name__ == "__main__":
+def main():
     try:
         with open(JOURNEY_CONFIG_PATH) as f:
             journey_config = json.load(f)
-        generate_schedule(journey_config)
-    except FileNotFoundError:
-        print(f"Error: {JOURNEY_CONFIG_PATH} not found. Please create it.")
+        with open(PROFILES_PATH) as f:
+            members = json.load(f)
+        generate_schedule(journey_config, members)
+    except FileNotFoundError as e:
+        print(f"Error: {e.filename} not found. Please create it.")
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,337 @@
 # --- scripts/run_pipeline.py ---
-# This is the main pipeline runner.
+# This is the main pipeline runner. Stages form a DAG through their declared
+# inputs and outputs; independent stages run concurrently in a process pool,
+# and a stage whose inputs are unchanged since its last successful run is skipped.
 
 import os
 import json
+import hashlib
+import datetime
+import argparse
+import random
 import importlib.util
+import glob
 import sys
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+from chat_shards import SHARD_DIR, shard_path, write_shard, merge_shards
+from jsonl_store import JsonlStore, manifest_path
+from member_store import record_key
 
 # Define file paths
 PROFILES_PATH = "data/member_profiles.json"
 JOURNEY_CONFIG_PATH = "config/journey_config.json"
-CHAT_OUTPUT_PATH = "data/chat_data.json"
+CHAT_STORE_PATH = "data/chats"
+# Stages that write a JSONL store declare its manifest, which changes on every write
+CHAT_OUTPUT_PATH = manifest_path(CHAT_STORE_PATH)
+JSONL_STORE_MODULE = "backend/jsonl_store.py"
+COMPLETION_CACHE_DIR = "data/cache/completions"
+CHECKPOINT_DIR = "data/checkpoints"
+STATE_PATH = "data/.pipeline_state.json"
+# The snapshot holds response bodies as the app builds them, so any backend module can change them
+BACKEND_MODULES = sorted(glob.glob("backend/*.py"))
+
+# Each stage's script is an implicit input, so editing a script re-runs its stage
+STAGES = {
+    "chats": {
+        "script": "scripts/generate_chats.py",
+        "inputs": [PROFILES_PATH, JOURNEY_CONFIG_PATH, "scripts/completion_cache.py", "scripts/chat_shards.py", JSONL_STORE_MODULE],
+        "outputs": [CHAT_OUTPUT_PATH],
+    },
+    "schedule": {
+        "script": "scripts/generate_schedule.py",
+        "inputs": [JOURNEY_CONFIG_PATH, PROFILES_PATH, "backend/member_store.py", JSONL_STORE_MODULE],
+        "outputs": [manifest_path("data/schedule")],
+    },
+    "diagnostics_plan": {
+        "script": "scripts/generate_diagnostics_plan.py",
+        "inputs": [],
+        "outputs": ["data/diagnostics_plan.json"],
+    },
+    "biomarkers": {
+        "script": "scripts/simulate_biomarkers.py",
+        "inputs": [PROFILES_PATH, "config/simulation_config.json", "backend/member_store.py"],
+        "outputs": ["data/biomarkers.csv", "data/wearables.csv"],
+    },
+    "interventions": {
+        "script": "scripts/extract_interventions.py",
+        "inputs": [CHAT_OUTPUT_PATH, "scripts/chat_io.py", JSONL_STORE_MODULE],
+        "outputs": [manifest_path("data/decisions")],
+    },
+    "persona_summaries": {
+        "script": "scripts/generate_persona_summaries.py",
+        "inputs": [CHAT_OUTPUT_PATH, "config/persona_topics.json", "scripts/chat_io.py", JSONL_STORE_MODULE],
+        "outputs": [manifest_path("data/persona_summaries")],
+    },
+    "internal_metrics": {
+        "script": "scripts/compute_internal_metrics.py",
+        "inputs": [CHAT_OUTPUT_PATH, "scripts/chat_io.py", JSONL_STORE_MODULE],
+        "outputs": ["data/internal_metrics.json"],
+    },
+    "member_store": {
+        "script": "backend/member_store.py",
+        "inputs": [
+            PROFILES_PATH, CHAT_OUTPUT_PATH, "data/biomarkers.csv", "data/wearables.csv",
+            "data/test_panel.json", "data/diagnostics_plan.json", "data/internal_metrics.json",
+            manifest_path("data/persona_summaries"), manifest_path("data/decisions"), "data/decisions.json",
+        ],
+        "outputs": ["data/members.db"],
+    },
+    "snapshot": {
+        "script": "scripts/compile_snapshot.py",
+        "inputs": [
+            PROFILES_PATH, CHAT_OUTPUT_PATH, "data/biomarkers.csv", "data/wearables.csv",
+            "data/test_panel.json", "data/diagnostics_plan.json", "data/internal_metrics.json",
+        ] + BACKEND_MODULES,
+        "outputs": ["data/snapshot.json"],
+    },
+}
+
+# Scripts already loaded in this process, so e.g. the chat model is loaded once per worker
+_loaded_scripts = {}
+
+def load_script(script_name: str):
+    if script_name not in _loaded_scripts:
+        module_name = "pipeline_" + os.path.splitext(os.path.basename(script_name))[0]
+        spec = importlib.util.spec_from_file_location(module_name, script_name)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+        _loaded_scripts[script_name] = module
+    return _loaded_scripts[script_name]
 
 def run_script(script_name: str, **kwargs):
     """Dynamically loads and runs a script function with arguments."""
-    spec = importlib.util.spec_from_file_location("module.name", script_name)
-    module = importlib.util.module_from_spec(spec)
-    sys.modules["module.name"] = module
-    spec.loader.exec_module(module)
+    module = load_script(script_name)
     if "generate_chats" in script_name:
+        if "members" in kwargs:
+            return module.generate_chats_for_members(**kwargs)
         return module.generate_chats_for_months(**kwargs)
-    elif "simulate_biomarkers" in script_name:
+    elif "simulate_biomarkers" in script_name and "members" in kwargs:
         module.generate_biomarkers(kwargs['members'])
         module.generate_wearables(kwargs['members'])
     else:
         module.main()
 
+def chat_cache_options(options: dict) -> dict:
+    return {
+        "cache_dir": None if options["no_cache"] else COMPLETION_CACHE_DIR,
+        "checkpoint_dir": None if options["no_resume"] else CHECKPOINT_DIR,
+    }
+
+def configure_chat_model(options: dict):
+    load_script("scripts/generate_chats.py").configure_inference(device=options["device"], int8=options["int8"])
+
+def generate_member_shard(member: dict, journey_config: dict, options: dict) -> str:
+    """Generate one member's journey in a worker process and write it to its shard file."""
+    configure_chat_model(options)
+    # Seeded per member, so the plan does not depend on which worker gets which member
+    random.seed(f"{options['seed']}:{member['name']}")
+    records = run_script("scripts/generate_chats.py",
+                         member=member,
+                         start_date=datetime.date(2025, 8, 1),
+                         months=8,
+                         journey_config=journey_config,
+                         batch_size=options["batch_size"] if options["batch_size"] > 1 else None,
+                         **chat_cache_options(options))
+    path = shard_path(SHARD_DIR, member["name"])
+    write_shard(path, records)
+    return path
+
+def generate_chat_shards(member_profiles: list, journey_config: dict, options: dict):
+    """Shard members across worker processes, each with its own model, then stream-merge the shards."""
+    with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+        futures = [pool.submit(generate_member_shard, member, journey_config, options) for member in member_profiles]
+        # Profile order, whichever worker finishes first
+        paths = [future.result() for future in futures]
+    count = merge_shards(paths, CHAT_STORE_PATH)
+    print(f"✅ Merged {count} messages from {len(paths)} member shards into {CHAT_STORE_PATH}")
+
+def generate_chat_data(options: dict):
+    """The chats stage: generate every member's journey and save it to the chat store."""
+    random.seed(options["seed"])
+    with open(PROFILES_PATH) as f:
+        member_profiles = json.load(f)
+    with open(JOURNEY_CONFIG_PATH) as f:
+        journey_config = json.load(f)
+    cache_options = chat_cache_options(options)
+    configure_chat_model(options)
+
+    if options["workers"] > 1:
+        generate_chat_shards(member_profiles, journey_config, options)
+        return
+    if options["batch_size"] > 1:
+        all_journeys = run_script("scripts/generate_chats.py",
+                                  members=member_profiles,
+                                  start_date=datetime.date(2025, 8, 1),
+                                  months=8,
+                                  journey_config=journey_config,
+                                  batch_size=options["batch_size"],
+                                  **cache_options)
+    else:
+        all_journeys = []
+        for member in member_profiles:
+            member_journey = run_script("scripts/generate_chats.py", 
+                                       member=member, 
+                                       start_date=datetime.date(2025, 8, 1), 
+                                       months=8, 
+                                       journey_config=journey_config,
+                                       **cache_options)
+            all_journeys.extend(member_journey)
+
+    JsonlStore(CHAT_STORE_PATH, key=record_key).write(all_journeys)
+    print(f"✅ All chat data compiled and saved to {CHAT_STORE_PATH}")
+
+def execute_stage(name: str, options: dict):
+    """Runs one stage (in a worker process) and checks that it wrote its outputs."""
+    if name == "chats":
+        generate_chat_data(options)
+    else:
+        run_script(STAGES[name]["script"])
+    missing = [path for path in STAGES[name]["outputs"] if not os.path.exists(path)]
+    if missing:
+        raise RuntimeError(f"stage did not write {', '.join(missing)}")
+
+# --- Incremental scheduling ---
+
+def file_hash(path: str):
+    """sha256 of a file's contents, or None if it does not exist."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+def stage_fingerprint(name: str, options: dict) -> dict:
+    """Hashes of everything a stage's outputs depend on."""
+    stage = STAGES[name]
+    fingerprint = {path: file_hash(path) for path in [stage["script"]] + stage["inputs"]}
+    if name == "chats":
+        # The seed (and, with workers, its per-member derivation) decides which days get conversations
+        fingerprint["seed"] = options["seed"]
+        fingerprint["sharded"] = options["workers"] > 1
+        fingerprint["int8"] = options["int8"]
+    return fingerprint
+
+def stage_dependencies() -> dict:
+    """Stage -> stages producing one of its inputs."""
+    producers = {path: name for name, stage in STAGES.items() for path in stage["outputs"]}
+    return {
+        name: {producers[path] for path in stage["inputs"] if path in producers}
+        for name, stage in STAGES.items()
+    }
+
+def load_state() -> dict:
+    try:
+        with open(STATE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_state(state: dict):
+    tmp_path = STATE_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, STATE_PATH)
+
+def is_up_to_date(name: str, previous: dict, fingerprint: dict) -> bool:
+    """Unchanged inputs, and outputs still as the last successful run left them."""
+    if not previous or previous.get("inputs") != fingerprint:
+        return False
+    return all(previous["outputs"].get(path) == file_hash(path) for path in STAGES[name]["outputs"])
+
+def run_stages(options: dict, jobs: int = None, force: bool = False) -> bool:
+    """Runs every stage once its dependencies are done. Returns False if a stage failed."""
+    dependencies = stage_dependencies()
+    state = load_state()
+    pending = set(STAGES)
+    finished = set()
+    failed = set()
+    running = {}
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            progressed = False
+            for name in sorted(pending):
+                if dependencies[name] & failed:
+                    print(f"⏭️  Skipping {name}: an upstream stage failed")
+                    pending.discard(name)
+                    failed.add(name)
+                    progressed = True
+                elif dependencies[name] <= finished:
+                    pending.discard(name)
+                    progressed = True
+                    # Upstream stages are done, so their outputs can be hashed now
+                    fingerprint = stage_fingerprint(name, options)
+                    if not force and is_up_to_date(name, state.get(name), fingerprint):
+                        print(f"⏩ {name} is up to date")
+                        finished.add(name)
+                    else:
+                        print(f"▶️  Running {name}")
+                        running[pool.submit(execute_stage, name, options)] = (name, fingerprint)
+            if progressed and not running:
+                # Skipped stages may have unblocked others
+                continue
+            if not running:
+                raise RuntimeError(f"Stage dependency cycle among: {', '.join(sorted(pending))}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, fingerprint = running.pop(future)
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"❌ Stage {name} failed: {e}")
+                    failed.add(name)
+                    state.pop(name, None)
+                else:
+                    print(f"✅ Stage {name} finished")
+                    finished.add(name)
+                    state[name] = {
+                        "inputs": fingerprint,
+                        "outputs": {path: file_hash(path) for path in STAGES[name]["outputs"]},
+                    }
+                save_state(state)
+    return not failed
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Elyx data generation pipeline")
+    parser.add_argument("--batch-size", type=int, default=0,
+                        help="Generate chats in batches of this many prompts across all members (0 = one prompt at a time)")
+    parser.add_argument("--seed", type=int, default=42,
+                        help="Random seed for planning conversations; a resumed run must use the same seed")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Do not read or write the on-disk LLM completion cache")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Ignore per-member/per-month checkpoints and regenerate every month")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Generate chats in this many processes, one member shard at a time, each with its own model")
+    parser.add_argument("--device", choices=["auto", "cpu"], default="auto",
+                        help="Run the chat model on the available GPUs (auto) or on CPU")
+    parser.add_argument("--int8", action="store_true",
+                        help="With --device cpu, quantize the chat model's Linear layers to int8")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Maximum number of stages to run at once (default: number of CPUs)")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-run every stage even if its inputs are unchanged")
+    args = parser.parse_args()
+    if args.int8 and args.device != "cpu":
+        parser.error("--int8 requires --device cpu")
+    options = {
+        "batch_size": args.batch_size,
+        "seed": args.seed,
+        "no_cache": args.no_cache,
+        "no_resume": args.no_resume,
+        "workers": args.workers,
+        "device": args.device,
+        "int8": args.int8,
+    }
+
     print("🚀 Starting the Elyx data generation pipeline...")
 
     # Create directories if they don't exist
@@ -39,31 +345,8 @@ if __name__ == "__main__":
     # Check if input files exist
     if not os.path.exists(PROFILES_PATH) or not os.path.exists(JOURNEY_CONFIG_PATH):
         print("❌ Error: Missing input files. Please upload member_profiles.json and journey_config.json.")
-    else:
-        with open(PROFILES_PATH) as f:
-            member_profiles = json.load(f)
-        with open(JOURNEY_CONFIG_PATH) as f:
-            journey_config = json.load(f)
-
-        all_journeys = []
-        for member in member_profiles:
-            member_journey = run_script("scripts/generate_chats.py", 
-                                       member=member, 
-                                       start_date=datetime.date(2025, 8, 1), 
-                                       months=8, 
-                                       journey_config=journey_config)
-            all_journeys.extend(member_journey)
-
-        with open(CHAT_OUTPUT_PATH, "w") as f:
-            json.dump(all_journeys, f, indent=2)
-        print(f"✅ All chat data compiled and saved to {CHAT_OUTPUT_PATH}")
-
-        # The rest of the pipeline
-        run_script("scripts/generate_schedule.py")
-        run_script("scripts/generate_diagnostics_plan.py")
-        run_script("scripts/simulate_biomarkers.py", members=member_profiles)
-        run_script("scripts/extract_interventions.py")
-        run_script("scripts/generate_persona_summaries.py")
-        run_script("scripts/compute_internal_metrics.py")
-
+    elif run_stages(options, jobs=args.jobs, force=args.force):
         print("\n✅ Pipeline complete! All data files are in the /data folder.")
+    else:
+        print("\n❌ Pipeline finished with failed stages; fix them and re-run to resume.")
+        sys.exit(1)
@@ -1,74 +1,199 @@
 # --- scripts/simulate_biomarkers.py ---
 # This script generates synthetic biomarkers and wearable data.
+#
+# Values are generated as whole member x day arrays from a seeded NumPy
+# Generator: baseline + per-member offset + trend + day-to-day noise, with the
+# parameters of every marker in config/simulation_config.json. Output uses the
+# backend's CSV schema plus member_id, either as one CSV per dataset (what the
+# API serves) or, for load-test cohorts, partitioned by member.
+#
+#   python scripts/simulate_biomarkers.py                          # data/biomarkers.csv, data/wearables.csv
+#   python scripts/simulate_biomarkers.py --cohort-size 100000 --output-dir data/cohort --seed 7
 
-import pandas as pd
-import random
+import argparse
+import json
 import os
-import datetime
+import sys
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (optional: pip install pyarrow, for --format parquet)
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+from member_store import member_id_for
 
 BIOMARKERS_OUTPUT_PATH = "data/biomarkers.csv"
 WEARABLES_OUTPUT_PATH = "data/wearables.csv"
+PROFILES_PATH = "data/member_profiles.json"
+SIMULATION_CONFIG_PATH = "config/simulation_config.json"
+DEFAULT_SEED = 42
+# Members simulated per batch; part of what makes a run reproducible, with the seed and config
+CHUNK_MEMBERS = 5000
+# Independent random streams, so biomarkers do not shift when the wearables config changes
+BIOMARKER_STREAM, WEARABLE_STREAM = 0, 1
 
-def generate_biomarkers(members):
-    biomarkers = []
-    start_date = datetime.date(2025, 8, 1)
-    
-    for member in members:
-        for month in [3, 6, 8]:
-            test_date = start_date + datetime.timedelta(days=(month-1)*30)
-            
-            # Simulate a positive trend for prediabetes/hypertension
-            hba1c = random.uniform(6.0, 5.7) - (month/8) * 0.1 # Decreasing trend
-            bp_systolic = random.uniform(135, 128) - (month/8) * 1.5 # Decreasing trend
-            apob = random.uniform(95, 80) - (month/8) * 2
-            
-            biomarkers.append({
-                "member_name": member["name"],
-                "date": test_date.isoformat(),
-                "test_type": "Quarterly Panel",
-                "HbA1c": round(hba1c, 2),
-                "BP_Systolic": round(bp_systolic, 1),
-                "ApoB": round(apob, 1),
-                "hs-CRP": random.uniform(0.5, 2.0)
-            })
-    
-    df = pd.DataFrame(biomarkers)
-    df.to_csv(BIOMARKERS_OUTPUT_PATH, index=False)
-    print(f"✅ Biomarkers data generated at {BIOMARKERS_OUTPUT_PATH}")
-
-def generate_wearables(members):
-    wearables = []
-    start_date = datetime.date(2025, 8, 1)
-    
-    for member in members:
-        for day in range(8 * 30):
-            current_date = start_date + datetime.timedelta(days=day)
-            
-            # Simulate slight improvement over time
-            hrv = random.uniform(30, 60) + (day/240) * 10
-            sleep_score = random.uniform(60, 85) + (day/240) * 5
-            rhr = random.uniform(55, 70) - (day/240) * 3
-            
-            wearables.append({
-                "member_name": member["name"],
-                "date": current_date.isoformat(),
-                "HRV": round(hrv, 1),
-                "Sleep_Score": round(sleep_score, 1),
-                "Resting_Heart_Rate": round(rhr, 1)
-            })
-    
-    df = pd.DataFrame(wearables)
-    df.to_csv(WEARABLES_OUTPUT_PATH, index=False)
-    print(f"✅ Wearables data generated at {WEARABLES_OUTPUT_PATH}")
+def load_simulation_config(path: str = SIMULATION_CONFIG_PATH) -> dict:
+    with open(path) as f:
+        return json.load(f)
 
-if __name__ == "__main__":
-    # This script will be called by run_pipeline.py, which will provide members
-    # For a standalone test, you can load a sample member profile here
+def simulate_values(rng: np.random.Generator, n_members: int, months: np.ndarray, params: dict) -> np.ndarray:
+    """(n_members, len(months)) values: baseline + member offset + trend * months + noise"""
+    values = params["baseline"] + params.get("trend_per_month", 0.0) * months[None, :]
+    values = values + params.get("member_sd", 0.0) * rng.standard_normal((n_members, 1))
+    values = values + params.get("noise_sd", 0.0) * rng.standard_normal((n_members, len(months)))
+    if "min" in params or "max" in params:
+        values = np.clip(values, params.get("min"), params.get("max"))
+    return np.round(values, params.get("decimals", 1))
+
+def simulate_biomarkers(member_ids, member_names, config: dict, rng: np.random.Generator) -> pd.DataFrame:
+    """Long format, one row per member, panel and marker (month, date, marker_name, value, unit, notes)"""
+    panel = config["biomarkers"]
+    markers = panel["markers"]
+    start_date = np.datetime64(config["start_date"])
+    panel_months = np.asarray(panel["panel_months"])
+    dates = np.datetime_as_string(start_date + (panel_months - 1) * 30)
+    n_members, n_panels, n_markers = len(member_ids), len(panel_months), len(markers)
+
+    # (member, panel, marker), so rows come out member by member, panel by panel;
+    # the trend counts from the start of the journey, as for wearables
+    values = np.stack([
+        simulate_values(rng, n_members, (panel_months - 1).astype(float), params) for params in markers.values()
+    ], axis=-1)
+    per_member = n_panels * n_markers
+    return pd.DataFrame({
+        "member_id": np.repeat(member_ids, per_member),
+        "member_name": np.repeat(member_names, per_member),
+        "month": np.tile(np.repeat(panel_months, n_markers), n_members),
+        "date": np.tile(np.repeat(dates, n_markers), n_members),
+        "marker_name": np.tile(list(markers), n_members * n_panels),
+        "value": values.ravel(),
+        "unit": np.tile([params.get("unit", "") for params in markers.values()], n_members * n_panels),
+        "notes": "",
+    })
+
+def simulate_wearables(member_ids, member_names, config: dict, rng: np.random.Generator) -> pd.DataFrame:
+    """One row per member and day (date, device, metric columns, notes)"""
+    days = config["days"]
+    start_date = np.datetime64(config["start_date"])
+    dates = np.datetime_as_string(start_date + np.arange(days))
+    months = np.arange(days) / 30.0
+    n_members = len(member_ids)
+
+    data = {
+        "member_id": np.repeat(member_ids, days),
+        "member_name": np.repeat(member_names, days),
+        "date": np.tile(dates, n_members),
+        "device": config["wearables"].get("device", ""),
+    }
+    for column, params in config["wearables"]["columns"].items():
+        data[column] = simulate_values(rng, n_members, months, params).ravel()
+    data["notes"] = ""
+    return pd.DataFrame(data)
+
+# --- Cohorts and output ---
+
+def profile_cohort(members: list):
+    return (np.array([member_id_for(m) for m in members], dtype=object),
+            np.array([m["name"] for m in members], dtype=object))
+
+def synthetic_cohort(size: int):
+    """Load-test members "member-000001", ... named "Member 000001", ..."""
+    numbers = np.char.zfill(np.arange(1, size + 1).astype(str), len(str(size)))
+    return (np.char.add("member-", numbers).astype(object), np.char.add("Member ", numbers).astype(object))
+
+def iter_simulated(simulate, member_ids, member_names, config: dict, seed: int, stream: int):
+    """DataFrames of up to CHUNK_MEMBERS members, each chunk with its own seeded Generator"""
+    for start in range(0, len(member_ids), CHUNK_MEMBERS):
+        rng = np.random.default_rng([seed, stream, start])
+        stop = start + CHUNK_MEMBERS
+        yield simulate(member_ids[start:stop], member_names[start:stop], config, rng)
+
+def write_csv(frames, path: str) -> int:
+    """Append chunks to one CSV, header once"""
+    rows = 0
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", newline="") as f:
+        for df in frames:
+            df.to_csv(f, index=False, header=rows == 0)
+            rows += len(df)
+    os.replace(tmp_path, path)
+    return rows
+
+def write_partitioned(frames, root: str, file_format: str) -> int:
+    """Hive-style partitions: root/member_id=<id>/part-<chunk>.<csv|parquet>"""
+    rows = 0
+    for chunk, df in enumerate(frames):
+        if file_format == "parquet":
+            df.to_parquet(root, partition_cols=["member_id"], index=False,
+                          basename_template=f"part-{chunk}-{{i}}.parquet")
+        else:
+            # Format the chunk once and slice it per member: rows are member-contiguous
+            # and simulated values never contain line breaks
+            header = df.columns.drop("member_id").to_list()
+            lines = df[header].to_csv(index=False, header=False).splitlines(keepends=True)
+            member_ids, first_rows, counts = np.unique(df["member_id"].to_numpy(), return_index=True, return_counts=True)
+            for member_id, first, count in zip(member_ids, first_rows, counts):
+                directory = os.path.join(root, f"member_id={member_id}")
+                os.makedirs(directory, exist_ok=True)
+                with open(os.path.join(directory, f"part-{chunk}.csv"), "w") as f:
+                    f.write(",".join(header) + "\n")
+                    f.writelines(lines[first:first + count])
+        rows += len(df)
+    return rows
+
+def generate_biomarkers(members, seed: int = DEFAULT_SEED, config: dict = None, output_path: str = BIOMARKERS_OUTPUT_PATH):
+    config = config or load_simulation_config()
+    member_ids, member_names = profile_cohort(members)
+    rows = write_csv(iter_simulated(simulate_biomarkers, member_ids, member_names, config, seed, BIOMARKER_STREAM), output_path)
+    print(f"✅ Biomarkers data generated at {output_path} ({rows} rows)")
+
+def generate_wearables(members, seed: int = DEFAULT_SEED, config: dict = None, output_path: str = WEARABLES_OUTPUT_PATH):
+    config = config or load_simulation_config()
+    member_ids, member_names = profile_cohort(members)
+    rows = write_csv(iter_simulated(simulate_wearables, member_ids, member_names, config, seed, WEARABLE_STREAM), output_path)
+    print(f"✅ Wearables data generated at {output_path} ({rows} rows)")
+
+def generate_cohort(size: int, output_dir: str, seed: int = DEFAULT_SEED, config: dict = None, file_format: str = "csv"):
+    """Synthetic cohort partitioned by member under output_dir/biomarkers and output_dir/wearables"""
+    if file_format == "parquet" and not HAS_PARQUET:
+        raise RuntimeError("--format parquet needs pyarrow (pip install pyarrow)")
+    config = config or load_simulation_config()
+    member_ids, member_names = synthetic_cohort(size)
+    for name, simulate, stream in (("biomarkers", simulate_biomarkers, BIOMARKER_STREAM),
+                                   ("wearables", simulate_wearables, WEARABLE_STREAM)):
+        root = os.path.join(output_dir, name)
+        rows = write_partitioned(iter_simulated(simulate, member_ids, member_names, config, seed, stream), root, file_format)
+        print(f"✅ {rows} {name} rows for {size} members written to {root}")
+
+def main(seed: int = DEFAULT_SEED, config_path: str = SIMULATION_CONFIG_PATH):
     try:
-        profiles_file = "data/member_profiles.json"
+        profiles_file = PROFILES_PATH
         with open(profiles_file) as f:
             members_data = json.load(f)
-        generate_biomarkers(members_data)
-        generate_wearables(members_data)
-    except FileNotFoundError:
-        print(f"Error: {profiles_file} not found.")
+        config = load_simulation_config(config_path)
+        generate_biomarkers(members_data, seed, config)
+        generate_wearables(members_data, seed, config)
+    except FileNotFoundError as e:
+        print(f"Error: {e.filename} not found.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate biomarker panels and daily wearable data")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--config", default=SIMULATION_CONFIG_PATH, help="Per-marker baseline, trend and noise parameters")
+    parser.add_argument("--cohort-size", type=int, help="Simulate this many synthetic members instead of member_profiles.json")
+    parser.add_argument("--output-dir", default="data/cohort", help="Where --cohort-size writes its member partitions")
+    parser.add_argument("--format", choices=["auto", "csv", "parquet"], default="auto",
+                        help="Partition file format for --cohort-size (auto: parquet if pyarrow is installed)")
+    args = parser.parse_args()
+
+    if args.cohort_size:
+        file_format = args.format if args.format != "auto" else ("parquet" if HAS_PARQUET else "csv")
+        generate_cohort(args.cohort_size, args.output_dir, args.seed, load_simulation_config(args.config), file_format)
+    else:
+        main(args.seed, args.config)